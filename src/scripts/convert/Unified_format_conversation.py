@@ -7,11 +7,16 @@
 # 3. Removes links and cleans Markdown content.
 # 4. Logs errors encountered during processing.
 # 5. Handles problematic YAML files by storing their raw content.
+# 6. Skips PDFs whose extracted text is not in English (their language cannot be checked before extraction).
+# 7. Reads the manifest of the content store: a file is converted once, and its content is stored under the
+#    tags of every download with the same content (e.g. a CODE_OF_CONDUCT.md copied across projects).
 
 # The script uses several helper functions to ensure clean data and efficient processing. Processed files are tracked to avoid reprocessing in subsequent runs.
 
 # Modules:
 # - os, re, json, yaml, tqdm, PyPDF2, datetime, logging
+# - language_detection: For checking the language of the text extracted from PDFs.
+# - content_store: For the manifest of the downloaded files and their duplicates.
 
 # Constants:
 # - NUMBER_OF_TOKENS: The number of tokens used to split Markdown content.
@@ -19,7 +24,8 @@
 
 # Functions:
 # - extract_metadata(file_name: str) -> dict: Extracts and returns metadata from the file name.
-# - convert_files_to_json(processed_files, chunk_size, error_file_list, json_file_path="sources/unified_files", file_paths="sources/raw_files"): Converts files in the specified directory to JSON format.
+# - load_duplicate_tags(content_store_dir: str) -> dict: Returns the tags of the duplicates of each downloaded file.
+# - convert_files_to_json(processed_files, chunk_size, error_file_list, json_file_path="sources/unified_files", file_paths="sources/raw_files", content_store_dir=CONTENT_STORE_DIR): Converts files in the specified directory to JSON format.
 # - remove_links_from_markdown(content: str) -> str: Removes all markdown links from the provided content.
 # - process_error_yaml_file(error_file_list: list, file_paths="sources/raw_files", json_file_path="sources/unified_files") -> None: Processes YAML files that encountered errors and stores their raw content in JSON format.
 # - clean_markdown(markdown_text): Cleans the markdown content by removing headers, emphasis, links, images, and other formatting.
@@ -43,6 +49,14 @@ import logging
 from threading import Lock
 import multiprocessing
 from typing import Any, List, Set
+import sys
+try:
+    from src.scripts.data_preparation.language_detection import is_english_text
+    from src.scripts.data_preparation.content_store import CONTENT_STORE_DIR, ContentStore
+except ImportError:  # Run as a script
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preparation'))
+    from language_detection import is_english_text
+    from content_store import CONTENT_STORE_DIR, ContentStore
 # Constants for processing
 MIN_NUMBER_OF_TOKENS = 50  # Example value, adjust as needed
 NUMBER_OF_TOKENS = 600  # Example value, adjust as needed
@@ -85,15 +99,34 @@ def extract_metadata(file_name: str) -> dict:
         "file_name": filename,
     }
 
-def convert_files_to_json(processed_files: set[str], chunk_size: int, error_file_list: list[str], json_file_path: str = "sources/unified_files", file_paths: str = "sources/raw_files") -> None:
+def load_duplicate_tags(content_store_dir: str = CONTENT_STORE_DIR) -> dict[str, list[dict]]:
+    """Returns the tags of the downloads whose content was only written once, by the file holding the content.
+
+    Args:
+        content_store_dir (str): The directory of the content store.
+
+    Returns:
+        Dict[str, List[dict]]: The metadata (see extract_metadata) of the duplicates of each file, by file name.
+    """
+    duplicate_tags = {}
+    for entry in ContentStore(content_store_dir).manifest():
+        if entry.get('duplicate'):
+            duplicate_tags.setdefault(os.path.basename(entry['path']), []).append(extract_metadata(entry['filename']))
+    return duplicate_tags
+
+def convert_files_to_json(processed_files: set[str], chunk_size: int, error_file_list: list[str], json_file_path: str = "sources/unified_files", file_paths: str = "sources/raw_files", content_store_dir: str = CONTENT_STORE_DIR) -> None:
     """Converts various file types to JSON.
 
+    The content of a file is stored once for its own tags and once for the tags of each of its duplicates
+    recorded in the content store's manifest.
+
     Args:
         file_paths (str): Path to the directory containing files.
         json_file_path (str): Path to the directory to store JSON files.
         processed_files (set): Set of processed file names.
         chunk_size (int): Size of processing chunk.
         error_file_list (list): List to store error file names.
+        content_store_dir (str): The directory of the content store whose manifest lists the duplicates.
     """
     if not os.path.exists(file_paths):
         os.makedirs(file_paths)
@@ -110,6 +143,11 @@ def convert_files_to_json(processed_files: set[str], chunk_size: int, error_file
     processed_urls_count = len(processed_files)
     file_names = glob.glob(file_paths + "/*/*.*", recursive=True)
     file_names = file_names + glob.glob(file_paths + "/*.*")
+    duplicate_tags = load_duplicate_tags(content_store_dir)
+
+    def tags_of(file_name: str) -> list[dict]:
+        file_name_only = os.path.basename(file_name)
+        return [extract_metadata(file_name_only)] + duplicate_tags.get(file_name_only, [])
 
     def process_file(file_name):
         nonlocal processed_urls_count
@@ -127,9 +165,8 @@ def convert_files_to_json(processed_files: set[str], chunk_size: int, error_file
                     for doc in documents:
                         cleaned_data = convert_datetime_to_str(doc)
                         data.append({'data': cleaned_data})
-                    tag_data = extract_metadata(file_name.split('/')[-1])
                 with yaml_lock:
-                    yaml_data_list.append({"tag": tag_data, "content": data})
+                    yaml_data_list.extend({"tag": tag_data, "content": data} for tag_data in tags_of(file_name))
                 with processed_files_lock:
                     processed_files.add(file_name)
                 processed_urls_count += 1
@@ -181,9 +218,8 @@ def convert_files_to_json(processed_files: set[str], chunk_size: int, error_file
                 chunk = ' '.join(words[start_index:start_index + NUMBER_OF_TOKENS])
                 data.append({"data": chunk})
 
-                tag_data = extract_metadata(file_name.split('/')[-1])
                 with md_lock:
-                    md_data_list.append({"tag": tag_data, "content": data})
+                    md_data_list.extend({"tag": tag_data, "content": data} for tag_data in tags_of(file_name))
                 with processed_files_lock:
                     processed_files.add(file_name)
                     processed_urls_count += 1
@@ -206,10 +242,11 @@ def convert_files_to_json(processed_files: set[str], chunk_size: int, error_file
                     for page in reader.pages:
                         content += page.extract_text()
                 data.append({'data': content})
-                tag_data = extract_metadata(file_name.split('/')[-1])
-                if not content == "":
+                if content != "" and not is_english_text(content):
+                    print(f"PDF is not in English, skipping file: {file_name}")
+                elif not content == "":
                     with pdf_lock:
-                        pdf_data_list.append({"tag": tag_data, "content": data})
+                        pdf_data_list.extend({"tag": tag_data, "content": data} for tag_data in tags_of(file_name))
                 with processed_files_lock:
                     processed_files.add(file_name)
                     processed_urls_count += 1
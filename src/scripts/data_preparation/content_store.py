@@ -0,0 +1,156 @@
+# This module stores downloaded documents by content. It is shared by landscape_extractor and webpages_extractor.
+
+# Key Features:
+# 1. Content addressing: Every document is stored once as a blob named by the SHA-256 of its content.
+# 2. Manifest: A JSON Lines file maps each download (URL, category, subcategory, project and file name) to
+#    the hash of its content, so the tags of duplicates are kept while their content is not.
+# 3. Deduplication: Only the first download of a content is written as a tagged file to the raw files
+#    directory, so identical documents (e.g. CODE_OF_CONDUCT.md copied across repositories) are converted
+#    and turned into Q&A once. The tagged file is a hard link to the blob where the file system allows it.
+# 4. Concurrency: Safe to use from many download threads. Hashing and file writes run outside the store's lock,
+#    which only guards the index and the manifest.
+
+# Modules:
+# - hashlib: For hashing the content.
+# - json: For the manifest.
+# - os, shutil: For writing blobs and linking them into the raw files directory.
+# - threading: For guarding the index and the manifest.
+
+# Functions:
+# - ContentStore: A content-addressed blob store with a manifest of tags -> hash.
+# - ContentStore.add(content, url, tags, path): Stores a document and writes its tagged file if its content is new.
+# - ContentStore.manifest(): Yields the manifest entries.
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+CONTENT_STORE_DIR = 'sources/content_store'
+MANIFEST_FILE = 'manifest.jsonl'
+
+
+class ContentStore:
+    """
+    A content-addressed store of downloaded documents with a manifest mapping tags to content hashes.
+
+    Args:
+        root (str, optional): The directory of the store. Defaults to CONTENT_STORE_DIR.
+    """
+
+    def __init__(self, root: str = CONTENT_STORE_DIR):
+        self.root = root
+        self.manifest_file = os.path.join(root, MANIFEST_FILE)
+        self._lock = threading.Lock()
+        self._paths = None  # Hash -> tagged file of its first download, loaded on first use
+        self._hashes = {}  # Tagged file -> hash of its content, the reverse of _paths
+        self._written = set()  # Tagged files claimed by this process, possibly still being written
+
+    def _blob_path(self, sha256: str) -> str:
+        return os.path.join(self.root, 'blobs', sha256[:2], sha256)
+
+    def _load_paths(self) -> dict[str, str]:
+        if self._paths is None:
+            self._paths = {}
+            for entry in self.manifest():
+                if not entry.get('duplicate'):
+                    self._assign(entry['sha256'], entry['path'])
+        return self._paths
+
+    def _assign(self, sha256: str, path: str) -> None:
+        # A tagged file downloaded again with new content no longer holds its previous content
+        previous = self._hashes.get(path)
+        if previous is not None and previous != sha256 and self._paths.get(previous) == path:
+            del self._paths[previous]
+        self._paths[sha256] = path
+        self._hashes[path] = sha256
+
+    def manifest(self):
+        """
+        Yields the manifest entries in the order they were added.
+
+        Yields:
+            dict: An entry with the keys `sha256`, `url`, `category`, `subcategory`, `project_name`,
+            `filename`, `path` (the tagged file holding the content) and `duplicate`.
+        """
+        if not os.path.exists(self.manifest_file):
+            return
+        with open(self.manifest_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # A line cut by an interrupted run
+
+    def _write_blob(self, sha256: str, content: bytes) -> str:
+        blob_path = self._blob_path(sha256)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            temp_path = f"{blob_path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(content)
+            os.replace(temp_path, blob_path)
+        return blob_path
+
+    @staticmethod
+    def _materialize(blob_path: str, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)
+        try:
+            os.link(blob_path, path)
+        except OSError:  # e.g. another file system
+            shutil.copyfile(blob_path, path)
+
+    def add(self, content: bytes, url: str, tags: dict[str, str], path: str) -> bool:
+        """
+        Stores a document and records its download in the manifest. The tagged file is only written
+        if no other tagged file holds the same content.
+
+        Args:
+            content (bytes): The content of the document.
+            url (str): The URL the document was downloaded from.
+            tags (Dict[str, str]): The tags of the download: Category, Subcategory, Project_name and optionally filename.
+            path (str): The tagged file to write, e.g. in sources/raw_files.
+
+        Returns:
+            bool: True if the content is new and the tagged file was written, False for a duplicate.
+        """
+        sha256 = hashlib.sha256(content).hexdigest()
+        blob_path = self._write_blob(sha256, content)
+        with self._lock:
+            paths = self._load_paths()
+            first_path = paths.get(sha256)
+            # The raw files directory may have been cleaned since the content was first stored
+            is_new = first_path is None or first_path == path or (
+                first_path not in self._written and not os.path.exists(first_path))
+            if is_new:
+                self._assign(sha256, path)
+                self._written.add(path)
+        if is_new:
+            try:
+                self._materialize(blob_path, path)
+            except OSError:
+                with self._lock:
+                    self._written.discard(path)
+                    if self._paths.get(sha256) == path:
+                        del self._paths[sha256]
+                        self._hashes.pop(path, None)
+                raise
+        entry = {
+            'sha256': sha256,
+            'url': url,
+            'category': tags.get('Category', ''),
+            'subcategory': tags.get('Subcategory', ''),
+            'project_name': tags.get('Project_name', ''),
+            'filename': os.path.basename(path),
+            'path': path if is_new else first_path,
+            'duplicate': not is_new,
+        }
+        with self._lock:
+            with open(self.manifest_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+        if not is_new:
+            print(f"Skipping {url} (same content as {entry['path']})")
+        return is_new
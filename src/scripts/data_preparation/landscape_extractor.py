@@ -4,24 +4,45 @@
 
 # Key Features:
 # 1. GitHub API Token: Includes an option to set a GitHub token to increase the API rate limit.
-# 2. Language Detection: Checks if the downloaded content is in English using `langid` before saving it.
-# 3. Multi-threaded Downloading: Utilizes threading to download multiple files simultaneously.
+# 2. Language Detection: Checks if the downloaded content is in English using `langid` before saving it. Only a
+#    bounded sample is classified, in a process pool, with verdicts cached by content hash. PDFs are saved
+#    unchecked; their language is checked after text extraction in Unified_format_conversation.
+# 3. Multi-threaded Downloading: One long-lived pool of MAX_THREADS download threads is shared by all projects,
+#    fed through a bounded queue, so the thread count stays constant and downloads of different projects overlap.
 # 4. Metadata Tagging: Adds tags to each file based on category, subcategory, and project name extracted from the YAML file.
 # 5. Error Handling: Includes error handling for HTTP requests and language detection.
+# 6. Deduplication: Downloads are stored in the shared content store; only the first file with a given content
+#    is written to the output directory, the tags of its duplicates are recorded in the store's manifest.
+# 7. Connection Pooling: All downloads share one keep-alive requests session whose connection pool matches
+#    the number of download threads, so connections to raw.githubusercontent.com are reused.
+# 8. Download State: Each URL is claimed before it is downloaded and recorded with its content hash and validators
+#    in a SQLite store (committed in batches), so every URL is fetched once. Entries older than
+#    DOWNLOAD_CACHE_MAX_AGE seconds are fetched again with a conditional request.
+# 9. Incremental Archiving: A background thread appends each file to its category's zip archive as soon as its
+#    download completes. Files already in the archive with the same content are kept, so archiving is linear in
+#    the number of new files and overlaps the downloads of the next categories. Files re-downloaded with new
+#    content are replaced by rewriting the archive once per category.
 
 # Modules:
 # - requests: For making HTTP requests.
-# - yaml: For parsing YAML files.
+# - landscape_loader: For loading the (cached) pre-parsed landscape YAML file.
 # - os: For interacting with the operating system (e.g., file paths).
 # - tqdm: For displaying progress bars.
 # - threading: For concurrent downloads.
-# - shutil: For creating ZIP archives and handling file operations.
-# - langid: For language identification.
+# - concurrent.futures: For the shared download thread pool and the archiving thread.
+# - zipfile: For appending to the category ZIP archives.
+# - zlib: For comparing downloaded files with their archived copies (CRC-32).
+# - language_detection: For sampled, cached language identification in a process pool.
+# - content_store: For the content-addressed store of downloaded files.
+# - url_state: For the download state of URLs.
 
 # Functions:
-# - is_file_english(content): Determines if the content of a file is in English.
+# - load_cache(): Opens the download state store.
+# - BoundedExecutor: Thread pool whose submit() blocks while too many downloads are queued.
 # - downloader(url, output_directory, tags_dict, semaphore): Downloads a single file from a URL, tags it, and saves it if it is in English.
-# - downloader_multi_thread(download_urls, output_directory, tags_dict): Manages the multi-threaded downloading of files.
+#   Returns the path of the saved file.
+# - downloader_multi_thread(download_urls, output_directory, tags_dict, cache, executor): Queues the downloads of a project.
+# - archive_category(category, futures): Appends the files of a category to its ZIP archive as their downloads complete.
 # - download_files_from_yaml(yaml_file, output_directory): Reads the YAML file, extracts URLs, and initiates the download process.
 
 # Execution:
@@ -29,17 +50,27 @@
 # 2. Creates the output directory if it doesn't exist.
 # 3. Iterates through categories, subcategories, and items in the YAML file.
 # 4. Downloads files concurrently, tags them, and checks for English content.
-# 5. Archives downloaded files for each category and cleans up raw files.
+# 5. Archives the newly downloaded files of each category in the background.
 
 import requests
-import yaml
 import os
 import threading
-import langid
 import time
-import shutil
-from requests.exceptions import RequestException
+import zipfile
+import zlib
 import multiprocessing
+import contextlib
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+try:
+    from src.scripts.data_preparation.landscape_loader import load_landscape
+    from src.scripts.data_preparation.language_detection import LanguageDetector, needs_text_extraction
+    from src.scripts.data_preparation.content_store import ContentStore
+    from src.scripts.data_preparation.url_state import UrlStateStore
+except ImportError:  # Run as a script from its own directory
+    from landscape_loader import load_landscape
+    from language_detection import LanguageDetector, needs_text_extraction
+    from content_store import ContentStore
+    from url_state import UrlStateStore
 
 
 # Replace with your GitHub token to increase github API hourly rate to 5000
@@ -48,78 +79,108 @@ HEADERS = {'Authorization': f'Bearer {TOKEN}',
            'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}
 
 # Define the cache file path
-CACHE_FILE = 'landscape_extractor_cache.txt'
-
-
-
-def load_cache() -> set[str]:
+CACHE_FILE = 'landscape_extractor_cache.sqlite'
+LEGACY_CACHE_FILE = 'landscape_extractor_cache.txt'  # Imported into CACHE_FILE when it is created
+# Seconds after which a downloaded file is fetched again (conditionally), unset to never fetch it again
+DOWNLOAD_CACHE_MAX_AGE = float(os.getenv('DOWNLOAD_CACHE_MAX_AGE')) if os.getenv('DOWNLOAD_CACHE_MAX_AGE') else None
+
+# Number of concurrent downloads, twice the number of CPU cores
+MAX_THREADS = multiprocessing.cpu_count() * 2
+MAX_PENDING_DOWNLOADS = MAX_THREADS * 4  # Queued downloads before submitting blocks
+REQUEST_TIMEOUT = 30
+
+# Directory of the category ZIP archives
+ARCHIVE_DIRECTORY = "sources"
+
+# Keep-alive session shared by all download threads
+SESSION = requests.Session()
+if TOKEN == "Replace your token":
+    SESSION.headers.update({'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'})
+else:
+    SESSION.headers.update(HEADERS)
+SESSION.mount('https://', requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=MAX_THREADS))
+
+# Classifies the language of downloaded files outside the download threads
+LANGUAGE_DETECTOR = LanguageDetector()
+# Stores each downloaded content once, shared with webpages_extractor
+CONTENT_STORE = ContentStore()
+
+
+def load_cache() -> UrlStateStore:
     """
-    Load the cache from the cache file.
+    Open the download state store of the cache file.
 
     Returns:
-        Set[str]: A set containing cached items as strings.
+        UrlStateStore: The download state of the URLs. Close it after downloading.
     """
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, 'r') as f:
-            return set(line.strip() for line in f)
-    return set()
+    return UrlStateStore(CACHE_FILE, legacy_cache_file=LEGACY_CACHE_FILE, max_age=DOWNLOAD_CACHE_MAX_AGE)
 
 
-def save_cache(url: str) -> None:
+class BoundedExecutor:
+    """
+    A thread pool with a bounded queue: submit() blocks while `max_pending` tasks are queued or running.
     """
-    Save the cache to the cache file.
 
-    Args:
-        url (str): The URL to be saved in the cache file.
+    def __init__(self, max_workers: int = MAX_THREADS, max_pending: int = MAX_PENDING_DOWNLOADS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._slots = threading.BoundedSemaphore(max_pending)
 
-    Returns:
-        None
-    """
-    with open(CACHE_FILE, 'a') as f:
-        f.write(url + '\n')
+    def submit(self, fn, *args) -> Future:
+        """
+        Queues a call, waiting for a free slot in the queue.
 
+        Args:
+            fn (Callable): The function to call.
+            *args: The arguments of the call.
 
-def isFileEnglish(content: bytes) -> bool:
-    try:
-        decoded_content = content.decode('utf-8')
-        lang, _ = langid.classify(decoded_content)
-        return lang == 'en'
-    except UnicodeDecodeError as e:
-        print("Unicode decode error:", e)
-        return False
-    except Exception as e:
-        print("Cannot understand the language of the file:", e)
-        return True
+        Returns:
+            Future: The future of the call.
+        """
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self) -> None:
+        """Waits for the queued calls and stops the threads."""
+        self._executor.shutdown(wait=True)
 
 
-def downloader(url: str, output_directory: str, tags_dict: dict[str, str], semaphore: threading.Semaphore, cache: set[str]) -> None:
+def downloader(url: str, output_directory: str, tags_dict: dict[str, str], semaphore: threading.Semaphore, cache: UrlStateStore) -> str:
     """
     Downloads a single file from the URL in the input. It is used by downloader_multi_thread() at each thread.
-    This function uses a semaphore to control the number of concurrent downloads.
+    This function optionally uses a semaphore to control the number of concurrent downloads.
 
     Args:
         url (str): A single URL string.
         output_directory (str): The path where the downloaded files will be stored.
         tags_dict (Dict[str, str]): A dictionary containing the tags for each file. For example: Category, Subcategory, Project_name.
-        semaphore (threading.Semaphore): A semaphore object used to limit the number of concurrent downloads.
-        cache (Set[str]): A set to track downloaded files.
+        semaphore (threading.Semaphore): A semaphore object used to limit the number of concurrent downloads, or None
+            if the caller already bounds the concurrency.
+        cache (UrlStateStore): The download state of the URLs.
 
     Returns:
-        None
+        str: The path of the saved file, or None if nothing was saved (cached, unchanged, failed, not in English or a duplicate).
     """
-    with semaphore:
-        if url in cache:
+    with semaphore or contextlib.nullcontext():
+        # Claim the URL, so no other thread downloads it meanwhile
+        validators = cache.claim(url)
+        if validators is None:
             print(f"Skipping {url} (already downloaded)")
-            return
+            return None
 
         try:
             print(f"Downloading file from {url}")
-            # Send HTTP GET request to download the file
-            if TOKEN == "Replace your token":
-                response = requests.get(url, headers={
-                                        'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'})
-            else:
-                response = requests.get(url, headers=HEADERS, timeout=30)
+            # Send HTTP GET request to download the file over a pooled connection, conditional if it was downloaded before
+            response = SESSION.get(url, timeout=REQUEST_TIMEOUT, headers=validators)
+            if response.status_code == 304:
+                print(f"Skipping {url} (not modified)")
+                cache.complete(url, response)
+                return None
             # Handle 429 too many request error
             if response.status_code == 429:
                 print("Too many requests, waiting for 60 seconds")
@@ -131,21 +192,26 @@ def downloader(url: str, output_directory: str, tags_dict: dict[str, str], semap
             # Separate tags with "_"
             filename = tags_dict['Category'] + "_" + tags_dict['Subcategory'] + \
                 "_" + tags_dict['Project_name'] + "_" + filename
-            # If the file is in English, download it
-            if isFileEnglish(response.content):
-                # Write downloaded content to file
-                with open(os.path.join(output_directory, filename), 'wb') as f:
-                    f.write(response.content)
+            path = None
+            # If the file is in English, download it. PDFs are checked after their text is extracted
+            if needs_text_extraction(filename) or LANGUAGE_DETECTOR.is_english(response.content):
+                # Write downloaded content to file, unless another project has the same file
+                path = os.path.join(output_directory, filename)
+                if not CONTENT_STORE.add(response.content, url, tags_dict, path):
+                    path = None
             # Update cache immediately
-            cache.add(url)
-            save_cache(url)
+            cache.complete(url, response)
+            return path
         except requests.exceptions.RequestException as e:
             print(f"Failed to download file from {url}: {e}")
         except Exception as e:
             print(f"Unexpected error while downloading file from {url}: {e}")
+        cache.fail(url)
+        return None
 
 
-def downloader_multi_thread(download_urls: dict[str, list[str]], output_directory: str, tags_dict: dict[str, str], cache: set[str]) -> None:
+def downloader_multi_thread(download_urls: dict[str, list[str]], output_directory: str, tags_dict: dict[str, str], cache: UrlStateStore,
+                            executor: BoundedExecutor = None) -> list[Future]:
     """
     Downloads the files from the URLs provided in the input download_urls to the output_directory.
     Tags each downloaded file with corresponding Category, Subcategory, and Project_name in each file name.
@@ -155,27 +221,88 @@ def downloader_multi_thread(download_urls: dict[str, list[str]], output_director
         download_urls (Dict[str, List[str]]): A dictionary which contains a list of URLs for each file extension.
         output_directory (str): The path where the downloaded files will be stored.
         tags_dict (Dict[str, str]): A dictionary containing the tags for each file. For example: Category, Subcategory, Project_name.
-        cache (Set[str]): A set to track downloaded files and avoid duplicate downloads.
+        cache (UrlStateStore): The download state of the URLs, to avoid duplicate downloads.
+        executor (BoundedExecutor, optional): The shared download pool. The downloads are queued and their futures
+            returned without waiting. If None, a pool is created and the downloads are awaited. Defaults to None.
 
     Returns:
-        None
+        List[Future]: The futures of the queued downloads.
     """
-    # Calculate a reasonable max_threads based on system capabilities
-    max_threads = multiprocessing.cpu_count() * 2  # Example: twice the number of CPU cores
+    own_executor = executor is None
+    if own_executor:
+        executor = BoundedExecutor()
+    # The caller changes tags_dict for the next project while these downloads are still queued
+    tags = dict(tags_dict)
+    futures = []
     for file_format in download_urls:
         # Exclude yml and yaml files from downloading
         if file_format in ["yml", "yaml"]:
             continue
-        urls_list = download_urls[file_format]
-        semaphore = threading.Semaphore(max_threads)
-        threads = []
-        for url in urls_list:
-            thread = threading.Thread(target=downloader, args=(
-                url, output_directory, tags_dict, semaphore, cache))
-            threads.append(thread)
-            thread.start()
-        for thread in threads:
-            thread.join()
+        for url in download_urls[file_format]:
+            futures.append(executor.submit(downloader, url, output_directory, tags, None, cache))
+    if own_executor:
+        executor.shutdown()
+    return futures
+
+
+def _same_content(info: zipfile.ZipInfo, path: str) -> bool:
+    """Returns whether a file has the size and CRC-32 of an archived entry."""
+    if os.path.getsize(path) != info.file_size:
+        return False
+    crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            crc = zlib.crc32(chunk, crc)
+    return crc == info.CRC
+
+
+def _replace_archived_files(archive_path: str, paths: list[str]) -> None:
+    """Rewrites a ZIP archive with new content for the given files and swaps it in."""
+    replaced = {os.path.basename(path): path for path in paths}
+    temp_path = archive_path + ".tmp"
+    with zipfile.ZipFile(archive_path, 'r') as old_zip, \
+            zipfile.ZipFile(temp_path, 'w', compression=zipfile.ZIP_DEFLATED) as new_zip:
+        for info in old_zip.infolist():
+            if info.filename not in replaced:
+                new_zip.writestr(info, old_zip.read(info))
+        for name, path in replaced.items():
+            new_zip.write(path, name)
+    os.replace(temp_path, archive_path)
+
+
+def archive_category(category: str, futures: list[Future]) -> str:
+    """
+    Appends the files downloaded for a category to its ZIP archive as soon as their downloads complete.
+    Files that are already in the archive, e.g. from a previous run, are kept if their content is unchanged.
+    Files re-downloaded with new content are replaced once all downloads of the category completed.
+
+    Args:
+        category (str): The name of the category.
+        futures (List[Future]): The futures of the category's downloads, see downloader().
+
+    Returns:
+        str: The path of the ZIP archive.
+    """
+    os.makedirs(ARCHIVE_DIRECTORY, exist_ok=True)
+    archive_path = os.path.join(ARCHIVE_DIRECTORY, category + ".zip")
+    changed = []
+    with zipfile.ZipFile(archive_path, 'a', compression=zipfile.ZIP_DEFLATED) as zip_file:
+        archived = {info.filename: info for info in zip_file.infolist()}
+        for future in as_completed(futures):
+            path = future.result()
+            if path is None:
+                continue
+            name = os.path.basename(path)
+            if name not in archived:
+                zip_file.write(path, name)
+                archived[name] = zip_file.getinfo(name)
+            elif not _same_content(archived[name], path):
+                changed.append(path)
+    if changed:
+        # Entries of a ZIP file cannot be replaced in place
+        _replace_archived_files(archive_path, changed)
+    print(f"Archived {category} to {archive_path}")
+    return archive_path
 
 
 def download_files_from_yaml(yaml_file: str = "../../../sources/landscape_augmented_repos_websites.yml", output_directory: str = "sources/raw_files") -> None:
@@ -190,8 +317,7 @@ def download_files_from_yaml(yaml_file: str = "../../../sources/landscape_augmen
         None
     """
     # Load URLs from YAML file
-    with open(yaml_file, 'r') as f:
-        data = yaml.safe_load(f)
+    data = load_landscape(yaml_file)
 
     # Create output directory if it doesn't exist
     os.makedirs(output_directory, exist_ok=True)
@@ -201,6 +327,24 @@ def download_files_from_yaml(yaml_file: str = "../../../sources/landscape_augmen
 
     # Initialize a dictionary to save tags corresponding to each file
     tags_dict = {'Category': "", 'Subcategory': "", 'Project_name': ""}
+    executor = BoundedExecutor()
+    # A single thread appends to the archives, one category after the other
+    archiver = ThreadPoolExecutor(max_workers=1)
+    archives = []
+    try:
+        _download_categories(data, output_directory, tags_dict, cache, executor, archiver, archives)
+    finally:
+        executor.shutdown()
+        archiver.shutdown(wait=True)
+        LANGUAGE_DETECTOR.close()
+        cache.close()
+    for archive in archives:
+        archive.result()  # Raise archiving errors
+
+
+def _download_categories(data: dict, output_directory: str, tags_dict: dict[str, str], cache: UrlStateStore,
+                         executor: BoundedExecutor, archiver: ThreadPoolExecutor, archives: list[Future]) -> None:
+    """Queues the downloads of each category on the shared pool and their archiving on the archiver."""
     # Process the loaded data
     for category in data['landscape']:
         # It downloads only below-defined categories to avoid duplication
@@ -210,6 +354,7 @@ def download_files_from_yaml(yaml_file: str = "../../../sources/landscape_augmen
             continue
         tags_dict['Category'] = category['name']
         print(f"Category: {tags_dict['Category']}")
+        futures = []
         for subcategory in category.get('subcategories', []):
             tags_dict['Subcategory'] = subcategory['name']
             print(f"Subcategory: {tags_dict['Subcategory']}")
@@ -217,15 +362,10 @@ def download_files_from_yaml(yaml_file: str = "../../../sources/landscape_augmen
                 tags_dict['Project_name'] = item['name']
                 print(f"Item: {tags_dict['Project_name']}")
                 repo = item.get('repo', {})
-                downloader_multi_thread(
-                    repo.get('download_urls', []), output_directory, tags_dict, cache)
-        # Adding all the files corresponding to a category to a zip file
-        shutil.make_archive(
-            "sources/" + tags_dict['Category'], 'zip', output_directory+"/")
-        # Removing remaining raw files after archiving
-        # shutil.rmtree(output_directory)
-        # Create directory for the next category
-        os.makedirs(output_directory, exist_ok=True)
+                futures += downloader_multi_thread(
+                    repo.get('download_urls', []), output_directory, tags_dict, cache, executor)
+        # Adding the new files of the category to its zip file while the next category downloads
+        archives.append(archiver.submit(archive_category, tags_dict['Category'], futures))
 
 
 # Example usage:
@@ -0,0 +1,138 @@
+# This module loads the augmented CNCF landscape YAML file shared by the data preparation scripts
+# (stackoverflow_extractor, landscape_extractor and webpages_extractor).
+
+# Key Features:
+# 1. Fast parsing: Uses the libyaml based `CSafeLoader` when PyYAML was built with libyaml.
+# 2. Pre-parsed index: Keeps only the fields the pipeline needs (category -> subcategory -> project -> URLs)
+#    and caches them in a pickle sidecar next to the YAML file.
+# 3. Cache validation: The sidecar is reused while the YAML file's size and mtime match. If only the mtime
+#    changed (e.g. after a copy or checkout), the SHA-256 of the file decides.
+
+# Modules:
+# - yaml: For parsing YAML files.
+# - pickle: For storing the pre-parsed index.
+# - hashlib: For hashing the YAML file.
+# - os: For file metadata and atomic replacement of the sidecar.
+
+# Functions:
+# - load_landscape(yaml_file): Returns the pre-parsed landscape index, rebuilding the sidecar if it is stale.
+# - build_index(data): Reduces the parsed landscape YAML to the fields used by the pipeline.
+# - file_sha256(path): Computes the SHA-256 of a file.
+
+import hashlib
+import os
+import pickle
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+INDEX_SUFFIX = '.index.pickle'
+INDEX_VERSION = 1  # Bump when the shape of the index changes
+
+
+def file_sha256(path: str) -> str:
+    """
+    Computes the SHA-256 of a file.
+
+    Args:
+        path (str): The path of the file.
+
+    Returns:
+        str: The hex digest of the file content.
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def build_index(data: dict) -> dict:
+    """
+    Reduces the parsed landscape YAML to the fields used by the pipeline.
+
+    The index keeps the shape of the YAML file, so callers iterate it like the parsed YAML:
+    `landscape` -> categories -> `subcategories` -> `items`, each item with its `name`,
+    `repo.download_urls` and `website.docs`.
+
+    Args:
+        data (dict): The parsed landscape YAML.
+
+    Returns:
+        dict: The landscape index.
+    """
+    categories = []
+    for category in data.get('landscape') or []:
+        subcategories = []
+        for subcategory in category.get('subcategories') or []:
+            items = []
+            for item in subcategory.get('items') or []:
+                repo = item.get('repo') or {}
+                website = item.get('website') or {}
+                items.append({
+                    'name': item['name'],
+                    'repo': {'download_urls': repo.get('download_urls') or []},
+                    'website': {'docs': website.get('docs') or []},
+                })
+            subcategories.append({'name': subcategory.get('name'), 'items': items})
+        categories.append({'name': category['name'], 'subcategories': subcategories})
+    return {'landscape': categories}
+
+
+def _read_sidecar(path: str) -> dict:
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+        return None
+
+
+def _write_sidecar(path: str, sidecar: dict) -> None:
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            pickle.dump(sidecar, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except OSError as e:
+        # A read-only sources directory only costs the speed-up
+        print(f"Could not write landscape index {path}: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def load_landscape(yaml_file: str) -> dict:
+    """
+    Returns the pre-parsed landscape index of a YAML file, rebuilding its sidecar if it is stale.
+
+    Args:
+        yaml_file (str): The path to the landscape YAML file.
+
+    Returns:
+        dict: The landscape index, see `build_index`.
+    """
+    stat = os.stat(yaml_file)
+    sidecar_path = yaml_file + INDEX_SUFFIX
+    sidecar = _read_sidecar(sidecar_path)
+    if sidecar is not None and sidecar.get('version') == INDEX_VERSION and sidecar.get('size') == stat.st_size:
+        if sidecar.get('mtime_ns') == stat.st_mtime_ns:
+            return sidecar['index']
+        sha256 = file_sha256(yaml_file)
+        if sidecar.get('sha256') == sha256:
+            sidecar['mtime_ns'] = stat.st_mtime_ns
+            _write_sidecar(sidecar_path, sidecar)
+            return sidecar['index']
+
+    with open(yaml_file, 'rb') as f:
+        content = f.read()
+    index = build_index(yaml.load(content, Loader=SafeLoader))
+    _write_sidecar(sidecar_path, {
+        'version': INDEX_VERSION,
+        'size': len(content),
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': hashlib.sha256(content).hexdigest(),
+        'index': index,
+    })
+    return index
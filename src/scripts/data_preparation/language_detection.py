@@ -0,0 +1,184 @@
+# This module decides whether downloaded documents are in English. It is shared by the data preparation
+# scripts (landscape_extractor) and the conversion script (Unified_format_conversation).
+
+# Key Features:
+# 1. Bounded sampling: Only a few windows of text (start, middle and end of the document) are classified,
+#    so the cost of a check does not grow with the size of the document.
+# 2. Binary formats: Formats like PDF cannot be classified from their bytes. Their check is deferred until
+#    their text has been extracted.
+# 3. Verdict cache: Verdicts are cached by the SHA-256 of the content, so identical files are classified once.
+# 4. Process pool: `langid` holds the GIL while classifying. `LanguageDetector` runs it in worker processes,
+#    so the download threads keep doing network I/O meanwhile.
+
+# Modules:
+# - langid: For language identification.
+# - codecs: For decoding windows that start or end inside a UTF-8 character.
+# - hashlib: For hashing the content.
+# - concurrent.futures: For the classification process pool.
+# - threading: For guarding the verdict cache.
+
+# Functions:
+# - needs_text_extraction(filename): Returns whether the language of a file can only be checked after text extraction.
+# - sample_text(content): Decodes a bounded sample of a UTF-8 document.
+# - is_english_text(text): Classifies a bounded sample of a text.
+# - is_english(content): Classifies a bounded sample of a UTF-8 document.
+# - LanguageDetector: Classifies documents in a process pool and caches the verdicts by content hash.
+
+import codecs
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import langid
+
+SAMPLE_WINDOWS = 3  # Windows taken from the start, middle and end of a document
+WINDOW_SIZE = 2048  # Bytes (or characters) per window
+BINARY_EXTENSIONS = ('.pdf',)  # Checked after their text has been extracted
+
+
+def needs_text_extraction(filename: str) -> bool:
+    """
+    Returns whether the language of a file can only be checked after its text has been extracted.
+
+    Args:
+        filename (str): The name or URL of the file.
+
+    Returns:
+        bool: True for binary formats like PDF.
+    """
+    return filename.lower().endswith(BINARY_EXTENSIONS)
+
+
+def _window_offsets(length: int) -> list[int]:
+    if length <= SAMPLE_WINDOWS * WINDOW_SIZE:
+        return [0]
+    step = (length - WINDOW_SIZE) // (SAMPLE_WINDOWS - 1)
+    return [i * step for i in range(SAMPLE_WINDOWS)]
+
+
+def sample_text(content: bytes) -> str:
+    """
+    Decodes a bounded sample of a UTF-8 document: the whole document if it is short, otherwise
+    SAMPLE_WINDOWS windows of WINDOW_SIZE bytes spread over it.
+
+    Args:
+        content (bytes): The content of the document.
+
+    Returns:
+        str: The decoded sample.
+
+    Raises:
+        UnicodeDecodeError: If the sample is not valid UTF-8.
+    """
+    if len(content) <= SAMPLE_WINDOWS * WINDOW_SIZE:
+        return content.decode('utf-8')
+    windows = []
+    for offset in _window_offsets(len(content)):
+        window = content[offset:offset + WINDOW_SIZE]
+        if offset:
+            # Skip the continuation bytes of a character cut at the start of the window
+            start = 0
+            while start < 3 and start < len(window) and 0x80 <= window[start] <= 0xBF:
+                start += 1
+            window = window[start:]
+        # An incremental decoder keeps a character cut at the end of the window instead of failing
+        windows.append(codecs.getincrementaldecoder('utf-8')().decode(window, final=False))
+    return '\n'.join(windows)
+
+
+def is_english_text(text: str) -> bool:
+    """
+    Classifies a bounded sample of a text.
+
+    Args:
+        text (str): The text, e.g. extracted from a PDF.
+
+    Returns:
+        bool: True if the text is in English.
+    """
+    if len(text) > SAMPLE_WINDOWS * WINDOW_SIZE:
+        text = '\n'.join(text[offset:offset + WINDOW_SIZE] for offset in _window_offsets(len(text)))
+    lang, _ = langid.classify(text)
+    return lang == 'en'
+
+
+def is_english(content: bytes) -> bool:
+    """
+    Classifies a bounded sample of a UTF-8 document.
+
+    Args:
+        content (bytes): The content of the document.
+
+    Returns:
+        bool: True if the document is in English. False if it is not valid UTF-8. True if its language
+        cannot be determined.
+    """
+    try:
+        return is_english_text(sample_text(content))
+    except UnicodeDecodeError as e:
+        print("Unicode decode error:", e)
+        return False
+    except Exception as e:
+        print("Cannot understand the language of the file:", e)
+        return True
+
+
+class LanguageDetector:
+    """
+    Classifies documents in a process pool and caches the verdicts by the SHA-256 of their content.
+
+    The pool is started on first use. Only the bounded sample is sent to the workers.
+    """
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._verdicts = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def is_english(self, content: bytes) -> bool:
+        """
+        Classifies a document, see `is_english`. Blocks the calling thread, but not the GIL, until the verdict is known.
+
+        Args:
+            content (bytes): The content of the document.
+
+        Returns:
+            bool: True if the document is in English.
+        """
+        key = hashlib.sha256(content).hexdigest()
+        verdict = self._verdicts.get(key)
+        if verdict is not None:
+            return verdict
+        try:
+            text = sample_text(content)
+        except UnicodeDecodeError as e:
+            print("Unicode decode error:", e)
+            verdict = False
+        else:
+            try:
+                verdict = self._get_executor().submit(is_english_text, text).result()
+            except (BrokenProcessPool, OSError) as e:
+                # e.g. no semaphores for multiprocessing in a sandbox: classify in this process
+                print("Language detection pool is unavailable, classifying in-process:", e)
+                verdict = is_english(content)
+            except Exception as e:
+                print("Cannot understand the language of the file:", e)
+                verdict = True
+        self._verdicts[key] = verdict
+        return verdict
+
+    def close(self) -> None:
+        """Stops the worker processes."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
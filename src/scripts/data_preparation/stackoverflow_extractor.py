@@ -5,14 +5,18 @@
 # Key functionalities
 # 1. Fetching data from the StackOverflow API with exponential backoff to handle rate limiting.
 # 2. Extracting questions and answers for specific tags, ensuring unique processing of question IDs.
-# 3. Removing HTML tags from the text for better readability.
-# 4. Saving the extracted data to CSV files and maintaining progress in JSON files to resume operations efficiently.
+# 3. Removing HTML tags from the text for better readability, in a separate process pool stage.
+# 4. Saving the extracted data to CSV files (or a Parquet dataset partitioned by tag) and maintaining progress in JSON files to resume operations efficiently.
 # 5. Concurrently processing multiple tags using a thread pool executor to speed up data collection.
+# 6. Incremental sync (SYNC_MODE=incremental) of finished tags, fetching only questions active since the tag's watermark.
+# 7. Optionally crawling with asyncio (CRAWL_MODE=async), where throughput is bounded by the API quota instead of threads.
 
 # Dependencies:
-# - yaml
+# - landscape_loader
+# - stackoverflow_paths
 # - requests
-# - pandas
+# - csv
+# - lxml
 # - BeautifulSoup
 # - time
 # - json
@@ -20,21 +24,43 @@
 # - sys
 # - datetime
 # - dotenv
+# - asyncio
+# - aiohttp
 # - concurrent.futures
 # - threading
 # - multiprocessing
+# - sqlite3
+# - pyarrow (optional, for OUTPUT_FORMAT=parquet)
+# - array
 
 # Modules:
+# - `TokenBucket`: Global request rate limiter honouring the API's backoff field.
+# - `RequestBudget`: Persisted daily request budget shared by every fetch, fed by the API's quota fields.
+# - `schedule_tags(tags, progress, remaining)`: Orders the pending tags and limits them to the remaining budget.
 # - `fetch_with_backoff(api_url, params)`: Fetches data from the API with retry logic.
+# - `fetch_with_backoff_async(session, api_url, params)`: Asynchronous variant of `fetch_with_backoff`.
 # - `qa_extractor(tag, start_page, page_size)`: Extracts questions for a given tag.
+# - `save_page(tag, page, response_data, QA_list, new_question_ids)`: Saves a fetched page and the tag's progress.
+# - `save_tag_end(tag, incremental, watermark)`: Marks a tag without further items as done.
 # - `fetch_answers(question_id)`: Fetches answers for a specific question.
-# - `remove_html_tags(text)`: Removes HTML tags from the text.
-# - `extract_all_projects(tags)`: Manages the extraction process for multiple tags concurrently.
-# - `save_to_csv(data, filename)`: Saves data to a CSV file.
-# - `load_progress()`: Loads progress from a JSON file.
-# - `save_progress(tag, page)`: Saves progress to a JSON file.
-# - `load_processed_question_ids()`: Loads processed question IDs from a JSON file.
-# - `save_processed_question_ids(processed_ids)`: Saves processed question IDs to a JSON file.
+# - `fetch_answers_batch(question_ids)`: Fetches answers for up to 100 questions per request, grouped by question.
+# - `remove_html_tags(text)`: Removes HTML tags from the text, keeping code blocks as fenced text.
+# - `HtmlCleaningStage`: Process pool that cleans the HTML of fetched pages behind a bounded queue.
+# - `extract_all_projects(tags, mode)`: Manages the extraction process for multiple tags concurrently.
+# - `extract_all_projects_async(tags, concurrency)`: Crawls the tags with asyncio and a shared connection pool.
+# - `CSVAppendWriter`: Append-only CSV writer with periodic fsync and optional rotating shards.
+# - `save_to_csv(data, filename)`: Appends data to a CSV file.
+# - `close_csv_writers()`: Flushes and closes all open CSV writers.
+# - `ParquetDatasetWriter`: Writes typed rows to a Parquet dataset partitioned by tag, in row-group batches.
+# - `save_rows(data, tag, on_saved)`: Saves rows with the configured output backend (OUTPUT_FORMAT=csv or parquet).
+# - `CheckpointStore`: Crash-safe per-tag checkpoints (next page and activity watermark) in a SQLite WAL database.
+# - `load_progress()`: Loads progress from the checkpoint store.
+# - `save_progress(tag, page)`: Saves the progress of one tag to the checkpoint store.
+# - `ProcessedQuestionIds`: Set of processed question IDs backed by an append-only log of int64 values.
+# - `load_watermarks()` / `save_watermark(tag, last_activity)`: Loads and raises the per-tag activity watermarks.
+# - `compact_csv(filename)`: Drops rows superseded by an incremental sync.
+# - `load_processed_question_ids()`: Returns the processed question ID store shared by all threads.
+# - `save_processed_question_ids(question_ids)`: Appends newly processed question IDs to the store.
 # - `load_tags()`: Loads tags from a YAML file or a cached JSON file, updating as necessary.
 
 # Usage:
@@ -42,144 +68,732 @@
 # - Ensure the necessary directories and files exist or will be created.
 # - Run the script to start collecting StackOverflow Q&A data for specified tags.
 
-import yaml
 import requests
-import pandas as pd
+import csv
+import atexit
 from bs4 import BeautifulSoup
 import time
 import json
 import os
 import sys
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+import aiohttp
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import lxml.html
+from lxml import etree
+from urllib.parse import quote
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Only needed for OUTPUT_FORMAT=parquet
+    pa = None
+    pq = None
 import threading
 import multiprocessing
+import sqlite3
+try:
+    from src.scripts.data_preparation.landscape_loader import load_landscape
+    from src.scripts.data_preparation.stackoverflow_paths import CSV_FILE, PARQUET_DIR
+except ImportError:  # Run as a script from its own directory
+    from landscape_loader import load_landscape
+    from stackoverflow_paths import CSV_FILE, PARQUET_DIR
+from array import array
 
 load_dotenv()
 API_KEY = os.getenv('API_KEY', 'Replace your api key')
+API_BASE_URL = 'https://api.stackexchange.com/2.3'
 REQUEST_DELAY = 0  # Number of seconds to wait between requests
+REQUEST_TIMEOUT = 30  # Number of seconds before a request times out
+REQUESTS_PER_SECOND = 25  # StackExchange throttles clients above 30 requests per second
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 1  # Number of seconds before the first retry, doubled on every further retry
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+CRAWL_MODE = os.getenv('CRAWL_MODE', 'threads')  # "threads" or "async"
+ASYNC_CONCURRENCY = int(os.getenv('ASYNC_CONCURRENCY', 8))  # Number of concurrent requests in async mode
 
-CSV_FILE = 'sources/stackoverflow_Q&A/cncf_stackoverflow_qas.csv'
-PROCESSED_IDS_FILE = 'sources/stackoverflow_Q&A/processed_question_ids.json'
+OUTPUT_FORMAT = os.getenv('OUTPUT_FORMAT', 'csv')  # "csv" or "parquet"
+PARQUET_ROW_GROUP_SIZE = 5000  # Rows buffered per tag before a row group is written
+PROCESSED_IDS_FILE = 'sources/stackoverflow_Q&A/processed_question_ids.bin'
+LEGACY_PROCESSED_IDS_FILE = 'sources/stackoverflow_Q&A/processed_question_ids.json'
 TAGS_FILE =  'sources/stackoverflow_Q&A/tags.json'
-PROGRESS_FILE =  'sources/stackoverflow_Q&A/stackoverflow_progress.json' 
+PROGRESS_FILE = 'sources/stackoverflow_Q&A/stackoverflow_progress.sqlite'  # Per-tag pages and watermarks
+LEGACY_PROGRESS_FILE = 'sources/stackoverflow_Q&A/stackoverflow_progress.json'
+SYNC_MODE = os.getenv('SYNC_MODE', 'full')  # "full" or "incremental"
+INCREMENTAL_BOOTSTRAP_DAYS = 30  # Sync window for finished tags that have no watermark yet
 TAGS_UPDATE_INTERVAL = 7  # Number of days between tag updates
-DAILY_REQUEST_LIMIT = 9000
+BUDGET_FILE = 'sources/stackoverflow_Q&A/request_budget.json'
+DAILY_REQUEST_LIMIT = 9000  # Requests per UTC day, shared by all tags and persisted in BUDGET_FILE
+BUDGET_SAVE_INTERVAL = 50  # Requests between saves of the budget, unless the quota changes unexpectedly
+MIN_REQUESTS_PER_TAG = 2  # One search and one answers request
+ANSWER_BATCH_SIZE = 100  # Maximum number of question IDs per answers request
+CSV_COLUMNS = ['question', 'answer', 'tag', 'question_id', 'answer_id', 'answer_rank', 'score', 'creation_date',
+               'last_activity_date']
+CSV_FSYNC_INTERVAL = 20  # Number of appended pages between fsync calls
+CSV_SHARD_MAX_ROWS = 0  # Rotate to a new CSV shard after this many rows, 0 writes a single file
 MAX_THREADS = 4
+HTML_WORKERS = int(os.getenv('HTML_WORKERS', multiprocessing.cpu_count()))  # Processes cleaning HTML, 0 cleans in the fetching thread
 # MAX_THREADS = 10
 
 lock = threading.Lock()  # Initialize a threading lock
 
+class QuotaExceededError(Exception):
+    """Raised when the StackExchange API reports that the request quota is used up."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every request of the module.
+
+    `reserve()` takes a token and returns how long the caller has to wait before sending its request,
+    so the same bucket can pace blocking threads (`time.sleep`) and asyncio tasks (`asyncio.sleep`).
+    `observe()` applies the `backoff` field returned by the API.
+    """
+
+    def __init__(self, rate: float = REQUESTS_PER_SECOND, capacity: int = None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token from the bucket.
+
+        Returns:
+            float: Number of seconds to wait before sending the request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every request for the given number of seconds."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def observe(self, response_data: dict) -> None:
+        """Apply the `backoff` field of an API response.
+
+        Args:
+            response_data (dict): The JSON response data from the API.
+        """
+        if response_data.get('backoff'):
+            print(f"API asked to back off for {response_data['backoff']} seconds")
+            self.pause(float(response_data['backoff']))
+
+
+token_bucket = TokenBucket()
+
+
+def write_json_atomic(filename: str, data) -> None:
+    """Write JSON data to a temporary file and rename it over the target, so readers never see a partial file.
+
+    Args:
+        filename (str): The path of the JSON file.
+        data: The JSON-serializable data.
+    """
+    folder = os.path.dirname(filename)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    temp_filename = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_filename, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_filename, filename)
+
+
+class RequestBudget:
+    """Daily request budget shared by every fetch of the module and persisted across restarts.
+
+    Each request is counted against DAILY_REQUEST_LIMIT for the current UTC day (the day the StackExchange
+    quota resets on). The `quota_remaining` field of every response is authoritative when it is lower than
+    the local count, so requests made by earlier runs or other clients with the same key are accounted for.
+    """
+
+    def __init__(self, filename: str = None, daily_limit: int = DAILY_REQUEST_LIMIT):
+        self.filename = filename or BUDGET_FILE
+        self.daily_limit = daily_limit
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._unsaved = 0  # Requests counted since the budget was last saved
+        self._state = self._load()
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def _load(self) -> dict:
+        try:
+            with open(self.filename, 'r') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = {}
+        if state.get('day') != self._today():
+            state = {'day': self._today(), 'used': 0, 'quota_remaining': None}
+        return state
+
+    def _roll_over(self) -> None:
+        if self._state['day'] != self._today():
+            self._state = {'day': self._today(), 'used': 0, 'quota_remaining': None}
+
+    def _remaining(self) -> int:
+        remaining = self.daily_limit - self._state['used']
+        if self._state['quota_remaining'] is not None:
+            remaining = min(remaining, self._state['quota_remaining'])
+        return max(remaining, 0)
+
+    def remaining(self) -> int:
+        """Return the number of requests left for today."""
+        with self._lock:
+            self._roll_over()
+            return self._remaining()
+
+    def acquire(self) -> None:
+        """Count one request against today's budget.
+
+        Raises:
+            QuotaExceededError: If no requests are left for today.
+        """
+        with self._lock:
+            self._roll_over()
+            if self._remaining() <= 0:
+                raise QuotaExceededError(f"Daily request budget of {self.daily_limit} requests is used up")
+            self._state['used'] += 1
+            self._unsaved += 1
+            if self._state['quota_remaining'] is not None:
+                self._state['quota_remaining'] -= 1
+
+    def observe(self, response_data: dict) -> None:
+        """Adopt the `quota_remaining` and `quota_max` fields of an API response.
+
+        The budget is persisted when the quota differs from the local count by BUDGET_SAVE_INTERVAL requests
+        or more (e.g. other clients use the same key), when `quota_max` changes, and otherwise every
+        BUDGET_SAVE_INTERVAL requests, instead of syncing the file to disk for every response.
+
+        Args:
+            response_data (dict): The JSON response data from the API.
+        """
+        with self._lock:
+            changed = False
+            if 'quota_remaining' in response_data:
+                counted = self._state['quota_remaining']
+                changed = counted is None or abs(response_data['quota_remaining'] - counted) >= BUDGET_SAVE_INTERVAL
+                self._state['quota_remaining'] = response_data['quota_remaining']
+            if 'quota_max' in response_data:
+                changed = changed or self._state.get('quota_max') != response_data['quota_max']
+                self._state['quota_max'] = response_data['quota_max']
+            due = changed or self._unsaved >= BUDGET_SAVE_INTERVAL
+        if due:
+            self.save()
+
+    def save(self) -> None:
+        """Persist the budget."""
+        with self._save_lock:  # Writes the latest state last, without blocking the requests meanwhile
+            with self._lock:
+                state = dict(self._state)
+                self._unsaved = 0
+            write_json_atomic(self.filename, state)
+
+    def flush(self) -> None:
+        """Persist the budget if requests were counted since it was last saved, e.g. at shutdown."""
+        if self._unsaved:
+            self.save()
+
+
+request_budget = RequestBudget()
+atexit.register(lambda: request_budget.flush())
+
+
+def schedule_tags(tags: list[str], progress: dict, remaining: int, watermarks: dict = None) -> list[tuple[str, int, int]]:
+    """Order the pending tags and keep as many as today's remaining budget can start.
+
+    Tags that were interrupted on a later page are resumed first, so partially crawled tags are completed
+    before new ones are started. With `watermarks` given (incremental sync), finished tags are synced from
+    their watermark after the resumed ones, since a sync usually needs only a page or two.
+    Every tag needs at least one search and one answers request.
+
+    Args:
+        tags (List[str]): List of tags to process.
+        progress (dict): Progress data, mapping tags to the next page or "finished"/"null".
+        remaining (int): Number of requests left for today.
+        watermarks (dict, optional): Last activity timestamp of each tag, enables incremental sync. Defaults to None.
+
+    Returns:
+        List[Tuple[str, int, int]]: The tags to crawl with their start pages and activity watermarks (None for full crawls).
+    """
+    pending = []
+    bootstrap_since = int(time.time()) - INCREMENTAL_BOOTSTRAP_DAYS * 24 * 3600
+    for tag in tags:
+        if progress.get(tag) not in ("null", "finished"):
+            pending.append((tag, progress.get(tag, 1), None))
+        elif watermarks is not None:
+            pending.append((tag, 1, watermarks.get(tag, bootstrap_since)))
+    # Resumed full crawls first, then incremental syncs, then new tags
+    pending.sort(key=lambda item: 0 if item[1] != 1 else 1 if item[2] is not None else 2)
+    scheduled = pending[:remaining // MIN_REQUESTS_PER_TAG]
+    if len(scheduled) < len(pending):
+        print(f"Request budget allows {len(scheduled)} of {len(pending)} pending tags today; the rest are deferred.")
+    return scheduled
+
+
+def retry_delay(attempt: int, retry_after: str = None) -> float:
+    """Return the exponential backoff delay for a retry, honouring a `Retry-After` header.
+
+    Args:
+        attempt (int): Number of the failed attempt, starting at 0.
+        retry_after (str, optional): Value of the `Retry-After` header. Defaults to None.
+
+    Returns:
+        float: Number of seconds to wait before retrying.
+    """
+    delay = RETRY_BASE_DELAY * 2 ** attempt
+    if retry_after:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+    return delay
+
+
 def fetch_with_backoff(api_url: str, params: dict) -> dict:
     """Fetch data from the API with exponential backoff for rate limiting.
 
+    Rate-limited (429) and server error responses are retried up to MAX_RETRIES times with an exponentially
+    growing delay. Every request is counted against the shared request budget and takes a token from the
+    shared token bucket first.
+
     Args:
         api_url (str): The API endpoint URL.
         params (dict): Dictionary of query parameters for the API request.
 
     Returns:
         dict: The JSON response data from the API if successful.
-        None: If the API request fails.
+
+    Raises:
+        requests.HTTPError: If the request fails with a non-retryable status or retries are exhausted.
+        QuotaExceededError: If the daily request budget is used up.
     """
-    while True:
-        response = requests.get(api_url, params=params)
+    for attempt in range(MAX_RETRIES + 1):
+        request_budget.acquire()
+        time.sleep(token_bucket.reserve())
+        try:
+            response = requests.get(api_url, params=params, timeout=REQUEST_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = retry_delay(attempt)
+            print(f"Request failed: {e}. Retrying in {delay} seconds...")
+            time.sleep(delay)
+            continue
         if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 429:
-            print("Rate limit exceeded. Waiting for retry...")
-            retry_after = int(response.headers.get('retry-after', REQUEST_DELAY))
-            time.sleep(retry_after)
-            sys.exit()
-        else:
-            print(f"Failed to fetch data: {response.status_code} - {response.text}")
-            sys.exit()
-            return None
-
-def qa_extractor(tag: str, start_page: int, page_size: int = 100) -> int:
+            response_data = response.json()
+            token_bucket.observe(response_data)
+            request_budget.observe(response_data)
+            return response_data
+        if response.status_code not in RETRY_STATUS_CODES or attempt == MAX_RETRIES:
+            break
+        delay = retry_delay(attempt, response.headers.get('retry-after'))
+        print(f"Request failed with status {response.status_code}. Retrying in {delay} seconds...")
+        time.sleep(delay)
+    print(f"Failed to fetch data: {response.status_code} - {response.text}")
+    raise requests.HTTPError(f"{response.status_code} error for {api_url}", response=response)
+
+
+async def fetch_with_backoff_async(session: aiohttp.ClientSession, api_url: str, params: dict) -> dict:
+    """Asynchronous variant of `fetch_with_backoff` sharing its token bucket and retry policy.
+
+    Args:
+        session (aiohttp.ClientSession): The shared client session.
+        api_url (str): The API endpoint URL.
+        params (dict): Dictionary of query parameters for the API request.
+
+    Returns:
+        dict: The JSON response data from the API if successful.
+
+    Raises:
+        aiohttp.ClientError: If the request fails with a non-retryable status or retries are exhausted.
+        QuotaExceededError: If the daily request budget is used up.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        request_budget.acquire()
+        await asyncio.sleep(token_bucket.reserve())
+        retry_after = None
+        try:
+            async with session.get(api_url, params=params) as response:
+                if response.status == 200:
+                    response_data = await response.json(content_type=None)
+                    token_bucket.observe(response_data)
+                    # May save the budget, which must not block the other requests on the event loop
+                    await asyncio.to_thread(request_budget.observe, response_data)
+                    return response_data
+                status = response.status
+                retry_after = response.headers.get('retry-after')
+                message = await response.text()
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            status, message = None, str(e)
+        if (status is not None and status not in RETRY_STATUS_CODES) or attempt == MAX_RETRIES:
+            break
+        delay = retry_delay(attempt, retry_after)
+        print(f"Request failed with status {status}. Retrying in {delay} seconds...")
+        await asyncio.sleep(delay)
+    print(f"Failed to fetch data: {status} - {message}")
+    raise aiohttp.ClientError(f"{status} error for {api_url}")
+
+
+def search_params(tag: str, page: int, page_size: int, since: int = None) -> dict:
+    """Build the query parameters of a question search request.
+
+    Args:
+        tag (str): The tag to search for on StackOverflow.
+        page (int): The page number for the API request.
+        page_size (int): Number of results per page.
+        since (int, optional): Only return questions with activity after this Unix timestamp. Defaults to None.
+
+    Returns:
+        dict: Dictionary of query parameters.
+    """
+    params = {
+        'page': page,
+        'pagesize': page_size,
+        'order': 'desc',
+        'sort': 'activity',
+        'answers': 1,
+        'tagged': tag,
+        'site': 'stackoverflow',
+        'filter': 'withbody',
+        'key': API_KEY
+    }
+    if since is not None:
+        # With sort=activity, `min` filters on the last activity date. It includes its boundary, and the question
+        # at the watermark was already saved by the previous sync
+        params['min'] = since + 1
+    return params
+
+
+def answers_params(page: int) -> dict:
+    """Build the query parameters of an answers request.
+
+    Args:
+        page (int): The page number for the API request.
+
+    Returns:
+        dict: Dictionary of query parameters.
+    """
+    return {
+        'page': page,
+        'pagesize': 100,
+        'order': 'desc',
+        'sort': 'votes',
+        'site': 'stackoverflow',
+        'filter': 'withbody',
+        'key': API_KEY
+    }
+
+
+def select_unseen_questions(questions: list[dict], processed_question_ids) -> list[dict]:
+    """Return the answered questions that were not processed before.
+
+    Args:
+        questions (List[dict]): Question items of a search page.
+        processed_question_ids: Set-like collection of processed question IDs.
+
+    Returns:
+        List[dict]: The questions that still need their answers.
+    """
+    return [
+        question for question in questions
+        if question['question_id'] not in processed_question_ids and question['answer_count'] > 0
+    ]
+
+
+def build_qa_rows(tag: str, questions: list[dict], answers_by_question: dict[int, list]) -> list[dict]:
+    """Pair each question with its top three answers that have a non-negative score.
+
+    The rows still hold the HTML bodies; `clean_qa_rows` turns them into text in the HTML cleaning stage.
+
+    Args:
+        tag (str): The tag the questions were found for.
+        questions (List[dict]): The question items.
+        answers_by_question (Dict[int, list]): Answer items for each question ID, sorted by votes.
+
+    Returns:
+        List[dict]: Question/answer rows with HTML bodies.
+    """
+    QA_list = []
+    for question in questions:
+        answers = answers_by_question.get(question['question_id'], [])
+
+        for count, answer in enumerate(answers, start=1):
+            if count > 3:
+                break
+            if answer['score'] < 0:
+                continue
+
+            QA_list.append({
+                "question": question['body'],
+                "answer": answer['body'],
+                "tag": tag,
+                "question_id": question['question_id'],
+                "answer_id": answer.get('answer_id'),
+                "answer_rank": count,
+                "score": answer['score'],
+                "creation_date": answer.get('creation_date'),
+                "last_activity_date": question.get('last_activity_date'),
+            })
+    return QA_list
+
+
+def clean_qa_rows(QA_list: list[dict]) -> list[dict]:
+    """Convert the HTML question and answer bodies of rows to text.
+
+    Args:
+        QA_list (List[dict]): Question/answer rows with HTML bodies.
+
+    Returns:
+        List[dict]: The rows with text bodies.
+    """
+    cleaned = {}
+    for row in QA_list:
+        for column in ("question", "answer"):
+            # A question is repeated for each of its answers, clean it only once
+            if row[column] not in cleaned:
+                cleaned[row[column]] = remove_html_tags(row[column])
+    return [{**row, "question": cleaned[row["question"]], "answer": cleaned[row["answer"]]} for row in QA_list]
+
+
+class HtmlCleaningStage:
+    """Pipeline stage that converts the HTML of fetched pages to text in a process pool.
+
+    Parsing HTML is the CPU-bound part of the crawl; running it in worker processes keeps it off the GIL and
+    out of the network threads. Fetchers hand over pages with `submit()`, which blocks once `max_pending`
+    pages are queued, so a slow stage holds the fetchers back instead of buffering without bound.
+    With `workers=0`, or where no process pool can be started (e.g. no semaphores for multiprocessing in a
+    sandbox), pages are cleaned in the calling thread, or in a worker thread in async mode.
+    """
+
+    def __init__(self, workers: int = HTML_WORKERS, max_pending: int = None):
+        self.executor = None
+        if workers > 0:
+            try:
+                self.executor = ProcessPoolExecutor(max_workers=workers)
+            except (OSError, NotImplementedError, ImportError) as e:
+                print("HTML cleaning pool is unavailable, cleaning in-process:", e)
+        self._slots = threading.BoundedSemaphore(max_pending or max(1, workers) * 2)
+
+    def _disable_pool(self, error: Exception) -> None:
+        print("HTML cleaning pool is unavailable, cleaning in-process:", error)
+        executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def submit(self, QA_list: list[dict]) -> Future:
+        """Queue the rows of a page for cleaning.
+
+        Args:
+            QA_list (List[dict]): Question/answer rows with HTML bodies.
+
+        Returns:
+            Future: Resolves to the rows with text bodies.
+        """
+        if self.executor is None:
+            future = Future()
+            future.set_result(clean_qa_rows(QA_list))
+            return future
+        self._slots.acquire()
+        try:
+            future = self.executor.submit(clean_qa_rows, QA_list)
+        except (BrokenProcessPool, OSError) as e:
+            self._slots.release()
+            self._disable_pool(e)
+            return self.submit(QA_list)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def clean_async(self, QA_list: list[dict]) -> list[dict]:
+        """Clean the rows of a page without blocking the event loop.
+
+        Args:
+            QA_list (List[dict]): Question/answer rows with HTML bodies.
+
+        Returns:
+            List[dict]: The rows with text bodies.
+        """
+        if self.executor is not None:
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self.executor, clean_qa_rows, QA_list)
+            except (BrokenProcessPool, OSError) as e:
+                self._disable_pool(e)
+        return await asyncio.to_thread(clean_qa_rows, QA_list)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes."""
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+html_stage = None
+
+
+def get_html_stage() -> HtmlCleaningStage:
+    """Return the HTML cleaning stage shared by all fetchers, starting it on first use.
+
+    Returns:
+        HtmlCleaningStage: The shared stage.
+    """
+    global html_stage
+    with lock:
+        if html_stage is None:
+            html_stage = HtmlCleaningStage()
+        return html_stage
+
+
+def shutdown_html_stage() -> None:
+    """Stop the shared HTML cleaning stage."""
+    global html_stage
+    with lock:
+        stage, html_stage = html_stage, None
+    if stage is not None:
+        stage.shutdown()
+
+
+def newest_activity(items: list[dict]) -> int:
+    """Return the newest `last_activity_date` of a page of questions, 0 for an empty page."""
+    return max((question.get('last_activity_date', 0) for question in items), default=0)
+
+
+def save_page(tag: str, page: int, response_data: dict, QA_list: list[dict], new_question_ids: list[int],
+              incremental: bool = False, watermark: int = None) -> bool:
+    """Persist the rows, processed question IDs and progress of a fetched page.
+
+    The processed question IDs and the progress are saved once the rows are on disk (see `save_rows`), so a
+    page whose rows were lost in a crash is fetched again by the resumed run. Pages are sorted by activity, newest first, so the activity watermark is only saved with the last page
+    of the tag. Saved earlier, an interrupted run would leave a watermark newer than the pages it never fetched.
+
+    Args:
+        tag (str): The tag being processed.
+        page (int): The page number that was fetched.
+        response_data (dict): The JSON response data of the search request.
+        QA_list (List[dict]): Question/answer rows built from the page.
+        new_question_ids (List[int]): Question IDs processed on this page.
+        incremental (bool, optional): Whether the page belongs to an incremental sync. Its page number is not
+            saved, so an interrupted sync never turns into a resumed full crawl. Defaults to False.
+        watermark (int, optional): The newest activity seen on the earlier pages of this run. Defaults to None.
+
+    Returns:
+        bool: True if there are more pages for the tag.
+    """
+    has_more = response_data.get('has_more', False)
+    if not has_more:
+        next_page = "finished"
+    elif not incremental:
+        next_page = page + 1
+    else:
+        next_page = None
+    if not has_more:
+        watermark = max(watermark or 0, newest_activity(response_data['items'])) or None
+    else:
+        watermark = None
+
+    def commit() -> None:
+        save_processed_question_ids(new_question_ids)
+        # Watermark and next page are saved in one transaction
+        get_checkpoint_store().checkpoint(tag, next_page, watermark)
+
+    save_rows(QA_list, tag, commit)
+    return has_more
+
+
+def save_tag_end(tag: str, incremental: bool = False, watermark: int = None) -> None:
+    """Mark a tag whose search returned no more items as done, once the rows of its earlier pages are on disk.
+
+    Args:
+        tag (str): The tag being processed.
+        incremental (bool, optional): Whether the tag was synced incrementally. Its progress is kept. Defaults to False.
+        watermark (int, optional): The newest activity seen by this run. Defaults to None.
+    """
+    def commit() -> None:
+        if not incremental:
+            save_progress(tag, "null")
+        if watermark:
+            save_watermark(tag, watermark)
+
+    save_rows([], tag, commit)
+
+
+def qa_extractor(tag: str, start_page: int, page_size: int = 100, since: int = None) -> int:
     """Fetch questions from StackOverflow for a given tag.
 
+    With `since` set, only questions active since that time are fetched (incremental sync). They are
+    processed again even if seen before, since new activity usually means new or edited answers.
+
     Args:
         tag (str): The tag to search for on StackOverflow.
         start_page (int): The starting page number for the API request.
         page_size (int, optional): Number of results per page. Defaults to 100.
+        since (int, optional): Unix timestamp of the tag's activity watermark. Defaults to None.
         
 
     Returns:
         int: Updated request count after fetching questions.
     """
-    api_url = "https://api.stackexchange.com/2.3/search/advanced"
+    api_url = f"{API_BASE_URL}/search/advanced"
     questions = []
     
-    processed_question_ids = load_processed_question_ids()
+    processed_question_ids = load_processed_question_ids() if since is None else set()
+    cleaning_stage = get_html_stage()
     request_count = 0
+    # The previous page is saved once its HTML is cleaned, while the next page is being fetched
+    pending_page = None
+    watermark = 0  # Newest activity seen by this run, saved once the tag has no more pages
     
-    while True:
-        if request_count >= DAILY_REQUEST_LIMIT:
-            break
-        
-        params = {
-            'page': start_page,
-            'pagesize': page_size,
-            'order': 'desc',
-            'sort': 'activity',
-            'answers': 1,
-            'tagged': tag,
-            'site': 'stackoverflow',
-            'filter': 'withbody',
-            'key': API_KEY
-        }
-        
-        response_data = fetch_with_backoff(api_url, params)
-        request_count += 1
-        
-        if not response_data or not response_data['items']:
-            save_progress(tag, "null")
-            break
-        
-        QA_list = []
-        if response_data:
+    try:
+        while True:
+            try:
+                response_data = fetch_with_backoff(api_url, search_params(tag, start_page, page_size, since))
+                request_count += 1
+                if response_data and response_data['items']:
+                    unseen_questions = select_unseen_questions(response_data['items'], processed_question_ids)
+                    answers_by_question = fetch_answers_batch([question['question_id'] for question in unseen_questions])
+            except QuotaExceededError as e:
+                print(f"{e}. Stopping tag '{tag}' at page {start_page}.")
+                break
+
+            if not response_data or not response_data['items']:
+                if pending_page:  # Saved first, so its checkpoint does not overwrite the end of the tag
+                    page, page_data, page_rows, page_ids = pending_page
+                    pending_page = None
+                    save_page(tag, page, page_data, page_rows.result(), page_ids, since is not None)
+                save_tag_end(tag, since is not None, watermark if response_data is not None else None)
+                break
+
             questions.extend(response_data['items'])
-            
-            for question in response_data['items']:
-                question_id = question['question_id']
-                if question_id in processed_question_ids:
-                    continue
-                if question['answer_count'] > 0:
-                    question_text = remove_html_tags(question['body'])
-                    answers = fetch_answers(question_id)
-                    
-                    for count, answer in enumerate(answers, start=1):
-                        if count > 3:
-                            break
-                        if answer['score'] < 0:
-                            continue
-                        answer_text = remove_html_tags(answer['body'])
-                    
-                        QA_list.append({
-                            "question": question_text,
-                            "answer": answer_text,
-                            "tag": tag,
-                        })
-                    
-                    processed_question_ids.add(question_id)
-                    
+            cleaned_rows = cleaning_stage.submit(build_qa_rows(tag, unseen_questions, answers_by_question))
+            if pending_page:
+                page, page_data, page_rows, page_ids = pending_page
+                save_page(tag, page, page_data, page_rows.result(), page_ids, since is not None, watermark)
+            watermark = max(watermark, newest_activity(response_data['items']))
+            pending_page = (start_page, response_data, cleaned_rows,
+                            [question['question_id'] for question in unseen_questions])
+
             print(f"Fetched {len(response_data['items'])} questions from page {start_page} for tag '{tag}'. Total so far: {len(questions)}")
-            save_to_csv(QA_list, CSV_FILE)
-            save_processed_question_ids(processed_question_ids)
-            
-            has_more = response_data.get('has_more', False)
-            if not has_more:
-                save_progress(tag, "finished")
+            if not response_data.get('has_more', False):
                 break
-            
+
             start_page += 1
-            save_progress(tag, start_page)
             time.sleep(REQUEST_DELAY)
-        else:
-            break
-        if request_count >= DAILY_REQUEST_LIMIT:
-            break
+    finally:
+        if pending_page:
+            page, page_data, page_rows, page_ids = pending_page
+            save_page(tag, page, page_data, page_rows.result(), page_ids, since is not None, watermark)
     
     print(f"Request count for question is: {request_count}")
     return request_count
@@ -193,7 +807,7 @@ def fetch_answers(question_id: int) -> list:
     Returns:
         list: List of answer items if successful, otherwise an empty list.
     """
-    api_url = f"https://api.stackexchange.com/2.3/questions/{question_id}/answers"
+    api_url = f"{API_BASE_URL}/questions/{question_id}/answers"
     params = {
         'order': 'desc',
         'sort': 'votes',
@@ -205,52 +819,346 @@ def fetch_answers(question_id: int) -> list:
     response_data = fetch_with_backoff(api_url, params)
     return response_data['items'] if response_data else []
 
+def fetch_answers_batch(question_ids: list[int]) -> dict[int, list]:
+    """Fetch answers for several questions at once, grouped by question ID.
+
+    The StackExchange API accepts up to ANSWER_BATCH_SIZE semicolon-separated IDs per call, so a whole page
+    of questions needs a single request (plus one per extra page of answers). Answers are requested sorted
+    by votes, so each group keeps the same order `fetch_answers` would return.
+
+    Args:
+        question_ids (List[int]): The IDs of the questions to fetch answers for.
+
+    Returns:
+        Dict[int, list]: Answer items for each question ID that has answers.
+    """
+    answers_by_question = {}
+    for start in range(0, len(question_ids), ANSWER_BATCH_SIZE):
+        batch = question_ids[start:start + ANSWER_BATCH_SIZE]
+        api_url = f"{API_BASE_URL}/questions/{';'.join(str(i) for i in batch)}/answers"
+        page = 1
+        while True:
+            response_data = fetch_with_backoff(api_url, answers_params(page))
+            if not response_data:
+                break
+            for answer in response_data.get('items', []):
+                answers_by_question.setdefault(answer['question_id'], []).append(answer)
+            if not response_data.get('has_more', False):
+                break
+            page += 1
+    return answers_by_question
+
 def remove_html_tags(text: str) -> str:
     """Remove HTML tags from a given text.
 
+    Uses lxml for speed and keeps code blocks as fenced text; falls back to BeautifulSoup for input lxml
+    cannot parse.
+
     Args:
         text (str): The HTML text to be processed.
 
     Returns:
         str: The text with HTML tags removed.
     """
-    soup = BeautifulSoup(text, "html.parser")
-    return soup.get_text()
+    if not text or not text.strip():
+        return ""
+    try:
+        root = lxml.html.fragment_fromstring(text, create_parent='div')
+    except (etree.ParserError, ValueError):
+        soup = BeautifulSoup(text, "html.parser")
+        return soup.get_text()
+    for pre in root.iter('pre'):
+        code = pre.text_content().rstrip('\n')
+        tail = pre.tail
+        pre.clear()
+        pre.text = f"\n```\n{code}\n```\n"
+        pre.tail = tail
+    return root.text_content()
 
-def extract_all_projects(tags: list[str]) -> None:
+def extract_all_projects(tags: list[str], mode: str = None, incremental: bool = None) -> None:
     """Extract QA pairs for multiple tags.
 
     Args:
         tags (List[str]): List of tags to process.
+        mode (str, optional): "threads" or "async". Defaults to CRAWL_MODE.
+        incremental (bool, optional): Also sync finished tags from their activity watermark.
+            Defaults to SYNC_MODE == "incremental".
 
     Returns:
         None
     """
+    if incremental is None:
+        incremental = SYNC_MODE == "incremental"
+    if (mode or CRAWL_MODE) == "async":
+        asyncio.run(extract_all_projects_async(tags, incremental=incremental))
+        return
+
     progress = load_progress()
-    all_tags_done = True
+    all_tags_done = all(progress.get(tag) in ("null", "finished") for tag in tags)
+    watermarks = load_watermarks() if incremental else None
     
     with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
         futures = []
-        for tag in tags:
-            if progress.get(tag) == "null" or progress.get(tag) == "finished": 
-                continue
-            else: 
-                all_tags_done = False
-                start_page = progress.get(tag, 1)
-                futures.append(executor.submit(qa_extractor, tag, start_page))
+        for tag, start_page, since in schedule_tags(tags, progress, request_budget.remaining(), watermarks):
+            futures.append(executor.submit(qa_extractor, tag, start_page, since=since))
         
         for future in as_completed(futures):
             try:
                 future.result()
             except Exception as e:
                 print(f"Error occurred: {e}")
+    close_csv_writers()
+    close_parquet_writer()
+    shutdown_html_stage()
+    request_budget.flush()
+    if incremental:
+        compact_csv(CSV_FILE)
                 
-    if all_tags_done:
+    if all_tags_done and not incremental:
+        print("We have reached all question-answer data from StackOverflow.")
+
+
+async def fetch_answers_batch_async(session: aiohttp.ClientSession, question_ids: list[int]) -> dict[int, list]:
+    """Asynchronous variant of `fetch_answers_batch`.
+
+    Args:
+        session (aiohttp.ClientSession): The shared client session.
+        question_ids (List[int]): The IDs of the questions to fetch answers for.
+
+    Returns:
+        Dict[int, list]: Answer items for each question ID that has answers.
+    """
+    answers_by_question = {}
+    for start in range(0, len(question_ids), ANSWER_BATCH_SIZE):
+        batch = question_ids[start:start + ANSWER_BATCH_SIZE]
+        api_url = f"{API_BASE_URL}/questions/{';'.join(str(i) for i in batch)}/answers"
+        page = 1
+        while True:
+            response_data = await fetch_with_backoff_async(session, api_url, answers_params(page))
+            for answer in response_data.get('items', []):
+                answers_by_question.setdefault(answer['question_id'], []).append(answer)
+            if not response_data.get('has_more', False):
+                break
+            page += 1
+    return answers_by_question
+
+
+async def qa_extractor_async(session: aiohttp.ClientSession, tag: str, start_page: int, page_size: int = 100,
+                             since: int = None) -> int:
+    """Asynchronous variant of `qa_extractor`.
+
+    Args:
+        session (aiohttp.ClientSession): The shared client session.
+        tag (str): The tag to search for on StackOverflow.
+        start_page (int): The starting page number for the API request.
+        page_size (int, optional): Number of results per page. Defaults to 100.
+        since (int, optional): Unix timestamp of the tag's activity watermark. Defaults to None.
+
+    Returns:
+        int: Number of question pages requested.
+    """
+    api_url = f"{API_BASE_URL}/search/advanced"
+    processed_question_ids = load_processed_question_ids() if since is None else set()
+    request_count = 0
+    question_count = 0
+    watermark = 0  # Newest activity seen by this run, saved once the tag has no more pages
+
+    while True:
+        try:
+            response_data = await fetch_with_backoff_async(session, api_url, search_params(tag, start_page, page_size, since))
+            request_count += 1
+            if response_data and response_data['items']:
+                unseen_questions = select_unseen_questions(response_data['items'], processed_question_ids)
+                answers_by_question = await fetch_answers_batch_async(
+                    session, [question['question_id'] for question in unseen_questions])
+        except QuotaExceededError as e:
+            print(f"{e}. Stopping tag '{tag}' at page {start_page}.")
+            break
+
+        if not response_data or not response_data['items']:
+            await asyncio.to_thread(save_tag_end, tag, since is not None, watermark if response_data is not None else None)
+            break
+
+        question_count += len(response_data['items'])
+        QA_list = await get_html_stage().clean_async(build_qa_rows(tag, unseen_questions, answers_by_question))
+
+        print(f"Fetched {len(response_data['items'])} questions from page {start_page} for tag '{tag}'. Total so far: {question_count}")
+        # File appends and checkpoint commits run in a thread, off the event loop
+        if not await asyncio.to_thread(save_page, tag, start_page, response_data, QA_list,
+                                       [question['question_id'] for question in unseen_questions],
+                                       since is not None, watermark):
+            break
+        watermark = max(watermark, newest_activity(response_data['items']))
+        start_page += 1
+
+    return request_count
+
+
+async def extract_all_projects_async(tags: list[str], concurrency: int = ASYNC_CONCURRENCY,
+                                     incremental: bool = False) -> None:
+    """Extract QA pairs for multiple tags with asyncio and a shared aiohttp connection pool.
+
+    Up to `concurrency` tags are crawled at the same time; the overall request rate is limited by the
+    shared token bucket rather than by the number of tasks.
+
+    Args:
+        tags (List[str]): List of tags to process.
+        concurrency (int, optional): Maximum number of tags crawled concurrently. Defaults to ASYNC_CONCURRENCY.
+        incremental (bool, optional): Also sync finished tags from their activity watermark. Defaults to False.
+
+    Returns:
+        None
+    """
+    progress = load_progress()
+    if not incremental and all(progress.get(tag) in ("null", "finished") for tag in tags):
         print("We have reached all question-answer data from StackOverflow.")
+        return
+    pending = schedule_tags(tags, progress, request_budget.remaining(), load_watermarks() if incremental else None)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def crawl(tag: str, start_page: int, since: int) -> int:
+            async with semaphore:
+                return await qa_extractor_async(session, tag, start_page, since=since)
+
+        results = await asyncio.gather(*(crawl(*task) for task in pending), return_exceptions=True)
+
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Error occurred: {result}")
+    close_csv_writers()
+    close_parquet_writer()
+    shutdown_html_stage()
+    request_budget.flush()
+    if incremental:
+        compact_csv(CSV_FILE)
+
+class CSVAppendWriter:
+    """Append-only CSV writer that keeps the output file open between pages.
+
+    The header is written once when a file is created; afterwards every call only appends the new rows,
+    so the cost of a write does not depend on the size of the file. Rows are flushed after each write
+    and fsynced every `fsync_interval` writes. With `shard_max_rows` set, the writer rotates to a new
+    numbered shard (e.g. `cncf_stackoverflow_qas_00001.csv`) once the current one holds that many rows.
+    """
+
+    def __init__(self, filename: str, fieldnames: list[str] = None, fsync_interval: int = CSV_FSYNC_INTERVAL,
+                 shard_max_rows: int = CSV_SHARD_MAX_ROWS):
+        self.filename = filename
+        self.fieldnames = fieldnames or CSV_COLUMNS
+        self.fsync_interval = fsync_interval
+        self.shard_max_rows = shard_max_rows
+        self.path = None
+        self._lock = threading.Lock()
+        self._file = None
+        self._writer = None
+        self._shard_index = 0
+        self._rows_in_shard = 0
+        self._writes_since_fsync = 0
+
+    def _shard_path(self, index: int) -> str:
+        base, ext = os.path.splitext(self.filename)
+        return f"{base}_{index:05d}{ext}"
+
+    def _next_path(self) -> str:
+        if not self.shard_max_rows:
+            return self.filename
+        # Each run starts a fresh shard after the ones already on disk
+        self._shard_index += 1
+        while os.path.exists(self._shard_path(self._shard_index)):
+            self._shard_index += 1
+        return self._shard_path(self._shard_index)
+
+    def _open(self) -> None:
+        self.path = self._next_path()
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        fieldnames = self.fieldnames
+        has_header = os.path.exists(self.path) and os.path.getsize(self.path) > 0
+        if has_header:
+            # Keep the column order of an existing file
+            with open(self.path, 'r', newline='', encoding='utf-8') as f:
+                fieldnames = next(csv.reader(f), None) or fieldnames
+        self._file = open(self.path, 'a', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames, extrasaction='ignore', lineterminator='\n')
+        if not has_header:
+            self._writer.writeheader()
+        self._rows_in_shard = 0
+
+    def _close_file(self) -> None:
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        self._writer = None
+        self._writes_since_fsync = 0
+
+    def write_rows(self, rows: list[dict]) -> None:
+        """Append rows to the current file, rotating the shard if it is full.
+
+        Args:
+            rows (List[dict]): The rows to be appended.
+        """
+        if not rows:
+            return
+        with self._lock:
+            if self._file is not None and self.shard_max_rows and self._rows_in_shard >= self.shard_max_rows:
+                self._close_file()
+            if self._file is None:
+                self._open()
+            self._writer.writerows(rows)
+            self._rows_in_shard += len(rows)
+            self._file.flush()
+            self._writes_since_fsync += 1
+            if self._writes_since_fsync >= self.fsync_interval:
+                os.fsync(self._file.fileno())
+                self._writes_since_fsync = 0
+
+    def close(self) -> None:
+        """Flush, fsync and close the current file."""
+        with self._lock:
+            self._close_file()
+
+
+csv_writers = {}
+csv_writers_lock = threading.Lock()
+
+
+def get_csv_writer(filename: str) -> CSVAppendWriter:
+    """Return the shared writer for a CSV file, creating it on first use.
+
+    Args:
+        filename (str): The name of the CSV file.
+
+    Returns:
+        CSVAppendWriter: The writer appending to the file.
+    """
+    with csv_writers_lock:
+        if filename not in csv_writers:
+            csv_writers[filename] = CSVAppendWriter(filename)
+        return csv_writers[filename]
+
+
+def close_csv_writers() -> None:
+    """Flush and close every open CSV writer."""
+    with csv_writers_lock:
+        writers = list(csv_writers.values())
+        csv_writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+atexit.register(close_csv_writers)
+
 
 def save_to_csv(data: list[dict], filename: str) -> None:
     """
-    Save a list of dictionaries to a CSV file.
+    Append a list of dictionaries to a CSV file.
 
     Args:
         data (List[dict]): The data to be saved.
@@ -259,31 +1167,228 @@ def save_to_csv(data: list[dict], filename: str) -> None:
     Returns:
         None
     """
-    with lock:  # Ensure only one thread writes to the file at a time
-        if os.path.exists(filename) and os.path.getsize(filename) > 0:
-            try:
-                df = pd.read_csv(filename)
-                df = pd.concat([df, pd.DataFrame(data)], ignore_index=True)
-            except pd.errors.EmptyDataError:
-                df = pd.DataFrame(data)
-        else:
-            df = pd.DataFrame(data)
-        df.to_csv(filename, index=False)
+    get_csv_writer(filename).write_rows(data)
+
+class ParquetDatasetWriter:
+    """Writes question/answer rows to a Parquet dataset partitioned by tag.
+
+    Rows are buffered per tag and written in batches of at least `row_group_size` rows, each batch as its own
+    file (`<root>/tag=<tag>/part-<run>-<n>.parquet`), with IDs, scores, answer ranks and timestamps as typed
+    columns. Files are written under a hidden temporary name and renamed once complete, so readers only ever
+    see complete files. A batch always holds whole pages, and the `on_saved` callbacks of a tag run once
+    its buffered rows are in a published file. Rows appended by incremental syncs land in new files;
+    readers keep the rows with the latest `last_activity_date` per question and tag.
+    """
+
+    def __init__(self, root: str, row_group_size: int = PARQUET_ROW_GROUP_SIZE):
+        if pa is None:
+            raise ImportError("pyarrow is required for OUTPUT_FORMAT=parquet")
+        self.root = root
+        self.row_group_size = row_group_size
+        self.schema = pa.schema([
+            ('question_id', pa.int64()),
+            ('answer_id', pa.int64()),
+            ('answer_rank', pa.int16()),
+            ('score', pa.int32()),
+            ('creation_date', pa.timestamp('s', tz='UTC')),
+            ('last_activity_date', pa.timestamp('s', tz='UTC')),
+            ('question', pa.string()),
+            ('answer', pa.string()),
+        ])
+        self._run_id = f"{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+        self._buffers = {}
+        self._callbacks = {}  # Tag -> callbacks waiting for its buffered rows
+        self._parts = {}  # Tag -> number of files written by this run
+        self._lock = threading.Lock()
+
+    def _partition_dir(self, tag: str) -> str:
+        return os.path.join(self.root, f"tag={quote(tag, safe='')}")
+
+    def _flush(self, tag: str) -> list:
+        rows = self._buffers.pop(tag, [])
+        if rows:
+            folder = self._partition_dir(tag)
+            os.makedirs(folder, exist_ok=True)
+            part = self._parts.get(tag, 0)
+            self._parts[tag] = part + 1
+            path = os.path.join(folder, f"part-{self._run_id}-{part:05d}.parquet")
+            temp_path = os.path.join(folder, f".part-{self._run_id}-{part:05d}.parquet.tmp")
+            table = pa.Table.from_pylist(rows, schema=self.schema)
+            pq.write_table(table, temp_path, row_group_size=self.row_group_size)
+            os.replace(temp_path, path)
+        return self._callbacks.pop(tag, [])
+
+    def write_rows(self, rows: list[dict], tag: str = None, on_saved=None) -> None:
+        """Buffer rows and write a file for every tag whose buffer is full.
+
+        Args:
+            rows (List[dict]): The rows to be written.
+            tag (str, optional): The tag of the rows, needed for `on_saved` when `rows` is empty. Defaults to None.
+            on_saved (Callable[[], None], optional): Called once the rows are on disk. Defaults to None.
+        """
+        callbacks = []
+        with self._lock:
+            for row in rows:
+                self._buffers.setdefault(row['tag'], []).append(row)
+            if on_saved is not None:
+                self._callbacks.setdefault(tag or rows[0]['tag'], []).append(on_saved)
+            for buffered_tag in {row['tag'] for row in rows} | ({tag} if tag else set()):
+                buffer = self._buffers.get(buffered_tag, [])
+                if not buffer or len(buffer) >= self.row_group_size:
+                    callbacks.extend(self._flush(buffered_tag))
+        for callback in callbacks:
+            callback()
+
+    def close(self) -> None:
+        """Write the remaining rows and run the waiting callbacks."""
+        callbacks = []
+        with self._lock:
+            for tag in set(self._buffers) | set(self._callbacks):
+                callbacks.extend(self._flush(tag))
+        for callback in callbacks:
+            callback()
+
+
+parquet_writer = None
+
+
+def save_rows(data: list[dict], tag: str = None, on_saved=None) -> None:
+    """Save question/answer rows with the configured output backend (OUTPUT_FORMAT).
+
+    The Parquet backend buffers rows, so anything that must not be saved before the rows (e.g. the progress
+    of the page they came from) is passed as `on_saved`. The callbacks of a tag run in the order they were given.
+
+    Args:
+        data (List[dict]): The rows to be saved.
+        tag (str, optional): The tag of the rows, needed for `on_saved` when `data` is empty. Defaults to None.
+        on_saved (Callable[[], None], optional): Called once the rows are on disk. Defaults to None.
+
+    Returns:
+        None
+    """
+    global parquet_writer
+    if OUTPUT_FORMAT != "parquet":
+        save_to_csv(data, CSV_FILE)
+        if on_saved is not None:
+            on_saved()
+        return
+    with lock:
+        if parquet_writer is None:
+            parquet_writer = ParquetDatasetWriter(PARQUET_DIR)
+    parquet_writer.write_rows(data, tag, on_saved)
+
+
+def close_parquet_writer() -> None:
+    """Write the buffered rows of the Parquet backend and save the progress waiting for them."""
+    global parquet_writer
+    with lock:
+        writer, parquet_writer = parquet_writer, None
+    if writer is not None:
+        writer.close()
+
+
+atexit.register(close_parquet_writer)
+
+
+class CheckpointStore:
+    """Per-tag crawl checkpoints (next page or state, and activity watermark) in a SQLite database.
+
+    The database runs in WAL mode and every checkpoint is a single-row upsert in its own transaction, so
+    checkpointing costs the same for one tag or thousands, a crash never leaves a half-written file, and
+    crawler threads do not wait on the global lock. Each thread uses its own connection. The JSON progress file
+    of earlier versions is imported when the database is created.
+    """
+
+    def __init__(self, filename: str, legacy_progress_file: str = None):
+        self.filename = filename
+        self._local = threading.local()
+        folder_path = os.path.dirname(filename)
+        if folder_path:
+            os.makedirs(folder_path, exist_ok=True)
+        is_new = not os.path.exists(filename)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            # `page` has no declared type so page numbers stay integers and states ("finished", "null") strings
+            conn.execute("CREATE TABLE IF NOT EXISTS checkpoints (tag TEXT PRIMARY KEY, page, watermark INTEGER)")
+        if is_new:
+            self._import_legacy(legacy_progress_file)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.filename, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _import_legacy(self, progress_file: str) -> None:
+        if not progress_file:
+            return
+        try:
+            with open(progress_file, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        for tag, page in data.items():
+            self.save_page(tag, page)
+        print(f"Imported {len(data)} checkpoints from {progress_file}")
+
+    def _column(self, column: str) -> dict:
+        rows = self._connection().execute(f"SELECT tag, {column} FROM checkpoints WHERE {column} IS NOT NULL")
+        return dict(rows.fetchall())
+
+    def progress(self) -> dict:
+        """Return the saved page or state of every tag."""
+        return self._column("page")
+
+    def watermarks(self) -> dict:
+        """Return the activity watermark of every tag."""
+        return self._column("watermark")
+
+    def checkpoint(self, tag: str, page=None, watermark: int = None) -> None:
+        """Atomically save the page or state and raise the activity watermark of a tag.
+
+        Args:
+            tag (str): The tag being processed.
+            page (int | str, optional): The next page number or the tag state. None keeps the saved page.
+            watermark (int, optional): Unix timestamp of the newest activity seen. None keeps the saved one.
+        """
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO checkpoints (tag, page, watermark) VALUES (?, ?, ?) "
+                "ON CONFLICT(tag) DO UPDATE SET "
+                "page = COALESCE(excluded.page, page), "
+                "watermark = NULLIF(MAX(COALESCE(excluded.watermark, 0), COALESCE(watermark, 0)), 0)",
+                (tag, page, watermark),
+            )
+
+    def save_page(self, tag: str, page) -> None:
+        self.checkpoint(tag, page=page)
+
+    def save_watermark(self, tag: str, watermark: int) -> None:
+        self.checkpoint(tag, watermark=watermark)
+
+
+checkpoint_stores = {}
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """Return the checkpoint store of PROGRESS_FILE, opening it on first use."""
+    with lock:
+        store = checkpoint_stores.get(PROGRESS_FILE)
+        if store is None:
+            store = checkpoint_stores[PROGRESS_FILE] = CheckpointStore(PROGRESS_FILE, LEGACY_PROGRESS_FILE)
+        return store
+
 
 def load_progress() -> dict:
-    """Load progress data from file.
+    """Load progress data from the checkpoint store.
 
     Returns:
         dict: Dictionary containing progress data.
     """
-    try:
-        with open(PROGRESS_FILE, 'r') as f:
-            data = json.load(f)
-            return data
-    except FileNotFoundError:
-        return {}
-    except json.JSONDecodeError:
-        return {}
+    return get_checkpoint_store().progress()
 
 def save_progress(tag: str, page: str) -> None:
     """
@@ -296,41 +1401,181 @@ def save_progress(tag: str, page: str) -> None:
     Returns:
         None
     """
-    with lock:  # Ensure only one thread writes to the file at a time
-        folder_path = 'sources/stackoverflow_Q&A'
-        if not os.path.exists(folder_path):
-            os.makedirs(folder_path)
-        progress = load_progress()
-        progress[tag] = page
-        with open(PROGRESS_FILE, 'w') as f:
-            json.dump(progress, f)
+    get_checkpoint_store().save_page(tag, page)
 
 
-def load_processed_question_ids() -> set:
-    """Load processed question IDs from file.
+def load_watermarks() -> dict:
+    """Load the last activity timestamp seen for each tag.
 
     Returns:
-        set: Set of processed question IDs.
+        dict: Dictionary mapping tags to Unix timestamps.
     """
-    try:
-        if os.path.getsize(PROCESSED_IDS_FILE) == 0:
-            return set()
-        with open(PROCESSED_IDS_FILE, 'r') as f:
-            return set(json.load(f))
-    except FileNotFoundError:
-        return set()
-    except json.JSONDecodeError:
-        return set()
-
-def save_processed_question_ids(processed_ids: set):
-    """Save processed question IDs to file.
+    return get_checkpoint_store().watermarks()
+
+
+def save_watermark(tag: str, last_activity: int) -> None:
+    """Raise the activity watermark of a tag to the given timestamp.
+
+    Args:
+        tag (str): The tag being processed.
+        last_activity (int): Unix timestamp of the newest activity seen for the tag.
+
+    Returns:
+        None
+    """
+    get_checkpoint_store().save_watermark(tag, last_activity)
+
+
+def compact_csv(filename: str) -> None:
+    """Drop rows superseded by an incremental sync.
+
+    An incremental sync appends the current answers of every question with new activity. For each question ID
+    and tag only the rows with the latest `last_activity_date` are kept, so the rows a question has under other
+    tags are not affected by the sync of one tag, and of those only the last row of each answer, so answers
+    fetched twice are not duplicated. Rows without a question ID are kept as they are. Sharded output
+    (CSV_SHARD_MAX_ROWS) is left untouched.
+
+    Args:
+        filename (str): The name of the CSV file.
+
+    Returns:
+        None
+    """
+    if CSV_SHARD_MAX_ROWS or not os.path.exists(filename):
+        return
+    latest = {}  # (question ID, tag) -> latest activity
+    last_rows = {}  # (question ID, answer ID, tag) -> (activity, row number) of the row kept for the answer
+    with open(filename, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        if 'question_id' not in (reader.fieldnames or []):
+            return
+        for number, row in enumerate(reader):
+            if row['question_id']:
+                key = (row['question_id'], row.get('tag'))
+                latest[key] = max(latest.get(key, ''), row['last_activity_date'], key=_activity_key)
+                if row.get('answer_id'):
+                    answer_key = (row['question_id'], row['answer_id'], row.get('tag'))
+                    last_rows[answer_key] = max(last_rows.get(answer_key, (0, -1)),
+                                                (_activity_key(row['last_activity_date']), number))
+
+    temp_filename = f"{filename}.compact.tmp"
+    dropped = 0
+    with open(filename, 'r', newline='', encoding='utf-8') as f, open(temp_filename, 'w', newline='', encoding='utf-8') as out:
+        reader = csv.DictReader(f)
+        writer = csv.DictWriter(out, fieldnames=reader.fieldnames, lineterminator='\n')
+        writer.writeheader()
+        for number, row in enumerate(reader):
+            if row['question_id'] and (
+                    row['last_activity_date'] != latest[(row['question_id'], row.get('tag'))]
+                    or row.get('answer_id') and last_rows[(row['question_id'], row['answer_id'], row.get('tag'))][1] != number):
+                dropped += 1
+                continue
+            writer.writerow(row)
+    os.replace(temp_filename, filename)
+    print(f"Compacted {filename}: dropped {dropped} outdated rows")
+
+
+def _activity_key(value: str) -> int:
+    return int(value) if value else 0
+
+
+class ProcessedQuestionIds:
+    """Set of processed question IDs backed by an append-only log of little-endian int64 values.
+
+    The log is read once into an in-memory set, so membership checks are O(1) and persisting a page
+    only appends the IDs that were not known before. A legacy JSON list of IDs is imported on first use.
+    """
+
+    def __init__(self, filename: str = None, legacy_filename: str = None):
+        self.filename = filename or PROCESSED_IDS_FILE
+        self.legacy_filename = legacy_filename or LEGACY_PROCESSED_IDS_FILE
+        self._ids = set()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if os.path.exists(self.filename):
+            with open(self.filename, 'rb') as f:
+                data = f.read()
+            # Drop a partially written record left behind by a crash
+            usable = len(data) - len(data) % 8
+            if usable != len(data):
+                with open(self.filename, 'r+b') as f:
+                    f.truncate(usable)
+            self._ids.update(self._decode(data[:usable]))
+        elif os.path.exists(self.legacy_filename) and os.path.getsize(self.legacy_filename) > 0:
+            try:
+                with open(self.legacy_filename, 'r') as f:
+                    self.add_many(json.load(f))
+            except json.JSONDecodeError:
+                print(f"Could not read legacy processed question IDs from {self.legacy_filename}")
+
+    @staticmethod
+    def _decode(data: bytes) -> array:
+        ids = array('q')
+        ids.frombytes(data)
+        if sys.byteorder == 'big':
+            ids.byteswap()
+        return ids
+
+    @staticmethod
+    def _encode(question_ids: list[int]) -> bytes:
+        ids = array('q', question_ids)
+        if sys.byteorder == 'big':
+            ids.byteswap()
+        return ids.tobytes()
+
+    def __contains__(self, question_id: int) -> bool:
+        return question_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add_many(self, question_ids: list[int]) -> int:
+        """Persist the given question IDs, skipping the ones already stored.
+
+        Args:
+            question_ids (List[int]): The question IDs to be added.
+
+        Returns:
+            int: Number of IDs that were not stored before.
+        """
+        with self._lock:
+            new_ids = list(dict.fromkeys(int(i) for i in question_ids if int(i) not in self._ids))
+            if not new_ids:
+                return 0
+            folder = os.path.dirname(self.filename)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with open(self.filename, 'ab') as f:
+                f.write(self._encode(new_ids))
+            self._ids.update(new_ids)
+            return len(new_ids)
+
+
+processed_ids_store = None
+
+
+def load_processed_question_ids() -> ProcessedQuestionIds:
+    """Return the processed question ID store shared by all threads, loading it on first use.
+
+    Returns:
+        ProcessedQuestionIds: Set-like store of processed question IDs.
+    """
+    global processed_ids_store
+    with lock:
+        if processed_ids_store is None:
+            processed_ids_store = ProcessedQuestionIds()
+        return processed_ids_store
+
+
+def save_processed_question_ids(question_ids: list[int]) -> None:
+    """Append newly processed question IDs to the shared store.
 
     Args:
-        processed_ids (set): Set of processed question IDs.
+        question_ids (List[int]): Question IDs processed since the last call.
     """
-    with lock:  # Ensure only one thread writes to the file at a time
-        with open(PROCESSED_IDS_FILE, 'w') as f:
-            json.dump(list(processed_ids), f)
+    load_processed_question_ids().add_many(question_ids)
 
 def load_tags() -> list:
     """Load tags from the JSON file if it's not older than the update interval, otherwise from the YAML file.
@@ -345,8 +1590,7 @@ def load_tags() -> list:
             if datetime.now() - last_update < timedelta(days=TAGS_UPDATE_INTERVAL):
                 return tags_data['tags']
     
-    with open("sources/landscape_augmented_repos_websites.yml", 'r') as f:
-        data = yaml.safe_load(f)
+    data = load_landscape("sources/landscape_augmented_repos_websites.yml")
     
     tags = []
     tags_dict = {'Project_name': ""}
@@ -0,0 +1,9 @@
+# This module holds the output paths of stackoverflow_extractor. It has no dependencies, so scripts reading
+# the StackOverflow Q&A data (e.g. preprocessing) can import it without loading the crawler.
+
+# Constants:
+# - CSV_FILE: The CSV file of the question/answer rows.
+# - PARQUET_DIR: The Parquet dataset of the question/answer rows, partitioned by tag (OUTPUT_FORMAT=parquet).
+
+CSV_FILE = 'sources/stackoverflow_Q&A/cncf_stackoverflow_qas.csv'
+PARQUET_DIR = 'sources/stackoverflow_Q&A/cncf_stackoverflow_qas_parquet'
@@ -0,0 +1,193 @@
+# This module records which URLs were downloaded. It is shared by landscape_extractor and webpages_extractor.
+
+# Key Features:
+# 1. Durable state: A SQLite database keeps the status, content hash, ETag, Last-Modified and fetch time of
+#    every URL. The plain-text caches of earlier versions are imported when the database is created.
+# 2. Batched commits: Results are written in batches of BATCH_SIZE rows (or after FLUSH_INTERVAL seconds)
+#    instead of opening and appending to a file for every URL.
+# 3. In-flight claims: A thread claims a URL before downloading it, so each URL is fetched exactly once even
+#    when several projects list it at the same time.
+# 4. Conditional re-fetch: Entries older than `max_age` are claimable again. Their ETag and Last-Modified are
+#    sent as validators, so unchanged documents come back as 304 Not Modified without a body.
+
+# Modules:
+# - sqlite3: For the state database.
+# - hashlib: For hashing downloaded content.
+# - threading: For guarding claims and pending rows.
+# - time: For fetch times and flush intervals.
+
+# Functions:
+# - UrlStateStore: The URL state store.
+# - UrlStateStore.claim(url): Claims a URL for downloading and returns the validators for a conditional request.
+# - UrlStateStore.complete(url, response): Records a finished download.
+# - UrlStateStore.fail(url): Releases the claim of a failed download.
+# - UrlStateStore.snapshot(): Returns the recorded state of every URL.
+# - UrlStateStore.close(): Commits the pending rows and closes the database.
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+BATCH_SIZE = 100  # Rows per commit
+FLUSH_INTERVAL = 5  # Seconds before pending rows are committed anyway
+DONE = 'done'
+FAILED = 'failed'
+COLUMNS = ('status', 'sha256', 'etag', 'last_modified', 'fetched_at')
+
+
+class UrlStateStore:
+    """
+    Download state of URLs in a SQLite database, with in-flight claims and batched commits.
+
+    The state is loaded into memory when the store is opened. Claims and lookups are served from memory,
+    finished downloads are committed in batches. The store is safe to use from many threads of one process.
+
+    Args:
+        filename (str): The path of the SQLite database.
+        legacy_cache_file (str, optional): A text file with one downloaded URL per line, imported when the
+            database is created. Defaults to None.
+        max_age (float, optional): Seconds after which a downloaded URL is fetched again (conditionally).
+            None never fetches a downloaded URL again. Defaults to None.
+    """
+
+    def __init__(self, filename: str, legacy_cache_file: str = None, max_age: float = None):
+        self.filename = filename
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._claimed = set()
+        self._pending = []
+        self._last_flush = time.monotonic()
+        folder_path = os.path.dirname(filename)
+        if folder_path:
+            os.makedirs(folder_path, exist_ok=True)
+        is_new = not os.path.exists(filename)
+        self._conn = sqlite3.connect(filename, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS url_state (url TEXT PRIMARY KEY, status TEXT NOT NULL, sha256 TEXT, "
+                "etag TEXT, last_modified TEXT, fetched_at REAL)")
+        self._states = {
+            row[0]: dict(zip(COLUMNS, row[1:]))
+            for row in self._conn.execute(f"SELECT url, {', '.join(COLUMNS)} FROM url_state")
+        }
+        if is_new and legacy_cache_file:
+            self._import_legacy(legacy_cache_file)
+
+    def _import_legacy(self, legacy_cache_file: str) -> None:
+        try:
+            with open(legacy_cache_file, 'r') as f:
+                urls = {line.strip() for line in f if line.strip()}
+        except FileNotFoundError:
+            return
+        now = time.time()
+        with self._lock:
+            for url in urls:
+                self._record(url, {'status': DONE, 'sha256': None, 'etag': None, 'last_modified': None,
+                                   'fetched_at': now})
+            self._flush()
+        print(f"Imported {len(urls)} cached URLs from {legacy_cache_file}")
+
+    def _is_fresh(self, state: dict) -> bool:
+        if state is None or state['status'] != DONE:
+            return False
+        return self.max_age is None or time.time() - (state['fetched_at'] or 0) < self.max_age
+
+    def claim(self, url: str) -> dict[str, str]:
+        """
+        Claims a URL for downloading. Fails if the URL is being downloaded by another thread or was
+        downloaded less than `max_age` seconds ago.
+
+        Args:
+            url (str): The URL.
+
+        Returns:
+            Dict[str, str]: The headers of a conditional request (If-None-Match, If-Modified-Since), empty for
+            a URL that was never downloaded. None if the URL must not be downloaded.
+        """
+        with self._lock:
+            state = self._states.get(url)
+            if url in self._claimed or self._is_fresh(state):
+                return None
+            self._claimed.add(url)
+        headers = {}
+        if state is not None and state['status'] == DONE:
+            if state['etag']:
+                headers['If-None-Match'] = state['etag']
+            if state['last_modified']:
+                headers['If-Modified-Since'] = state['last_modified']
+        return headers
+
+    def complete(self, url: str, response=None) -> None:
+        """
+        Records a finished download and releases its claim. A 304 Not Modified response keeps the recorded hash.
+
+        Args:
+            url (str): The URL.
+            response (requests.Response, optional): The response, for its content hash and validators. Defaults to None.
+        """
+        previous = self._states.get(url) or {}
+        state = {'status': DONE, 'sha256': previous.get('sha256'), 'etag': previous.get('etag'),
+                 'last_modified': previous.get('last_modified'), 'fetched_at': time.time()}
+        if response is not None:
+            if response.status_code != 304:
+                state['sha256'] = hashlib.sha256(response.content).hexdigest()
+            headers = getattr(response, 'headers', None) or {}
+            state['etag'] = headers.get('ETag') or state['etag']
+            state['last_modified'] = headers.get('Last-Modified') or state['last_modified']
+        with self._lock:
+            self._record(url, state)
+            self._claimed.discard(url)
+            if len(self._pending) >= BATCH_SIZE or time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+                self._flush()
+
+    def fail(self, url: str) -> None:
+        """
+        Releases the claim of a failed download. A URL that was never downloaded is recorded as failed and
+        stays claimable; a previously downloaded URL keeps its state.
+
+        Args:
+            url (str): The URL.
+        """
+        with self._lock:
+            self._claimed.discard(url)
+            if url not in self._states:
+                self._record(url, {'status': FAILED, 'sha256': None, 'etag': None, 'last_modified': None,
+                                   'fetched_at': time.time()})
+
+    def snapshot(self) -> dict[str, dict]:
+        """
+        Returns the recorded state of every URL.
+
+        Returns:
+            Dict[str, Dict]: The state (status, sha256, etag, last_modified, fetched_at) of every URL.
+        """
+        with self._lock:
+            return {url: dict(state) for url, state in self._states.items()}
+
+    def _record(self, url: str, state: dict) -> None:
+        self._states[url] = state
+        self._pending.append((url, *(state[column] for column in COLUMNS)))
+
+    def _flush(self) -> None:
+        if self._pending:
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO url_state (url, {', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                    self._pending)
+            self._pending.clear()
+        self._last_flush = time.monotonic()
+
+    def flush(self) -> None:
+        """Commits the pending rows."""
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        """Commits the pending rows and closes the database."""
+        with self._lock:
+            self._flush()
+            self._conn.close()
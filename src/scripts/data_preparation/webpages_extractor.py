@@ -1,25 +1,39 @@
 """
-This script downloads text content from web pages and Google Docs URLs specified in a YAML file. It utilizes 
-multithreading for concurrent downloads and manages caching to avoid redundant downloads.
+This script downloads text content from web pages and Google Docs URLs specified in a YAML file. It crawls
+with an asyncio pipeline and manages caching to avoid redundant downloads.
+The pages of all projects are fetched concurrently through one pooled aiohttp client, limited to
+MAX_CONNECTIONS connections in total and PER_HOST_CONNECTIONS per host, with timeouts and retries. Fetched
+HTML is parsed to Markdown in a pool of PARSE_WORKERS processes (or in a thread where no process pool can be
+started), so parsing does not stall the crawl. Writes to the content store and the download state store run in
+threads as well, off the event loop.
+Downloaded documents go through the content store shared with landscape_extractor, so a content is written
+to the output directory once; the tags of its duplicates are recorded in the store's manifest.
+The download state of every URL is kept in a SQLite store shared with landscape_extractor: URLs are claimed
+before downloading, so each is fetched once, and pages older than DOWNLOAD_CACHE_MAX_AGE seconds are fetched
+again with a conditional request.
 
 Dependencies:
-- yaml
+- landscape_loader
+- content_store
+- url_state
 - os
 - shutil
-- requests
+- asyncio
+- aiohttp
 - BeautifulSoup
 - pandas
-- threading
+- concurrent.futures
 - re
 - multiprocessing
 
 Functions:
-- `load_cache()`: Loads URLs from a cache file to skip redundant downloads.
-- `save_cache(url)`: Saves a URL to the cache file after downloading its content.
-- `save_doc_to_pdf(url, output_directory, tags)`: Downloads a Google Doc as a PDF and saves it.
-- `save_strings_to_md(string, output_dir, tags)`: Saves extracted text content to a Markdown file.
-- `downloader(url, output_directory, tags, semaphore, cache)`: Handles downloading content from URLs.
-- `extract_text(links, output_directory, tags, cache)`: Manages multithreaded extraction of text content.
+- `load_cache()`: Opens the download state store to skip redundant downloads.
+- `save_strings_to_md(string, output_dir, tags, url)`: Saves extracted text content to a Markdown file.
+- `html_to_markdown(content)`: Extracts the paragraphs, code blocks and tables of an HTML page as Markdown.
+- `fetch(session, url, headers)`: Fetches a URL with retries.
+- `downloader(session, url, output_directory, tags, cache, parse_pool)`: Handles downloading content from a URL.
+- `crawl(jobs, output_directory, cache)`: Downloads the content of (url, tags) jobs concurrently.
+- `extract_text(links, output_directory, tags, cache)`: Downloads the content of the links of one project.
 - `download_files_from_yaml(yaml_file, output_directory)`: Downloads content from URLs specified in a YAML file.
 
 Usage:
@@ -27,64 +41,59 @@ Usage:
 - Run the script to download text content from web pages and Google Docs, organizing files by category and subcategory.
 """
 
-import yaml
 import os
 import shutil
-import requests
+import asyncio
+import aiohttp
 from bs4 import BeautifulSoup
 import pandas as pd
-import threading
 import re
 import multiprocessing
-from typing import Any
-
-CACHE_FILE = 'webpages_extractor_cache.txt'
-
-
-def load_cache() -> set[str]:
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+try:
+    from src.scripts.data_preparation.landscape_loader import load_landscape
+    from src.scripts.data_preparation.content_store import ContentStore
+    from src.scripts.data_preparation.url_state import UrlStateStore
+except ImportError:  # Run as a script from its own directory
+    from landscape_loader import load_landscape
+    from content_store import ContentStore
+    from url_state import UrlStateStore
+
+CACHE_FILE = 'webpages_extractor_cache.sqlite'
+LEGACY_CACHE_FILE = 'webpages_extractor_cache.txt'  # Imported into CACHE_FILE when it is created
+# Seconds after which a downloaded page is fetched again (conditionally), unset to never fetch it again
+DOWNLOAD_CACHE_MAX_AGE = float(os.getenv('DOWNLOAD_CACHE_MAX_AGE')) if os.getenv('DOWNLOAD_CACHE_MAX_AGE') else None
+# Stores each downloaded content once, shared with landscape_extractor
+CONTENT_STORE = ContentStore()
+
+MAX_CONNECTIONS = 64  # Concurrent downloads over all hosts
+PER_HOST_CONNECTIONS = 8  # Concurrent downloads per host, to stay polite to documentation sites
+REQUEST_TIMEOUT = 30  # Seconds per request
+MAX_RETRIES = 3  # Retries of timeouts, connection errors, 429 and 5xx responses
+PARSE_WORKERS = multiprocessing.cpu_count()
+GOOGLE_DOCS_PREFIX = "https://docs.google.com/document/"
+
+# Directory of the ZIP archive of the downloaded pages
+ARCHIVE_DIRECTORY = "sources"
+
+# The parts of an aiohttp response used after the connection is released
+FetchResult = namedtuple('FetchResult', ['status_code', 'headers', 'content'])
+
+
+def load_cache() -> UrlStateStore:
     """
-    Load the cache from the cache file.
+    Open the download state store of the cache file.
 
     Returns:
-        Set[str]: A set containing cached items as strings.
-    """
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, 'r') as f:
-            return set(line.strip() for line in f)
-    return set()
-
-
-def save_cache(url: str) -> None:
+        UrlStateStore: The download state of the URLs. Close it after downloading.
     """
-    Save the cache to the cache file.
+    return UrlStateStore(CACHE_FILE, legacy_cache_file=LEGACY_CACHE_FILE, max_age=DOWNLOAD_CACHE_MAX_AGE)
 
-    Args:
-        url (str): The URL to be saved in the cache file.
 
-    Returns:
-        None
-    """
-    with open(CACHE_FILE, 'a') as f:
-        f.write(url + '\n')
-
-def save_doc_to_pdf(url: str, output_directory: str, tags: dict[str, str]) -> None:
-    """
-    Save a Google Document as PDF.
-
-    Args:
-        url (str): The URL of the Google Document.
-        output_directory (str): The directory where the PDF file will be saved.
-        tags (Dict[str, str]): A dictionary containing tags such as 'Category', 'Subcategory', 'Project_name',
-                                and 'filename' to construct the PDF file name.
-
-    Returns:
-        None
-    """
-
-    export_url = "https://docs.google.com/document/export?format={}&id={}".format('pdf', url.split('/')[-2])
-    # Send GET request to export URL
-    response = requests.get(export_url)
-    filename = os.path.join(
+def _tagged_path(output_directory: str, tags: dict[str, str], extension: str) -> str:
+    return os.path.join(
         output_directory,
         tags["Category"]
         + "_"
@@ -93,13 +102,15 @@ def save_doc_to_pdf(url: str, output_directory: str, tags: dict[str, str]) -> No
         + tags["Project_name"]
         + "_"
         + tags["filename"]
-        + ".pdf",
+        + extension,
     )
-    # Write the response content (PDF data) to a file
-    with open(filename, 'wb') as f:
-        f.write(response.content)
 
-def save_strings_to_md(string: str, output_dir: str, tags: dict[str, str]) -> None:
+
+def _export_url(url: str) -> str:
+    return "https://docs.google.com/document/export?format={}&id={}".format('pdf', url.split('/')[-2])
+
+
+def save_strings_to_md(string: str, output_dir: str, tags: dict[str, str], url: str = "") -> None:
     """
     Save a string to a Markdown (.md) file.
 
@@ -108,6 +119,7 @@ def save_strings_to_md(string: str, output_dir: str, tags: dict[str, str]) -> No
         output_dir (str): The directory where the Markdown file will be saved.
         tags (Dict[str, str]): A dictionary containing tags such as 'Category', 'Subcategory', 'Project_name',
                                 and 'filename' to construct the Markdown file name.
+        url (str, optional): The URL the content was extracted from, recorded in the content store's manifest.
 
     Returns:
         None
@@ -116,117 +128,204 @@ def save_strings_to_md(string: str, output_dir: str, tags: dict[str, str]) -> No
     # Ensure the output directory exists
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
-    filename = os.path.join(
-        output_dir,
-        tags["Category"]
-        + "_"
-        + tags["Subcategory"]
-        + "_"
-        + tags["Project_name"]
-        + "_"
-        + tags["filename"]
-        + ".md",
-    )
-    # Write the content to the file
-    with open(filename, "w", encoding="utf-8") as file:
-        file.write(string)
-        
-def downloader(url: str, output_directory: str, tags: dict[str, str], semaphore: Any, cache: set) -> None:
+    # Write the content to the file, unless the same content was saved before
+    CONTENT_STORE.add(string.encode("utf-8"), url, tags, _tagged_path(output_dir, tags, ".md"))
+
+
+def html_to_markdown(content: bytes) -> str:
+    """
+    Extract the paragraphs, code blocks and tables of an HTML page as Markdown. Runs in the parse worker processes.
+
+    Args:
+        content (bytes): The HTML page.
+
+    Returns:
+        str: The extracted Markdown, or None if the page has no body.
+    """
+    # Parse the content of the response with BeautifulSoup
+    soup = BeautifulSoup(content, "lxml")
+    body = soup.body
+    if not body:
+        return None
+    temp = ""
+    for element in body.descendants:
+        if element.name == "p":
+            temp += element.get_text()
+            temp += "\n"
+        elif element.name == "pre":
+            temp += "```\n" + element.get_text() + "```"
+            temp += "\n"
+        elif element.name == "table":
+            df = pd.read_html(str(element))[0]
+            temp += df.to_markdown(index=False)
+            temp += "\n"
+    return temp
+
+
+async def fetch(session: aiohttp.ClientSession, url: str, headers: dict[str, str] = None) -> FetchResult:
+    """
+    Fetch a URL, retrying timeouts, connection errors, 429 and 5xx responses up to MAX_RETRIES times.
+
+    Args:
+        session (aiohttp.ClientSession): The shared client.
+        url (str): The URL.
+        headers (Dict[str, str], optional): Extra request headers, e.g. validators of a conditional request.
+
+    Returns:
+        FetchResult: The status code, headers and body of the last response.
+
+    Raises:
+        aiohttp.ClientError, asyncio.TimeoutError: If the last attempt failed.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            async with session.get(url, headers=headers) as response:
+                result = FetchResult(response.status, response.headers, await response.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            print(f"Retrying {url} after error: {e!r}")
+            await asyncio.sleep(2 ** attempt)
+            continue
+        if (result.status_code == 429 or result.status_code >= 500) and attempt < MAX_RETRIES:
+            retry_after = result.headers.get("Retry-After", "")
+            delay = int(retry_after) if retry_after.isdigit() else 2 ** attempt
+            print(f"Retrying {url} in {delay}s (status {result.status_code})")
+            await asyncio.sleep(delay)
+            continue
+        return result
+
+
+def _start_parse_pool() -> ProcessPoolExecutor:
+    try:
+        return ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+    except (OSError, NotImplementedError, ImportError) as e:
+        # e.g. no semaphores for multiprocessing in a sandbox: parse in a thread
+        print("Parse pool is unavailable, parsing in a thread:", e)
+        return None
+
+
+async def _parse(parse_pool: ProcessPoolExecutor, content: bytes) -> str:
+    if parse_pool is not None:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(parse_pool, html_to_markdown, content)
+        except (BrokenProcessPool, OSError) as e:
+            print("Parse pool is unavailable, parsing in a thread:", e)
+    return await asyncio.to_thread(html_to_markdown, content)
+
+
+async def downloader(session: aiohttp.ClientSession, url: str, output_directory: str, tags: dict[str, str],
+                     cache: UrlStateStore, parse_pool: ProcessPoolExecutor) -> None:
     """
     Download content from a URL and save it based on its type.
 
     Args:
+        session (aiohttp.ClientSession): The shared client.
         url (str): The URL of the content to download.
         output_directory (str): The directory where downloaded files will be saved.
-        tags (Dict[str, str]): A dictionary containing tags such as 'Category', 'Subcategory', 'Project_name',
-                                and 'filename' to categorize and name downloaded files.
-        semaphore (Any): A synchronization primitive to control concurrent access.
-        cache (set): A set containing cached URLs to avoid redundant downloads.
+        tags (Dict[str, str]): A dictionary containing tags such as 'Category', 'Subcategory' and 'Project_name'
+                                to categorize and name downloaded files. Owned by this download.
+        cache (UrlStateStore): The download state of the URLs, to avoid redundant downloads.
+        parse_pool (ProcessPoolExecutor): The pool parsing HTML pages, None to parse in a thread.
 
     Returns:
         None
     """
-    
-    with semaphore:
-        if url in cache:
-            print(f"Skipping {url} (already downloaded)")
-            return
-        try:
-            # check if it is a link to google doc
-            if url.startswith("https://docs.google.com/document/"):
-                # download the google doc in pdf format
-                save_doc_to_pdf(url, output_directory, tags)
+    # Claim the URL, so no other task downloads it meanwhile (in memory, without blocking)
+    validators = cache.claim(url)
+    if validators is None:
+        print(f"Skipping {url} (already downloaded)")
+        return
+    try:
+        # check if it is a link to google doc
+        if url.startswith(GOOGLE_DOCS_PREFIX):
+            # download the google doc in pdf format, named by its document id
+            tags["filename"] = re.sub(r'[<>:"/\\|?*]', '_', url.split('/')[-2])
+            response = await fetch(session, _export_url(url))
+            if response.status_code == 200:
+                # File writes and commits run in a thread, so they do not stall the other downloads
+                await asyncio.to_thread(
+                    CONTENT_STORE.add, response.content, url, tags, _tagged_path(output_directory, tags, ".pdf"))
                 # Update cache immediately
-                cache.add(url)
-                save_cache(url)
+                await asyncio.to_thread(cache.complete, url, response)
                 # dont continue with further scraping
                 return None
-                
-            # Send a GET request to the webpage
-            response = requests.get(url)
-            response.raise_for_status()  # Raise HTTPError for bad responses
-            temp = ""
-            # Remove any characters that are invalid in filenames
-            filename = os.path.basename(url)
+        else:
+            # Send a GET request to the webpage, conditional if it was downloaded before
+            response = await fetch(session, url, validators)
+            if response.status_code == 304:
+                print(f"Skipping {url} (not modified)")
+                await asyncio.to_thread(cache.complete, url, response)
+                return None
             # Remove any characters that are invalid in filenames
-            tags["filename"] = re.sub(r'[<>:"/\\|?*]', '_', filename)
+            tags["filename"] = re.sub(r'[<>:"/\\|?*]', '_', os.path.basename(url))
             # Check if the request was successful
             if response.status_code == 200:
-                # Parse the content of the response with BeautifulSoup
-                soup = BeautifulSoup(response.content, "lxml")
-
-                body = soup.body
-                if body:
-                    for element in body.descendants:
-                        if element.name == "p":
-                            temp += element.get_text()
-                            temp += "\n"
-                        elif element.name == "pre":
-                            temp += "```\n" + element.get_text() + "```"
-                            temp += "\n"
-                        elif element.name == "table":
-                            df = pd.read_html(str(element))[0]
-                            temp += df.to_markdown(index=False)
-                            temp += "\n"
-
-                    # print(temp)
-                    save_strings_to_md(temp, output_directory, tags)
+                temp = await _parse(parse_pool, response.content)
+                if temp is not None:
+                    await asyncio.to_thread(save_strings_to_md, temp, output_directory, tags, url)
                     # Update cache immediately
-                    cache.add(url)
-                    save_cache(url)
-            else:
-                print(
-                    f"Failed to retrieve the webpage. Status code: {response.status_code}"
-                )
-        except Exception as e:
-            print(f"Failed to retrieve the webpage: {url}. Error: {e}")
-
-def extract_text(links: list[str], output_directory: str, tags: dict[str, str], cache: set) -> None:
+                    await asyncio.to_thread(cache.complete, url, response)
+                    return None
+        print(
+            f"Failed to retrieve the webpage: {url}. Status code: {response.status_code}"
+        )
+    except Exception as e:
+        print(f"Failed to retrieve the webpage: {url}. Error: {e!r}")
+    await asyncio.to_thread(cache.fail, url)
+
+
+async def crawl(jobs: list[tuple[str, dict[str, str]]], output_directory: str, cache: UrlStateStore) -> None:
+    """
+    Download the content of (url, tags) jobs concurrently through one pooled client.
+
+    Args:
+        jobs (List[Tuple[str, Dict[str, str]]]): The URLs with the tags of their project.
+        output_directory (str): The directory where downloaded files will be saved.
+        cache (UrlStateStore): The download state of the URLs, to avoid redundant downloads.
+
+    Returns:
+        None
+    """
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, limit_per_host=PER_HOST_CONNECTIONS)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    queue = asyncio.Queue()
+    for url, tags in jobs:
+        queue.put_nowait((url, dict(tags)))
+
+    async def worker() -> None:
+        while True:
+            try:
+                url, tags = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await downloader(session, url, output_directory, tags, cache, parse_pool)
+
+    parse_pool = _start_parse_pool()
+    try:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            # As many workers as connections: the connector queues the requests beyond the per-host limit
+            await asyncio.gather(*(worker() for _ in range(min(MAX_CONNECTIONS, len(jobs)))))
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+
+
+def extract_text(links: list[str], output_directory: str, tags: dict[str, str], cache: UrlStateStore) -> None:
     """
     Extract text content from a list of URLs concurrently.
 
     Args:
         links (List[str]): List of URLs from which to extract text content.
         output_directory (str): The directory where downloaded files will be saved.
-        tags (Dict[str, str]): A dictionary containing tags such as 'Category', 'Subcategory', 'Project_name',
-                                and 'filename' to categorize and name downloaded files.
-        cache (set): A set containing cached URLs to avoid redundant downloads.
+        tags (Dict[str, str]): A dictionary containing tags such as 'Category', 'Subcategory' and 'Project_name'
+                                to categorize and name downloaded files.
+        cache (UrlStateStore): The download state of the URLs, to avoid redundant downloads.
 
     Returns:
         None
     """
-    
-    max_threads = multiprocessing.cpu_count() * 2  # Example: double the number of cores
-    semaphore = threading.Semaphore(max_threads)
-    threads = []
-    for url in links:
-        thread = threading.Thread(target=downloader, args=(
-            url, output_directory, tags, semaphore, cache))
-        threads.append(thread)
-        thread.start()
-    for thread in threads:
-        thread.join()
-    
+    asyncio.run(crawl([(url, tags) for url in links], output_directory, cache))
 
 
 def download_files_from_yaml(
@@ -245,8 +344,7 @@ def download_files_from_yaml(
     """
 
     # Load URLs from YAML file
-    with open(yaml_file, "r") as f:
-        data = yaml.safe_load(f)
+    data = load_landscape(yaml_file)
 
     # Create output directory if it doesn't exist
     os.makedirs(output_directory, exist_ok=True)
@@ -255,6 +353,8 @@ def download_files_from_yaml(
     cache = load_cache()
     # Initialize a dictionary to save tags corresponding to each file
     tags_dict = {"Category": "", "Subcategory": "", "Project_name": "", "filename": ""}
+    # Collect the pages of all projects, so they are crawled together
+    jobs = []
     # Process the loaded data
     for category in data["landscape"]:
         # It downloads only below defined categories to avoid duplication
@@ -277,11 +377,16 @@ def download_files_from_yaml(
                 tags_dict["Project_name"] = item["name"]
                 print(f"Item: {tags_dict['Project_name']}")
                 website = item.get("website", {})
-                extract_text(website.get("docs", []), output_directory, tags_dict, cache)
-                
+                jobs += [(url, dict(tags_dict)) for url in website.get("docs", [])]
+    try:
+        asyncio.run(crawl(jobs, output_directory, cache))
+    finally:
+        # Commit the download state
+        cache.close()
+
     # Adding all the files corresponding to a category to a zip file
     shutil.make_archive(
-        "sources/" + "webpages_documentations", "zip", output_directory + "/"
+        os.path.join(ARCHIVE_DIRECTORY, "webpages_documentations"), "zip", output_directory + "/"
     )
     # Removing remminig raw files after archiving
     # shutil.rmtree(output_directory)
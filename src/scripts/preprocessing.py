@@ -5,6 +5,9 @@ Functions:
 - merge_data():
   Reads two CSV files ('sources/qa.csv' and 'sources/cncf_stackoverflow_qas.csv'), selects and renames
   specific columns of interest from each file, concatenates them, and saves the merged data to 'sources/merged_qas.csv'.
+  The StackOverflow Q&A pairs are read from the Parquet dataset of stackoverflow_extractor (PARQUET_DIR of stackoverflow_paths,
+  partitioned by tag) when it exists, keeping the rows with the latest last_activity_date per question and tag.
+  Only the needed columns are read from either source.
   Prints a success message upon completion.
 
 Example usage:
@@ -12,7 +15,14 @@ Run the script to merge question-answer pairs from 'sources/qa.csv' and 'sources
 and save the merged data to 'sources/merged_qas.csv'.
 """
 
+import os
 import pandas as pd
+try:
+    from src.scripts.data_preparation.stackoverflow_paths import PARQUET_DIR
+except ImportError:  # Run as a script from its own directory
+    from data_preparation.stackoverflow_paths import PARQUET_DIR
+
+STACKOVERFLOW_COLUMNS = ['question', 'answer', 'tag']
 
 def merge_data() -> None:
     """
@@ -33,9 +43,20 @@ def merge_data() -> None:
     csv_file_1 = 'sources/qa.csv' # Answer
     csv_file_2 = 'sources/cncf_stackoverflow_qas.csv' # answer
 
-    # Read the CSV files
-    df1 = pd.read_csv(csv_file_1)
-    df2 = pd.read_csv(csv_file_2)
+    # Read the CSV files (or the Parquet dataset), only loading the needed columns
+    df1 = pd.read_csv(csv_file_1, usecols=['Question', 'Answer', 'Project'])
+    if os.path.isdir(PARQUET_DIR):
+        df2 = pd.read_parquet(PARQUET_DIR, columns=STACKOVERFLOW_COLUMNS + ['question_id', 'answer_id', 'last_activity_date'])
+        # The tag is stored as the partition key, which is read back as a categorical
+        df2['tag'] = df2['tag'].astype(str)
+        # Incremental syncs append the current answers of updated questions to new files:
+        # keep the rows with the latest activity per question and tag
+        latest = df2.groupby(['question_id', 'tag'])['last_activity_date'].transform('max')
+        df2 = df2[df2['last_activity_date'] == latest].drop_duplicates(
+            ['question_id', 'answer_id', 'tag', 'last_activity_date'])
+    else:
+        # Answers fetched again by an incremental sync that was not compacted yet
+        df2 = pd.read_csv(csv_file_2, usecols=STACKOVERFLOW_COLUMNS).drop_duplicates()
 
     # Select and rename the columns of interest from the first file
     column1_file1 = 'Question'
@@ -49,8 +70,6 @@ def merge_data() -> None:
         'answer': 'Answer',
         'tag': 'Project'
     })
-    # Drop additional columns
-    df2 = df2.drop(['question_id', 'score'], axis=1)
     # Concatenate the selected and renamed columns
     merged_df = pd.concat([df1_selected, df2_selected])
 
@@ -1,6 +1,6 @@
 """
 This script retrieves files with specified extensions from GitHub repositories,
-augments a YAML file with download URLs, and caches requests for efficient retrieval.
+augments a YAML file with download URLs, and revalidates cached responses for efficient retrieval.
 It handles rate limits and logging errors during API requests.
 
 Dependencies:
@@ -8,18 +8,54 @@ Dependencies:
 - os
 - yaml
 - tqdm
-- requests_cache
+- sqlite3
 - logging
 - collections
+- json
+- threading
+- concurrent.futures
+- fnmatch
+- hashlib
 
 Environment Variables:
 - GITHUB_TOKEN: GitHub token for authentication (optional)
+- GITHUB_TOKENS: Comma-separated GitHub tokens to rotate across, takes precedence over GITHUB_TOKEN (optional)
+- EXPLORER_WORKERS: Number of repositories explored concurrently (default: 8)
 
 Usage:
 Ensure correct configuration of 'BASE_REPO_YAML' and 'OUTPUT_PATH' for input and output file paths respectively. Adjust 'EXTENSIONS' for desired file types to retrieve.
 
+Repositories are explored concurrently by a bounded thread pool sharing one pooled session. Requests rotate
+across the configured tokens. When GitHub reports an exhausted (or secondary) rate limit for a token, only that
+token is paused until its reset time and the request is retried with the next available token. A secondary
+rate limit reported without a retry-after header pauses the token with an exponential backoff starting at
+SECONDARY_RATE_LIMIT_DELAY seconds. Results are merged back into the YAML in landscape order, independent of completion order.
+
+Default branches, their root tree SHAs and HEAD commits are resolved up front with batched GitHub GraphQL
+queries (GRAPHQL_BATCH_SIZE repositories per query). Repositories the GraphQL API cannot resolve (e.g. without a
+token) fall back to REST requests.
+
+GET responses are cached with their ETag/Last-Modified validators in 'landscape_etag_cache.sqlite', which is
+opened by the first request. Every request revalidates its cached response with If-None-Match/If-Modified-Since,
+so unchanged resources come back as 304 Not Modified (which does not count against the GitHub rate limit) and
+changed ones are always fetched.
+
+Repositories too large for a single recursive tree listing are expanded iteratively with a work queue of
+subtrees, listed concurrently and skipping vendored and test fixture directories (PRUNED_DIRECTORIES).
+
+Files are filtered with the blob sizes reported by the tree API and with path patterns: files larger than the cap
+for their extension (MAX_FILE_SIZES) and paths matching PATH_DENY_PATTERNS are not recorded unless they match
+PATH_ALLOW_PATTERNS. Per-repository stats (kept files and bytes, files skipped by size and by path) are written
+next to the download URLs.
+
+Explored repositories are appended to a JSONL journal next to the output file as they complete, together with
+the commit SHA of their default branch. A later run (or the rerun of an interrupted one) skips repositories whose
+HEAD is still at the journaled SHA and only re-lists the ones that moved. The final YAML is rendered category by
+category from the journal with the libyaml dumper when available, reading each repository's URLs from the journal
+only when it is written; the journal is then compacted to the latest record of each repository.
+
 Note:
-Ensure 'repo_url' attributes in the YAML file correspond to valid GitHub repository URLs. Cached requests expire after 7 days ('landscape_cache').
+Ensure 'repo_url' attributes in the YAML file correspond to valid GitHub repository URLs.
 """
 
 #!/usr/bin/python3
@@ -29,43 +65,327 @@ import requests
 import os
 import yaml
 from tqdm import tqdm
-import requests_cache
 import logging
 import time
 import collections
+import json
+import threading
+import sqlite3
+import fnmatch
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 
 
 TOKEN = os.getenv('GITHUB_TOKEN', "Replace your token")
-HEADERS = {'Authorization': f'Bearer {TOKEN}',
-           'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}
+TOKENS = [token.strip() for token in os.getenv('GITHUB_TOKENS', '').split(',') if token.strip()] or [TOKEN]
+HEADERS = {'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}
 BASE_API_URL = 'https://api.github.com'
 BASE_REPO_YAML = 'https://raw.githubusercontent.com/cncf/landscape/master/landscape.yml'
 EXTENSIONS = ["yml", "yaml", "pdf", "md"]
 OUTPUT_PATH = '../../sources/landscape_augmented_repos.yml'
+MAX_WORKERS = int(os.getenv('EXPLORER_WORKERS', 8))
+MAX_RETRIES = 5  # Retries of a rate-limited request
+SECONDARY_RATE_LIMIT_DELAY = 60  # Initial backoff in seconds after a secondary rate limit without retry-after
+GRAPHQL_BATCH_SIZE = 100  # Repositories resolved per GraphQL query
+ETAG_CACHE_FILE = 'landscape_etag_cache.sqlite'
+SUBTREE_WORKERS = 4  # Subtrees of a truncated tree listed concurrently per repository
+SUBTREE_PROGRESS_INTERVAL = 100  # Number of listed trees between progress log lines
+PRUNED_DIRECTORIES = {'vendor', 'node_modules', 'testdata'}  # Not explored and not downloaded from
+# Largest file recorded per extension, in bytes, from the blob size reported by the tree API
+MAX_FILE_SIZES = {"yml": 256 * 1024, "yaml": 256 * 1024, "md": 1024 * 1024, "pdf": 25 * 1024 * 1024}
+# fnmatch patterns matched against the path with a leading '/'; allow patterns take precedence over deny patterns
+PATH_DENY_PATTERNS = ['*/crds/*', '*/fixtures/*', '*/__snapshots__/*', '*zz_generated*']
+PATH_ALLOW_PATTERNS = []
+JOURNAL_SUFFIX = '.journal.jsonl'  # Explored repositories are journaled in OUTPUT_PATH + JOURNAL_SUFFIX
+
+try:
+    YamlDumper = yaml.CSafeDumper
+except AttributeError:
+    YamlDumper = yaml.SafeDumper
 
 yaml.add_representer(collections.defaultdict, Representer.represent_dict)
 
-# Cache requests for 7 days
-requests_cache.install_cache('landscape_cache', expire_after=604800)
+# Shared by all explorer threads
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+# Every repository thread may list SUBTREE_WORKERS subtrees at once; a smaller pool would discard connections
+SESSION.mount('https://', requests.adapters.HTTPAdapter(pool_connections=MAX_WORKERS,
+                                                        pool_maxsize=MAX_WORKERS * SUBTREE_WORKERS))
 
 
-def get_urls(repo_url: str, default_branch: str = "", tree_sha: str = "", file_path: str = "", res: defaultdict = None) -> defaultdict:
+class TokenScheduler:
+    """
+    Rotates requests across GitHub tokens and pauses each token while its rate limit is exhausted.
+
+    A paused token is skipped until its reset time, so the other tokens keep making progress. Threads only
+    wait when every token is paused, and then only until the first one becomes available again.
+    """
+
+    def __init__(self, tokens: list):
+        self.tokens = list(tokens)
+        self.paused_until = {token: 0 for token in self.tokens}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> str:
+        """
+        Returns the next token that is not paused, waiting if all tokens are paused.
+
+        Returns:
+            str: The token to authenticate the next request with.
+        """
+        while True:
+            with self._lock:
+                now = time.time()
+                for offset in range(len(self.tokens)):
+                    token = self.tokens[(self._next + offset) % len(self.tokens)]
+                    if self.paused_until[token] <= now:
+                        self._next = (self._next + offset + 1) % len(self.tokens)
+                        return token
+                wait = min(self.paused_until.values()) - now
+            logging.warning(f'All GitHub tokens are rate limited. Waiting {wait:.0f} seconds')
+            time.sleep(wait)
+
+    def observe(self, token: str, response: requests.Response, attempt: int = 0) -> bool:
+        """
+        Pauses a token according to the rate limit headers of its response.
+
+        Args:
+            token (str): The token the request was made with.
+            response (requests.Response): The response of the request.
+            attempt (int, optional): The number of times the request was already retried. Defaults to 0.
+
+        Returns:
+            bool: True if the request was rejected because of the rate limit and has to be retried.
+        """
+        headers = response.headers
+        if 'retry-after' in headers:
+            # Secondary rate limit: wait for the given number of seconds
+            paused_until = time.time() + int(headers['retry-after'])
+        elif headers.get('x-ratelimit-remaining') == '0' and 'x-ratelimit-reset' in headers:
+            # Primary rate limit: the reset header is the epoch time at which the limit resets
+            paused_until = int(headers['x-ratelimit-reset'])
+        elif response.status_code == 403 and 'secondary rate limit' in str(getattr(response, 'text', '')).lower():
+            # Secondary rate limit without retry-after: back off exponentially, as recommended by GitHub
+            paused_until = time.time() + SECONDARY_RATE_LIMIT_DELAY * 2 ** attempt
+        else:
+            return False
+
+        with self._lock:
+            self.paused_until[token] = max(self.paused_until[token], paused_until)
+        logging.warning(f'Rate limit exceeded for token {self.tokens.index(token) + 1}/{len(self.tokens)}. '
+                        f'Paused for {max(0, paused_until - time.time()):.0f} seconds')
+        return response.status_code in (403, 429)
+
+
+scheduler = TokenScheduler(TOKENS)
+
+
+class ConditionalCache:
+    """
+    Stores GET responses with their ETag/Last-Modified validators in a SQLite database.
+
+    Each thread uses its own connection to the database, which runs in WAL mode.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS responses "
+                         "(url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, headers TEXT, content BLOB)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.filename, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def get(self, url: str) -> tuple:
+        """
+        Returns the cached entry of a URL.
+
+        Args:
+            url (str): The requested URL.
+
+        Returns:
+            tuple or None: (etag, last_modified, headers, content) of the cached response, None if not cached.
+        """
+        return self._connection().execute(
+            "SELECT etag, last_modified, headers, content FROM responses WHERE url = ?", (url,)).fetchone()
+
+    def put(self, url: str, response: requests.Response) -> None:
+        """
+        Caches a successful response if it carries a validator.
+
+        Args:
+            url (str): The requested URL.
+            response (requests.Response): The response to cache.
+        """
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code != 200 or not (etag or last_modified):
+            return
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                         (url, etag, last_modified, json.dumps(dict(response.headers)), response.content))
+
+    @staticmethod
+    def validators(entry: tuple) -> dict:
+        """
+        Returns the conditional request headers for a cached entry.
+
+        Args:
+            entry (tuple): The cached entry as returned by `get`.
+
+        Returns:
+            dict: If-None-Match and/or If-Modified-Since headers.
+        """
+        headers = {}
+        if entry and entry[0]:
+            headers['If-None-Match'] = entry[0]
+        if entry and entry[1]:
+            headers['If-Modified-Since'] = entry[1]
+        return headers
+
+    @staticmethod
+    def to_response(url: str, entry: tuple) -> requests.Response:
+        """
+        Builds a response from a cached entry after the server answered 304 Not Modified.
+
+        Args:
+            url (str): The requested URL.
+            entry (tuple): The cached entry as returned by `get`.
+
+        Returns:
+            requests.Response: A 200 response with the cached headers and content.
+        """
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = requests.structures.CaseInsensitiveDict(json.loads(entry[2]))
+        response._content = entry[3]
+        return response
+
+
+etag_cache = None
+etag_cache_lock = threading.Lock()
+
+
+def get_etag_cache() -> ConditionalCache:
+    """
+    Returns the response cache shared by all requests, opening ETAG_CACHE_FILE on first use.
+
+    Returns:
+        ConditionalCache: The shared response cache.
+    """
+    global etag_cache
+    with etag_cache_lock:
+        if etag_cache is None:
+            etag_cache = ConditionalCache(ETAG_CACHE_FILE)
+        return etag_cache
+
+
+def fetch_tree(repo_url: str, tree_sha: str, file_path: str = "") -> tuple:
+    """
+    Lists a tree of a GitHub repository, recursively if GitHub does not truncate the listing.
+
+    Args:
+        repo_url (str): The URL of the GitHub repository.
+        tree_sha (str): The SHA (or branch name) of the tree object.
+        file_path (str, optional): The path of the tree within the repository, used for logging. Defaults to "".
+
+    Returns:
+        tuple: The tree entries and whether the recursive listing was truncated, in which case the entries are
+        only the direct children of the tree.
+    """
+    url = f'{BASE_API_URL}/repos/{repo_url.split("https://github.com/")[1]}/git/trees/{tree_sha}'
+    response = make_request(f'{url}?recursive=1')
+    data = (response.json() or {}) if response is not None else {}
+    if not data.get('truncated'):
+        return data.get('tree') or [], False
+
+    logging.info(
+        f'request for files in path {file_path or "root"} in repository: {repo_url} got truncated because of file number limit')
+    response = make_request(url)
+    data = (response.json() or {}) if response is not None else {}
+    return data.get('tree') or [], True
+
+
+def is_pruned(path: str) -> bool:
+    """
+    Checks whether a path lies in a directory that is not worth exploring (see PRUNED_DIRECTORIES).
+
+    Args:
+        path (str): The path within the repository.
+
+    Returns:
+        bool: True if any directory of the path is pruned.
+    """
+    return any(part in PRUNED_DIRECTORIES for part in path.split('/'))
+
+
+def skip_reason(path: str, ext: str, size: int = None) -> str:
+    """
+    Checks a file against the path patterns and the size cap of its extension.
+
+    Args:
+        path (str): The path of the file within the repository.
+        ext (str): The extension of the file.
+        size (int, optional): The size of the file in bytes, if known. Defaults to None.
+
+    Returns:
+        str or None: 'path' or 'size' if the file is skipped, None if it is recorded.
+    """
+    anchored_path = '/' + path
+    if not any(fnmatch.fnmatchcase(anchored_path, pattern) for pattern in PATH_ALLOW_PATTERNS):
+        if any(fnmatch.fnmatchcase(anchored_path, pattern) for pattern in PATH_DENY_PATTERNS):
+            return 'path'
+    if size is not None and ext in MAX_FILE_SIZES and size > MAX_FILE_SIZES[ext]:
+        return 'size'
+    return None
+
+
+def filters_fingerprint() -> str:
+    """
+    Returns a fingerprint of the file filters, so repositories are re-listed when the filters change.
+
+    Returns:
+        str: The SHA-256 of the filter configuration.
+    """
+    config = [sorted(EXTENSIONS), sorted(PRUNED_DIRECTORIES), MAX_FILE_SIZES, PATH_DENY_PATTERNS, PATH_ALLOW_PATTERNS]
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def get_urls(repo_url: str, default_branch: str = "", tree_sha: str = "", file_path: str = "", res: defaultdict = None,
+             stats: dict = None) -> defaultdict:
     """
     Retrieves the URLs of files with specific extensions from a GitHub repository.
 
+    Truncated listings are expanded with a work queue: the direct subtrees of a truncated tree are listed
+    concurrently (at most SUBTREE_WORKERS at a time), and subtrees in PRUNED_DIRECTORIES are skipped.
+
     Args:
         repo_url (str): The URL of the GitHub repository.
         default_branch (str, optional): The default branch of the repository. Defaults to "".
         tree_sha (str, optional): The SHA of the tree object. Defaults to "".
         file_path (str, optional): The path to a specific file or directory within the repository. Defaults to "".
         res (defaultdict, optional): A defaultdict to store the URLs of files with specific extensions. Defaults to None.
+        stats (dict, optional): Updated with the number of recorded 'files', their 'bytes', and the files skipped
+            by size ('skipped_size') and by path ('skipped_path'). Defaults to None.
 
     Returns:
-        defaultdict: A defaultdict containing the URLs of files with specific extensions.
+        defaultdict: A defaultdict containing the URLs of files with specific extensions, sorted by path.
 
     """
     if res is None:
         res = defaultdict(list)
+    if stats is None:
+        stats = {}
+    for key in ('files', 'bytes', 'skipped_size', 'skipped_path'):
+        stats.setdefault(key, 0)
 
     if not default_branch:
         default_branch = get_default_branch(repo_url)
@@ -73,35 +393,39 @@ def get_urls(repo_url: str, default_branch: str = "", tree_sha: str = "", file_p
     if not tree_sha:
         tree_sha = default_branch
 
-    url = f'{BASE_API_URL}/repos/{repo_url.split("https://github.com/")[1]}/git/trees/{tree_sha}?recursive=1'
-    response = make_request(url).json()
-    truncated = False
-    if response.get('truncated'):
-        logging_path = file_path if file_path else "root"
-        logging.info(
-            f'request for files in path {logging_path} in repository: {repo_url} got truncated because of file number limit')
-        truncated = True
-        url = f'{BASE_API_URL}/repos/{repo_url.split("https://github.com/")[1]}/git/trees/{tree_sha}'
-        response = make_request(url).json()
-
-    tree = response.get('tree')
-
-    if not tree:
-        return res
-
     base_download_url = f'https://raw.githubusercontent.com/{repo_url.split("https://github.com/")[1]}/{default_branch}/'
-
-    for file in tree:
-        ext = file.get('path').split('.')[-1]
-        new_file_path = f"{file_path}/{file['path']}" if file_path else file['path']
-        if file.get('type') == 'blob' and ext in EXTENSIONS:
-            res[ext].append(base_download_url + new_file_path)
-
-        if truncated and file.get('type') == 'tree':
-            logging.debug(f'Recursively fetching URLs for path {new_file_path}')
-            get_urls(repo_url, default_branch, file.get('sha'), new_file_path, res)
-
-
+    expanded = 0
+
+    with ThreadPoolExecutor(max_workers=SUBTREE_WORKERS) as executor:
+        pending = {executor.submit(fetch_tree, repo_url, tree_sha, file_path): file_path}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                tree_path = pending.pop(future)
+                tree, truncated = future.result()
+                for file in tree:
+                    new_file_path = f"{tree_path}/{file['path']}" if tree_path else file['path']
+                    if is_pruned(new_file_path):
+                        continue
+                    ext = file.get('path').split('.')[-1]
+                    if file.get('type') == 'blob' and ext in EXTENSIONS:
+                        reason = skip_reason(new_file_path, ext, file.get('size'))
+                        if reason:
+                            stats[f'skipped_{reason}'] += 1
+                            continue
+                        res[ext].append(base_download_url + new_file_path)
+                        stats['files'] += 1
+                        stats['bytes'] += file.get('size') or 0
+                    elif truncated and file.get('type') == 'tree':
+                        logging.debug(f'Queueing subtree {new_file_path}')
+                        pending[executor.submit(fetch_tree, repo_url, file.get('sha'), new_file_path)] = new_file_path
+
+                expanded += 1
+                if expanded % SUBTREE_PROGRESS_INTERVAL == 0:
+                    logging.info(f'{repo_url}: listed {expanded} trees, {len(pending)} pending')
+
+    for url_list in res.values():
+        url_list.sort()
     return res
 
 
@@ -126,11 +450,261 @@ def get_default_branch(repo_url: str) -> str:
     return response.json().get('default_branch')
 
 
+def get_default_branches(repo_urls: list) -> dict:
+    """
+    Resolves the default branches, root tree SHAs and HEAD commit SHAs of GitHub repositories with batched
+    GraphQL queries.
+
+    Args:
+        repo_urls (list): The URLs of the GitHub repositories.
+
+    Returns:
+        dict: Maps each resolved repository URL to a (default branch, tree SHA, commit SHA) tuple. Repositories
+        missing from the result have to be resolved with `get_head`.
+    """
+    repos = []
+    for repo_url in repo_urls:
+        parts = repo_url.split("https://github.com/")
+        if len(parts) != 2 or len(parts[1].strip('/').split('/')) < 2:
+            continue
+        owner, name = parts[1].strip('/').split('/')[:2]
+        repos.append((repo_url, owner, name))
+
+    branches = {}
+    for start in range(0, len(repos), GRAPHQL_BATCH_SIZE):
+        batch = repos[start:start + GRAPHQL_BATCH_SIZE]
+        fields = [
+            f'r{i}: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) '
+            '{ defaultBranchRef { name target { ... on Commit { oid tree { oid } } } } }'
+            for i, (_, owner, name) in enumerate(batch)
+        ]
+        response = make_request(f'{BASE_API_URL}/graphql', method='POST',
+                                json={'query': 'query { ' + ' '.join(fields) + ' }'})
+        if response is None or response.status_code != 200:
+            logging.warning('GraphQL default branch lookup failed, falling back to REST requests')
+            continue
+        data = response.json().get('data') or {}
+        for i, (repo_url, _, _) in enumerate(batch):
+            ref = (data.get(f'r{i}') or {}).get('defaultBranchRef')
+            if ref and ref.get('name'):
+                target = ref.get('target') or {}
+                branches[repo_url] = (ref['name'], (target.get('tree') or {}).get('oid', ''), target.get('oid'))
+    return branches
+
+
+def get_head(repo_url: str) -> tuple:
+    """
+    Resolves the default branch, root tree SHA and HEAD commit SHA of a repository with REST requests.
+
+    Args:
+        repo_url (str): The URL of the GitHub repository.
+
+    Returns:
+        tuple: (default branch, tree SHA, commit SHA). The SHAs are empty/None if they could not be resolved.
+    """
+    default_branch = get_default_branch(repo_url)
+    if not default_branch:
+        return "", "", None
+    response = make_request(f'{BASE_API_URL}/repos/{repo_url.split("https://github.com/")[1]}/commits/{default_branch}')
+    data = (response.json() or {}) if response is not None and response.status_code == 200 else {}
+    return default_branch, ((data.get('commit') or {}).get('tree') or {}).get('sha', ''), data.get('sha')
+
+
+def explore_repo(repo_url: str, default_branch: str = "", tree_sha: str = "", stats: dict = None) -> defaultdict:
+    """
+    Retrieves the download URLs of a repository, logging instead of raising errors.
+
+    Args:
+        repo_url (str): The URL of the GitHub repository.
+        default_branch (str, optional): The default branch of the repository, looked up if empty. Defaults to "".
+        tree_sha (str, optional): The SHA of the root tree. Defaults to "".
+        stats (dict, optional): Updated with the file stats of the repository, see `get_urls`. Defaults to None.
+
+    Returns:
+        defaultdict or None: The URLs per extension, None if the repository could not be explored.
+    """
+    try:
+        return get_urls(repo_url, default_branch, tree_sha, stats=stats)
+    except Exception as e:
+        logging.error(f'Error exploring repository {repo_url}: {e}')
+        return None
+
+
+class ExplorationJournal:
+    """
+    Append-only JSONL journal of explored repositories, one record per line.
+
+    Only the file offset of each repository's latest record is kept in memory; records are read back one at a
+    time when the YAML is rendered. A torn last line of an interrupted run is ignored.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.offsets = {}
+        self._lock = threading.Lock()
+        if os.path.exists(filename):
+            with open(filename, 'rb') as f:
+                offset = 0
+                for line in f:
+                    try:
+                        self.offsets[json.loads(line)['repo_url']] = offset
+                    except (ValueError, KeyError):
+                        logging.warning(f'Ignoring corrupt journal record at offset {offset} of {filename}')
+                    offset += len(line)
+                if offset and not line.endswith(b'\n'):
+                    # Drop the torn record so the next append starts on a new line
+                    f.close()
+                    os.truncate(filename, offset - len(line))
+                    self.offsets = {repo_url: record_offset for repo_url, record_offset in self.offsets.items()
+                                    if record_offset < offset - len(line)}
+        self._file = open(filename, 'ab')
+        # Appends start at the end of the (possibly truncated) file
+        self._end = os.path.getsize(filename)
+
+    def __contains__(self, repo_url: str) -> bool:
+        return repo_url in self.offsets
+
+    def append(self, record: dict) -> None:
+        """
+        Appends the record of an explored repository.
+
+        Args:
+            record (dict): The record, including its 'repo_url'.
+        """
+        line = (json.dumps(record) + '\n').encode('utf-8')
+        with self._lock:
+            offset = self._end
+            self._file.write(line)
+            self._file.flush()
+            self._end += len(line)
+            self.offsets[record['repo_url']] = offset
+
+    def get(self, repo_url: str) -> dict:
+        """
+        Reads the latest record of a repository.
+
+        Args:
+            repo_url (str): The URL of the GitHub repository.
+
+        Returns:
+            dict or None: The record, None if the repository has not been explored.
+        """
+        offset = self.offsets.get(repo_url)
+        if offset is None:
+            return None
+        with open(self.filename, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def compact(self, repo_urls: list) -> None:
+        """
+        Rewrites the journal with only the latest record of each of the given repositories.
+
+        Args:
+            repo_urls (list): The repositories to keep.
+        """
+        temp_path = self.filename + '.tmp'
+        with self._lock:
+            self._file.flush()
+            offsets = {}
+            with open(temp_path, 'wb') as out, open(self.filename, 'rb') as f:
+                for repo_url in repo_urls:
+                    if repo_url not in self.offsets:
+                        continue
+                    f.seek(self.offsets[repo_url])
+                    offsets[repo_url] = out.tell()
+                    out.write(f.readline())
+            self._file.close()
+            os.replace(temp_path, self.filename)
+            self.offsets = offsets
+            self._file = open(self.filename, 'ab')
+            self._end = os.path.getsize(self.filename)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def explore_and_record(journal: ExplorationJournal, repo_url: str, default_branch: str = "", tree_sha: str = "",
+                       commit_sha: str = None) -> str:
+    """
+    Explores a repository unless its HEAD is still at the journaled commit (and the file filters are unchanged),
+    and journals its download URLs and file stats.
+
+    Args:
+        journal (ExplorationJournal): The journal of the explorer.
+        repo_url (str): The URL of the GitHub repository.
+        default_branch (str, optional): The default branch of the repository, resolved with `get_head` if empty.
+            Defaults to "".
+        tree_sha (str, optional): The SHA of the root tree. Defaults to "".
+        commit_sha (str, optional): The HEAD commit SHA of the default branch. Defaults to None.
+
+    Returns:
+        str: 'unchanged', 'explored' or 'failed'.
+    """
+    try:
+        if not default_branch:
+            default_branch, tree_sha, commit_sha = get_head(repo_url)
+    except Exception as e:
+        logging.error(f'Error resolving HEAD of repository {repo_url}: {e}')
+        return 'failed'
+
+    fingerprint = filters_fingerprint()
+    record = journal.get(repo_url)
+    if commit_sha and record is not None and record.get('commit_sha') == commit_sha \
+            and record.get('filters') == fingerprint:
+        return 'unchanged'
+
+    stats = {}
+    urls = explore_repo(repo_url, default_branch, tree_sha, stats)
+    if urls is None:
+        return 'failed'
+    logging.info(f'{repo_url}: {stats}')
+    journal.append({'repo_url': repo_url, 'commit_sha': commit_sha, 'filters': fingerprint,
+                    'download_urls': dict(urls), 'stats': stats})
+    return 'explored'
+
+
+def render_augmented_yml(content: dict, journal: ExplorationJournal, output_path: str) -> None:
+    """
+    Writes the landscape with the journaled download URLs, one category at a time.
+
+    Args:
+        content (dict): The landscape YAML content.
+        journal (ExplorationJournal): The journal with the explored repositories.
+        output_path (str): The path of the YAML file to write.
+    """
+    temp_path = output_path + '.tmp'
+    with open(temp_path, 'w') as file:
+        for key, value in content.items():
+            if key != 'landscape':
+                yaml.dump({key: value}, file, Dumper=YamlDumper, sort_keys=False)
+                continue
+            file.write('landscape:\n')
+            for category in value:
+                for subcategory in category.get('subcategories') or []:
+                    for item in subcategory.get('items') or []:
+                        record = journal.get(item.get('repo_url')) if item.get('repo_url') else None
+                        if record is not None:
+                            urls = record['download_urls']
+                            item['repo'] = {'download_urls': urls} if urls else {}
+                            if record.get('stats'):
+                                item['repo']['stats'] = record['stats']
+                yaml.dump([category], file, Dumper=YamlDumper, sort_keys=False)
+                # The URLs are only needed while the category is written
+                for subcategory in category.get('subcategories') or []:
+                    for item in subcategory.get('items') or []:
+                        item.pop('repo', None)
+    os.replace(temp_path, output_path)
+
+
 def generate_augmented_yml_with_urls() -> None:
     """
     Retrieves the YAML content from BASE_REPO_YAML, augments it with download URLs,
     and saves the augmented content to 'sources/landscape_augmented.yml'.
 
+    Repositories whose HEAD is still at the journaled commit are taken from the journal instead of being
+    explored again.
+
     Returns:
         None
     """
@@ -138,47 +712,69 @@ def generate_augmented_yml_with_urls() -> None:
 
     content = response.content.decode('utf-8')
     content = yaml.safe_load(content)  # type dict
-    os.makedirs('../../sources', exist_ok=True)
-    for category in tqdm(content.get('landscape'), desc="categories"):
-        for subcategory in tqdm(category.get('subcategories'), desc="subcategories"):
-            for item in tqdm(subcategory.get('items'), desc="sources"):
-                if 'repo_url' not in item or not item.get('repo_url'):
-                    continue
-                urls = get_urls(item.get('repo_url'))
-                item['repo'] = defaultdict(defaultdict)
-                for ext, url_list in urls.items():
-                    item['repo']['download_urls'][ext] = url_list
-
-    with open(OUTPUT_PATH, 'w+') as file:
-        yaml.dump(content, file, sort_keys=False)
+    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
+    journal_path = OUTPUT_PATH + JOURNAL_SUFFIX
+    journal = ExplorationJournal(journal_path)
+    repo_urls = list(dict.fromkeys(item.get('repo_url')
+                                   for category in content.get('landscape')
+                                   for subcategory in category.get('subcategories') or []
+                                   for item in subcategory.get('items') or []
+                                   if item.get('repo_url')))
+    branches = get_default_branches(repo_urls)
 
-
-def make_request(url):
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [executor.submit(explore_and_record, journal, repo_url, *branches.get(repo_url, ("", "", None)))
+                       for repo_url in repo_urls]
+            outcomes = collections.Counter(future.result()
+                                           for future in tqdm(as_completed(futures), total=len(futures), desc="sources"))
+        print(f"Repositories explored: {outcomes['explored']}, unchanged: {outcomes['unchanged']}, "
+              f"failed: {outcomes['failed']}")
+
+        # Rendered in landscape order so the output does not depend on completion order
+        render_augmented_yml(content, journal, OUTPUT_PATH)
+        journal.compact(repo_urls)
+    finally:
+        journal.close()
+
+
+def make_request(url, method: str = 'GET', json: dict = None):
     """
-    Makes an HTTP GET request to the provided URL with error handling and rate limit handling.
+    Makes an HTTP request to the provided URL with error handling and rate limit handling.
 
     Args:
         url (str): The URL to make the request to.
+        method (str, optional): 'GET' or 'POST'. Defaults to 'GET'.
+        json (dict, optional): The JSON body of a POST request. Defaults to None.
+
+    Rate-limited requests are retried up to MAX_RETRIES times with the next available token.
 
     Returns:
         requests.Response or None: The response object if the request was successful, None otherwise.
     """
     print("making request to url: ", url)
-    try:
-        response = requests.get(url, headers=HEADERS, timeout=30)
-    except requests.exceptions.RequestException as e:
-        logging.error(f'Error making request to {url}: {e}')
-        return None
-
-    if 'retry_after' in response.headers:
-        logging.warning(
-            f'Rate limit exceeded. Retrying after {response.headers["retry-after"]} seconds')
-        time.sleep(int(response.headers['retry-after']))
-    elif 'x-ratelimit-remaining' in response.headers and int(response.headers['x-ratelimit-remaining']) == 0:
-        logging.warning(
-            f'Rate limit exceeded. Retrying after {response.headers["x-ratelimit-remaining"]} seconds')
-        time.sleep(int(response.headers['x-ratelimit-reset']))
-
+    cached = get_etag_cache().get(url) if method != 'POST' else None
+    for attempt in range(MAX_RETRIES + 1):
+        token = scheduler.acquire()
+        headers = {'Authorization': f'Bearer {token}'}
+        try:
+            if method == 'POST':
+                response = SESSION.post(url, headers=headers, json=json, timeout=30)
+            else:
+                headers.update(ConditionalCache.validators(cached))
+                response = SESSION.get(url, headers=headers, timeout=30)
+        except requests.exceptions.RequestException as e:
+            logging.error(f'Error making request to {url}: {e}')
+            return None
+
+        if not scheduler.observe(token, response, attempt) or attempt == MAX_RETRIES:
+            break
+        logging.warning(f'Retrying rate-limited request to {url} ({attempt + 1}/{MAX_RETRIES})')
+
+    if method != 'POST':
+        if response.status_code == 304 and cached:
+            return ConditionalCache.to_response(url, cached)
+        get_etag_cache().put(url, response)
     return response
 
 
@@ -0,0 +1,89 @@
+"""
+Compares the download throughput (files/sec) of landscape_extractor against a local HTTPS stand-in for
+raw.githubusercontent.com:
+- one bare `requests.get` per file (a new TLS connection per download, as before),
+- the shared, pooled `landscape_extractor.SESSION` (keep-alive connections reused across downloads).
+
+Both run with `landscape_extractor.MAX_THREADS` download threads. A self-signed certificate is generated with
+the `openssl` command line tool.
+
+Usage:
+python test/benchmark/download_session_benchmark.py [number_of_files]
+"""
+
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.scripts.data_preparation import landscape_extractor
+
+BODY = b"# Project\n\nSome documentation about deploying the project on Kubernetes.\n" * 40
+
+
+class RawFileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections alive
+    disable_nagle_algorithm = True  # Headers and body are written separately
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(temp_dir: str) -> tuple:
+    cert_file = os.path.join(temp_dir, "cert.pem")
+    key_file = os.path.join(temp_dir, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+                    "-addext", "subjectAltName=DNS:localhost", "-keyout", key_file, "-out", cert_file],
+                   check=True, capture_output=True)
+    server = ThreadingHTTPServer(("localhost", 0), RawFileHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_file, key_file)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, cert_file
+
+
+def run(name: str, urls: list, get) -> None:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=landscape_extractor.MAX_THREADS) as executor:
+        for response in executor.map(get, urls):
+            response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<32} {len(urls) / elapsed:>10.0f} files/sec ({elapsed:.2f}s)")
+
+
+def main(files: int) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        server, cert_file = start_server(temp_dir)
+        try:
+            base_url = f"https://localhost:{server.server_address[1]}"
+            urls = [f"{base_url}/org/repo/main/docs/file_{i}.md" for i in range(files)]
+
+            run("requests.get per file", urls,
+                lambda url: requests.get(url, timeout=landscape_extractor.REQUEST_TIMEOUT, verify=cert_file))
+
+            run(f"pooled SESSION ({landscape_extractor.MAX_THREADS} conns)", urls,
+                lambda url: landscape_extractor.SESSION.get(url, timeout=landscape_extractor.REQUEST_TIMEOUT,
+                                                            verify=cert_file))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
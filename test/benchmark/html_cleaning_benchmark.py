@@ -0,0 +1,70 @@
+"""
+Compares the throughput (docs/sec) of the StackOverflow HTML cleaning implementations:
+- the previous BeautifulSoup `html.parser` based `remove_html_tags`,
+- the lxml based `remove_html_tags`,
+- the `HtmlCleaningStage` process pool, fed page by page like the crawler does.
+
+Usage:
+python test/benchmark/html_cleaning_benchmark.py [number_of_questions]
+"""
+
+import os
+import sys
+import time
+import multiprocessing
+from bs4 import BeautifulSoup
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.scripts.data_preparation import stackoverflow_extractor
+
+PAGE_SIZE = 100
+SAMPLE_BODY = (
+    "<p>I deploy my service with <code>helm install</code> but the pod keeps restarting with "
+    "<strong>CrashLoopBackOff</strong>. The logs show:</p>\n"
+    "<pre><code>Error: failed to start container &quot;app&quot;: exec: &quot;/bin/app&quot;: permission denied\n"
+    "Back-off restarting failed container\n</code></pre>\n"
+    "<p>My deployment looks like this:</p>\n"
+    "<pre><code>apiVersion: apps/v1\nkind: Deployment\nmetadata:\n  name: app\nspec:\n  replicas: 2\n</code></pre>\n"
+    "<ul><li>Kubernetes 1.29</li><li>Helm 3.14</li></ul>\n"
+    "<p>See <a href=\"https://kubernetes.io/docs\">the docs</a> &amp; "
+    "<a href=\"https://helm.sh\">Helm</a> for details.</p>\n"
+) * 3
+
+
+def remove_html_tags_bs4(text: str) -> str:
+    """The previous implementation of `remove_html_tags`."""
+    soup = BeautifulSoup(text, "html.parser")
+    return soup.get_text()
+
+
+def run(name: str, docs: int, clean) -> None:
+    start = time.perf_counter()
+    clean()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<32} {docs / elapsed:>10.0f} docs/sec ({elapsed:.2f}s)")
+
+
+def main(questions: int) -> None:
+    bodies = [f"<p>Question {i}</p>" + SAMPLE_BODY for i in range(questions)]
+    pages = [
+        [{"question": body, "answer": body + "<p>Accepted answer</p>", "tag": "benchmark"} for body in bodies[start:start + PAGE_SIZE // 2]]
+        for start in range(0, questions, PAGE_SIZE // 2)
+    ]
+
+    texts = [text for page in pages for row in page for text in (row["question"], row["answer"])]
+    docs = len(texts)
+    run("BeautifulSoup html.parser", docs, lambda: [remove_html_tags_bs4(text) for text in texts])
+    run("lxml remove_html_tags", docs, lambda: [stackoverflow_extractor.remove_html_tags(text) for text in texts])
+
+    stage = stackoverflow_extractor.HtmlCleaningStage(workers=multiprocessing.cpu_count())
+    try:
+        # Warm up the worker processes before timing
+        stage.submit(pages[0]).result()
+        run(f"HtmlCleaningStage ({multiprocessing.cpu_count()} procs)", docs,
+            lambda: [future.result() for future in [stage.submit(page) for page in pages]])
+    finally:
+        stage.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
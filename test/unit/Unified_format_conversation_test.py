@@ -15,6 +15,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')
 from src.scripts.convert.Unified_format_conversation import (
     extract_metadata, convert_files_to_json, process_error_yaml_file
 )
+from src.scripts.data_preparation.content_store import ContentStore
 
 class TestFileProcessing(unittest.TestCase):
 
@@ -96,6 +97,26 @@ class TestFileProcessing(unittest.TestCase):
             self.assertEqual(len(pdf_data), 1)
             self.assertEqual(pdf_data[0]['tag']['file_name'], 'sample.pdf')
 
+    def test_convert_files_to_json_keeps_tags_of_duplicates(self):
+        raw_dir = os.path.join(self.test_dir, 'raw')
+        store_dir = os.path.join(self.test_dir, 'store')
+        store = ContentStore(store_dir)
+        content = generate_random_text(200).encode('utf-8')
+        for project in ('containerd', 'cri-o'):
+            store.add(content, f"https://example.com/{project}/README.md",
+                      {'Category': 'Runtime', 'Subcategory': 'Container Runtime', 'Project_name': project},
+                      os.path.join(raw_dir, f"Runtime_Container Runtime_{project}_README.md"))
+
+        convert_files_to_json(set(), self.chunk_size, [], json_file_path=self.json_dir, file_paths=raw_dir,
+                              content_store_dir=store_dir)
+
+        with open(os.path.join(self.json_dir, 'md_data.json'), 'r', encoding='utf-8') as f:
+            md_data = json.load(f)
+        # The content was written and converted once, but is stored for both projects
+        self.assertEqual(os.listdir(raw_dir), ['Runtime_Container Runtime_containerd_README.md'])
+        self.assertEqual(sorted(entry['tag']['project_name'] for entry in md_data), ['containerd', 'cri-o'])
+        self.assertEqual(md_data[0]['content'], md_data[1]['content'])
+
 
 # Generate random text
 def generate_random_text(num_words=100):
@@ -0,0 +1,76 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+
+# Add the root of the project to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.scripts.data_preparation.content_store import ContentStore
+
+CODE_OF_CONDUCT = b"# Code of Conduct\n\nWe follow the CNCF Code of Conduct.\n"
+
+
+class TestContentStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.raw_files = os.path.join(self.temp_dir, 'raw_files')
+        self.store = ContentStore(os.path.join(self.temp_dir, 'store'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def add(self, store, project, content=CODE_OF_CONDUCT):
+        tags = {'Category': 'Runtime', 'Subcategory': 'Container Runtime', 'Project_name': project}
+        path = os.path.join(self.raw_files, f"Runtime_Container Runtime_{project}_CODE_OF_CONDUCT.md")
+        return store.add(content, f"https://raw.githubusercontent.com/{project}/main/CODE_OF_CONDUCT.md", tags, path), path
+
+    def test_duplicates_are_written_once_and_recorded_in_manifest(self):
+        (first_new, first_path), (second_new, second_path) = self.add(self.store, 'containerd'), self.add(self.store, 'cri-o')
+        third_new, _ = self.add(self.store, 'youki', b"# Another document\n")
+
+        self.assertTrue(first_new)
+        self.assertFalse(second_new)
+        self.assertTrue(third_new)
+        self.assertEqual(sorted(os.listdir(self.raw_files)),
+                         ['Runtime_Container Runtime_containerd_CODE_OF_CONDUCT.md',
+                          'Runtime_Container Runtime_youki_CODE_OF_CONDUCT.md'])
+        with open(first_path, 'rb') as f:
+            self.assertEqual(f.read(), CODE_OF_CONDUCT)
+
+        entries = list(self.store.manifest())
+        self.assertEqual([entry['project_name'] for entry in entries], ['containerd', 'cri-o', 'youki'])
+        self.assertEqual(entries[0]['sha256'], entries[1]['sha256'])
+        self.assertEqual(entries[1]['path'], first_path)
+        self.assertTrue(entries[1]['duplicate'])
+
+    def test_reopened_store_remembers_content_until_raw_file_is_removed(self):
+        self.add(self.store, 'containerd')
+
+        reopened = ContentStore(self.store.root)
+        self.assertFalse(self.add(reopened, 'cri-o')[0])
+
+        shutil.rmtree(self.raw_files)
+        new, path = self.add(ContentStore(self.store.root), 'cri-o')
+        self.assertTrue(new)
+        self.assertTrue(os.path.exists(path))
+
+    def test_rewritten_file_no_longer_counts_for_its_previous_content(self):
+        _, path = self.add(self.store, 'containerd')
+        self.add(self.store, 'containerd', b"# Updated Code of Conduct\n")
+
+        new, cri_o_path = self.add(self.store, 'cri-o')
+        self.assertTrue(new)
+        with open(cri_o_path, 'rb') as f:
+            self.assertEqual(f.read(), CODE_OF_CONDUCT)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b"# Updated Code of Conduct\n")
+        # The same holds after the index is rebuilt from the manifest
+        reopened = ContentStore(self.store.root)
+        self.assertFalse(self.add(reopened, 'youki')[0])
+        self.assertEqual(list(reopened.manifest())[-1]['path'], cri_o_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
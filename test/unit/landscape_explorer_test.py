@@ -3,6 +3,11 @@ import mock
 from unittest.mock import Mock
 import os
 import sys
+import json
+import tempfile
+import threading
+import yaml
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from src.scripts.scraping import landscape_explorer
 
@@ -59,6 +64,29 @@ def mocked_requests_get(*args, **kwargs):
                     {"path": "file5.yml", "type": "blob"},
                     {"path": "file6.md", "type": "blob"},
                 ]}, 200)
+        case 'https://api.github.com/repos/org/repo_pruned/git/trees/main?recursive=1':
+            return MockResponse({"tree": [], "truncated": True}, 200)
+        case 'https://api.github.com/repos/org/repo_pruned/git/trees/main':
+            return MockResponse({
+                "tree": [
+                    {"path": "README.md", "type": "blob"},
+                    {"path": "vendor", "type": "tree", "sha": "vendor_sha"},
+                    {"path": "docs", "type": "tree", "sha": "docs_sha"},
+                ]}, 200)
+        case 'https://api.github.com/repos/org/repo_pruned/git/trees/docs_sha?recursive=1':
+            return MockResponse({
+                "tree": [
+                    {"path": "guide.md", "type": "blob"},
+                    {"path": "testdata/fixture.yaml", "type": "blob"},
+                ]}, 200)
+        case 'https://api.github.com/repos/org/repo_filtered/git/trees/main?recursive=1':
+            return MockResponse({
+                "tree": [
+                    {"path": "values.yaml", "type": "blob", "size": 2048},
+                    {"path": "charts/app/crds/huge.yaml", "type": "blob", "size": 100},
+                    {"path": "deploy/generated.yaml", "type": "blob", "size": 10 * 1024 * 1024},
+                    {"path": "README.md", "type": "blob"},
+                ]}, 200)
         case 'https://api.github.com/repos/org/repo_rate_limit_exceeded':
             return MockResponse({}, 403, headers={"x-ratelimit-remaining": "0", "x-ratelimit-reset": "2"})
     return MockResponse(None, 404)
@@ -66,7 +94,22 @@ def mocked_requests_get(*args, **kwargs):
 
 class LandscapeExplorerTest(unittest.TestCase):
 
-    @mock.patch('requests.get', side_effect=mocked_requests_get)
+    def setUp(self):
+        # Responses are cached in a temporary directory instead of the working directory
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.patches = [
+            mock.patch.object(landscape_explorer, 'ETAG_CACHE_FILE', os.path.join(self.temp_dir.name, 'cache.sqlite')),
+            mock.patch.object(landscape_explorer, 'etag_cache', None),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.temp_dir.cleanup()
+
+    @mock.patch.object(landscape_explorer.SESSION, 'get', side_effect=mocked_requests_get)
     def test_get_urls(self, mock_get):
 
         landscape_explorer.get_default_branch = Mock(return_value="main")
@@ -80,7 +123,7 @@ class LandscapeExplorerTest(unittest.TestCase):
         }
         self.assertEqual(result, expected_result)
 
-    @mock.patch('requests.get', side_effect=mocked_requests_get)
+    @mock.patch.object(landscape_explorer.SESSION, 'get', side_effect=mocked_requests_get)
     def test_get_urls_with_nested_files(self, mock_get):
 
         landscape_explorer.get_default_branch = Mock(return_value="main")
@@ -99,15 +142,253 @@ class LandscapeExplorerTest(unittest.TestCase):
 
         self.assertEqual(result, expected_result)
 
-    @mock.patch('requests.get', side_effect=mocked_requests_get)
+    @mock.patch.object(landscape_explorer.SESSION, 'get', side_effect=mocked_requests_get)
+    def test_get_urls_skips_pruned_directories(self, mock_get):
+
+        landscape_explorer.get_default_branch = Mock(return_value="main")
+
+        result = landscape_explorer.get_urls(
+            "https://github.com/org/repo_pruned")
+
+        self.assertEqual(result, {"md": ["https://raw.githubusercontent.com/org/repo_pruned/main/README.md",
+                                         "https://raw.githubusercontent.com/org/repo_pruned/main/docs/guide.md"]})
+        requested = [c[0][0] for c in mock_get.call_args_list]
+        self.assertNotIn('https://api.github.com/repos/org/repo_pruned/git/trees/vendor_sha?recursive=1', requested)
+
+    @mock.patch.object(landscape_explorer.SESSION, 'get', side_effect=mocked_requests_get)
+    def test_get_urls_filters_by_size_and_path(self, mock_get):
+
+        landscape_explorer.get_default_branch = Mock(return_value="main")
+
+        stats = {}
+        result = landscape_explorer.get_urls(
+            "https://github.com/org/repo_filtered", stats=stats)
+
+        self.assertEqual(result, {"yaml": ["https://raw.githubusercontent.com/org/repo_filtered/main/values.yaml"],
+                                  "md": ["https://raw.githubusercontent.com/org/repo_filtered/main/README.md"]})
+        self.assertEqual(stats, {"files": 2, "bytes": 2048, "skipped_size": 1, "skipped_path": 1})
+
+        with mock.patch.object(landscape_explorer, 'PATH_ALLOW_PATTERNS', ['*/charts/*']):
+            result = landscape_explorer.get_urls("https://github.com/org/repo_filtered")
+        self.assertIn("https://raw.githubusercontent.com/org/repo_filtered/main/charts/app/crds/huge.yaml", result["yaml"])
+
+    @mock.patch.object(landscape_explorer.SESSION, 'get', side_effect=mocked_requests_get)
+    @mock.patch('time.time', return_value=0)
     @mock.patch('time.sleep', return_value=None)
-    def test_make_request_wait(self, mock_sleep, mock_get):
+    def test_make_request_wait(self, mock_sleep, mock_time, mock_get):
+        # Sleeping advances the mocked clock
+        clock = [0]
+        mock_time.side_effect = lambda: clock[0]
+        mock_sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
         landscape_explorer.get_default_branch = Mock(return_value="main")
-        landscape_explorer.make_request(
-            "https://api.github.com/repos/org/repo_rate_limit_exceeded")
+        with mock.patch.object(landscape_explorer, 'scheduler', landscape_explorer.TokenScheduler(["token"])):
+            landscape_explorer.make_request(
+                "https://api.github.com/repos/org/repo_rate_limit_exceeded")
 
-        # assert that time.sleep was called with the correct argument
+        # The wait is computed from the reset epoch and the request is retried
         landscape_explorer.time.sleep.assert_called_with(2)
+        self.assertEqual(mock_get.call_count, landscape_explorer.MAX_RETRIES + 1)
+
+    @mock.patch('time.sleep', return_value=None)
+    def test_make_request_rotates_to_next_token_when_rate_limited(self, mock_sleep):
+        limited = Mock(status_code=403, headers={"x-ratelimit-remaining": "0", "x-ratelimit-reset": "9999999999"})
+        success = Mock(status_code=200, headers={})
+        with mock.patch.object(landscape_explorer, 'scheduler', landscape_explorer.TokenScheduler(["a", "b"])), \
+                mock.patch.object(landscape_explorer, 'etag_cache', Mock(get=Mock(return_value=None))), \
+                mock.patch.object(landscape_explorer.SESSION, 'get', side_effect=[limited, success, success]) as mock_get:
+            self.assertIs(landscape_explorer.make_request("https://api.github.com/repos/org/repo"), success)
+            landscape_explorer.make_request("https://api.github.com/repos/org/repo")
+
+        tokens = [c[1]['headers']['Authorization'] for c in mock_get.call_args_list]
+        self.assertEqual(tokens, ["Bearer a", "Bearer b", "Bearer b"])
+        mock_sleep.assert_not_called()
+
+    @mock.patch('time.time', return_value=0)
+    @mock.patch('time.sleep', return_value=None)
+    def test_make_request_backs_off_on_secondary_rate_limit_without_retry_after(self, mock_sleep, mock_time):
+        # Sleeping advances the mocked clock
+        clock = [1000]
+        mock_time.side_effect = lambda: clock[0]
+        mock_sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+        limited = Mock(status_code=403, headers={"x-ratelimit-remaining": "5"},
+                       text='{"message": "You have exceeded a secondary rate limit."}')
+        success = Mock(status_code=200, headers={})
+        scheduler = landscape_explorer.TokenScheduler(["a"])
+        with mock.patch.object(landscape_explorer, 'scheduler', scheduler), \
+                mock.patch.object(landscape_explorer, 'etag_cache', Mock(get=Mock(return_value=None))), \
+                mock.patch.object(landscape_explorer.SESSION, 'get', side_effect=[limited, limited, success]):
+            self.assertIs(landscape_explorer.make_request("https://api.github.com/repos/org/repo"), success)
+
+        delay = landscape_explorer.SECONDARY_RATE_LIMIT_DELAY
+        self.assertEqual([c[0][0] for c in mock_sleep.call_args_list], [delay, 2 * delay])
+        self.assertEqual(scheduler.paused_until["a"], 1000 + 3 * delay)
+
+    def test_response_cache_is_opened_on_first_use(self):
+        self.assertIsNone(landscape_explorer.etag_cache)
+        self.assertFalse(os.path.exists(landscape_explorer.ETAG_CACHE_FILE))
+
+        landscape_explorer.get_etag_cache()
+
+        self.assertTrue(os.path.exists(landscape_explorer.ETAG_CACHE_FILE))
+
+    def test_get_default_branches_batches_graphql_queries(self):
+        response = Mock(status_code=200, headers={})
+        response.json.return_value = {"data": {
+            "r0": {"defaultBranchRef": {"name": "main", "target": {"oid": "commit_oid", "tree": {"oid": "tree_oid"}}}},
+            "r1": None,
+        }}
+        with mock.patch.object(landscape_explorer.SESSION, 'post', return_value=response) as mock_post:
+            branches = landscape_explorer.get_default_branches([
+                "https://github.com/org/repo_good", "https://github.com/org/missing", "https://gitlab.com/org/repo"])
+
+        self.assertEqual(branches, {"https://github.com/org/repo_good": ("main", "tree_oid", "commit_oid")})
+        mock_post.assert_called_once()
+        query = mock_post.call_args[1]['json']['query']
+        self.assertIn('r0: repository(owner: "org", name: "repo_good")', query)
+        self.assertIn('r1: repository(owner: "org", name: "missing")', query)
+
+    def test_make_request_revalidates_cached_response(self):
+        def response(status_code, content=b'', headers=None):
+            r = landscape_explorer.requests.Response()
+            r.status_code = status_code
+            r._content = content
+            r.headers.update(headers or {})
+            return r
+
+        url = "https://api.github.com/repos/org/repo_good/git/trees/main?recursive=1"
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                mock.patch.object(landscape_explorer, 'etag_cache',
+                                  landscape_explorer.ConditionalCache(os.path.join(temp_dir, 'cache.sqlite'))), \
+                mock.patch.object(landscape_explorer.SESSION, 'get', side_effect=[
+                    response(200, b'{"tree": []}', {'ETag': '"v1"'}), response(304)]) as mock_get:
+            landscape_explorer.make_request(url)
+            cached = landscape_explorer.make_request(url)
+
+        self.assertNotIn('If-None-Match', mock_get.call_args_list[0][1]['headers'])
+        self.assertEqual(mock_get.call_args_list[1][1]['headers']['If-None-Match'], '"v1"')
+        self.assertEqual(cached.status_code, 200)
+        self.assertEqual(cached.json(), {"tree": []})
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    """Serves a small landscape and the repository and tree endpoints of the GitHub REST API."""
+    landscape = {'landscape': [{'name': 'Category', 'subcategories': [{'name': 'Subcategory', 'items': [
+        {'name': 'Slow', 'repo_url': 'https://github.com/org/slow'},
+        {'name': 'No repo'},
+        {'name': 'Fast', 'repo_url': 'https://github.com/org/fast'},
+    ]}]}]}
+    trees = {
+        '/repos/org/slow/git/trees/tree-slow?recursive=1': {'tree': [{'path': 'docs/a.md', 'type': 'blob'}]},
+        '/repos/org/fast/git/trees/tree-fast?recursive=1': {'tree': [{'path': 'b.yaml', 'type': 'blob'},
+                                                                    {'path': 'main.go', 'type': 'blob'}]},
+    }
+
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append(self.path)
+        if self.path == '/landscape.yml':
+            body = yaml.dump(self.landscape).encode()
+        elif self.path in self.trees:
+            if 'slow' in self.path:
+                threading.Event().wait(0.2)
+            body = json.dumps(self.trees[self.path]).encode()
+        elif self.path.endswith('/commits/main'):
+            name = self.path.split('/')[3]
+            body = json.dumps({'sha': f'sha-{name}', 'commit': {'tree': {'sha': f'tree-{name}'}}}).encode()
+        elif self.path.startswith('/repos/org/'):
+            body = json.dumps({'default_branch': 'main'}).encode()
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GenerateAugmentedYmlTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGitHubHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        FakeGitHubHandler.requests_seen = []
+        base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.output_path = os.path.join(self.temp_dir.name, 'sources', 'landscape_augmented_repos.yml')
+        self.patches = [
+            mock.patch.object(landscape_explorer, 'BASE_API_URL', base_url),
+            mock.patch.object(landscape_explorer, 'BASE_REPO_YAML', f'{base_url}/landscape.yml'),
+            mock.patch.object(landscape_explorer, 'OUTPUT_PATH', self.output_path),
+            mock.patch.object(landscape_explorer, 'get_default_branch', Mock(return_value='main')),
+            mock.patch.object(landscape_explorer, 'etag_cache',
+                              landscape_explorer.ConditionalCache(os.path.join(self.temp_dir.name, 'cache.sqlite'))),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def test_generate_augmented_yml_merges_concurrent_results_in_order(self):
+        landscape_explorer.generate_augmented_yml_with_urls()
+
+        with open(self.output_path) as f:
+            items = yaml.safe_load(f)['landscape'][0]['subcategories'][0]['items']
+        self.assertEqual([item['name'] for item in items], ['Slow', 'No repo', 'Fast'])
+        self.assertEqual(items[0]['repo']['download_urls'],
+                         {'md': ['https://raw.githubusercontent.com/org/slow/main/docs/a.md']})
+        self.assertNotIn('repo', items[1])
+        self.assertEqual(items[2]['repo']['download_urls'],
+                         {'yaml': ['https://raw.githubusercontent.com/org/fast/main/b.yaml']})
+
+
+    def test_generate_augmented_yml_skips_repos_with_unchanged_head(self):
+        os.makedirs(os.path.dirname(self.output_path))
+        journal_path = self.output_path + landscape_explorer.JOURNAL_SUFFIX
+        with open(journal_path, 'w') as f:
+            f.write(json.dumps({'repo_url': 'https://github.com/org/slow', 'commit_sha': 'sha-slow',
+                                'filters': landscape_explorer.filters_fingerprint(),
+                                'download_urls': {'md': ['journaled.md']}}) + '\n')
+            f.write(json.dumps({'repo_url': 'https://github.com/org/fast', 'commit_sha': 'sha-old',
+                                'download_urls': {'md': ['outdated.md']}}) + '\n')
+            f.write('{"repo_url": "https://github.com/org/fa')  # Torn record of an interrupted run
+
+        landscape_explorer.generate_augmented_yml_with_urls()
+
+        with open(self.output_path) as f:
+            items = yaml.safe_load(f)['landscape'][0]['subcategories'][0]['items']
+        self.assertEqual(items[0]['repo']['download_urls'], {'md': ['journaled.md']})
+        self.assertEqual(items[2]['repo']['download_urls'],
+                         {'yaml': ['https://raw.githubusercontent.com/org/fast/main/b.yaml']})
+        self.assertFalse(any('slow/git/trees' in path for path in FakeGitHubHandler.requests_seen))
+        with open(journal_path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([(r['repo_url'], r['commit_sha']) for r in records],
+                         [('https://github.com/org/slow', 'sha-slow'), ('https://github.com/org/fast', 'sha-fast')])
+
+    def test_journal_appends_after_torn_record(self):
+        journal_path = os.path.join(self.temp_dir.name, 'journal.jsonl')
+        with open(journal_path, 'w') as f:
+            f.write(json.dumps({'repo_url': 'https://github.com/org/slow'}) + '\n')
+            # A complete record whose newline was never written
+            f.write(json.dumps({'repo_url': 'https://github.com/org/fast', 'commit_sha': 'sha-torn'}))
+
+        journal = landscape_explorer.ExplorationJournal(journal_path)
+        self.assertNotIn('https://github.com/org/fast', journal)
+        journal.append({'repo_url': 'https://github.com/org/fast', 'commit_sha': 'sha-fast'})
+        journal.close()
+
+        self.assertEqual(journal.get('https://github.com/org/fast')['commit_sha'], 'sha-fast')
+        self.assertEqual(journal.get('https://github.com/org/slow'), {'repo_url': 'https://github.com/org/slow'})
 
 
 if __name__ == '__main__':
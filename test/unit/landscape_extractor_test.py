@@ -3,10 +3,16 @@ import os
 import zipfile
 import sys
 import shutil
+import tempfile
+from concurrent.futures import Future
+from unittest.mock import patch
 
 # Assuming landscape_extractor.py is located in the src/scripts/data_preparation directory
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from src.scripts.data_preparation import landscape_extractor
+from src.scripts.data_preparation.content_store import ContentStore
+
+TEST_YAML = os.path.join(os.path.dirname(__file__), '../resources/test_landscape_augmented.yml')
 
 class Testdownload_files_from_yaml(unittest.TestCase):
     """
@@ -14,62 +20,111 @@ class Testdownload_files_from_yaml(unittest.TestCase):
     """
 
     def setUp(self):
-        self.output_directory = "sources/raw_files_test"
-        self.cache_file = landscape_extractor.CACHE_FILE
+        # The landscape is loaded from a copy, so its index sidecar is not written next to the test resource
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.yaml_file = os.path.join(self.temp_dir.name, 'landscape.yml')
+        shutil.copy(TEST_YAML, self.yaml_file)
+        self.output_directory = os.path.join(self.temp_dir.name, 'raw_files_test')
         os.makedirs(self.output_directory, exist_ok=True)
-        # Ensure the cache file is clean before each test
-        if os.path.exists(self.cache_file):
-            os.remove(self.cache_file)
+        # The download state, content store and archives are written to the temporary directory as well
+        self.patches = [
+            patch.object(landscape_extractor, 'CACHE_FILE', os.path.join(self.temp_dir.name, 'cache.sqlite')),
+            patch.object(landscape_extractor, 'CONTENT_STORE', ContentStore(os.path.join(self.temp_dir.name, 'store'))),
+            patch.object(landscape_extractor, 'ARCHIVE_DIRECTORY', self.temp_dir.name),
+        ]
+        for p in self.patches:
+            p.start()
 
     def test_with_valid_input(self):
-        expected_zipFile = "sources/Test_Provisioning.zip"
+        expected_zipFile = os.path.join(self.temp_dir.name, "Test_Provisioning.zip")
         # Write downloaded content to file
         landscape_extractor.download_files_from_yaml(
-            yaml_file=os.path.join(os.path.dirname(__file__), '../resources/test_landscape_augmented.yml'), output_directory=self.output_directory)
+            yaml_file=self.yaml_file, output_directory=self.output_directory)
 
-        # Create the extract output_directory if it doesn't exist
-        os.makedirs(self.output_directory, exist_ok=True)
         # Open the zip file
         with zipfile.ZipFile(expected_zipFile, 'r') as zip_file:
             # Extract all the contents to the specified output_directory
             zip_file.extractall(self.output_directory)
         # Assert the file exists
-        file_path_1 = "sources/raw_files_test/Test_Provisioning_Automation & Configuration_Airship_bug_report.md"
+        file_path_1 = os.path.join(self.output_directory, "Test_Provisioning_Automation & Configuration_Airship_bug_report.md")
         error_message_1 = f"File '{file_path_1}' was not downloaded."
         self.assertTrue(os.path.exists(file_path_1), error_message_1)
         
-        file_path_2 = "sources/raw_files_test/Test_Provisioning_Automation & Configuration_Airship_feature_request.md"
+        file_path_2 = os.path.join(self.output_directory, "Test_Provisioning_Automation & Configuration_Airship_feature_request.md")
         error_message_2 = f"File '{file_path_2}' was not downloaded."
         self.assertTrue(os.path.exists(file_path_2), error_message_2)
 
     def test_cache_functionality(self):
         # Download files first time
         landscape_extractor.download_files_from_yaml(
-            yaml_file=os.path.join(os.path.dirname(__file__), '../resources/test_landscape_augmented.yml'), output_directory=self.output_directory)
+            yaml_file=self.yaml_file, output_directory=self.output_directory)
         
         # Capture the cache contents after the first download
-        with open(self.cache_file, 'r') as f:
-            initial_cache_contents = f.readlines()
+        cache = landscape_extractor.load_cache()
+        initial_cache_contents = cache.snapshot()
+        cache.close()
 
         # Download files second time and capture cache contents again
         landscape_extractor.download_files_from_yaml(
-            yaml_file=os.path.join(os.path.dirname(__file__), '../resources/test_landscape_augmented.yml'), output_directory=self.output_directory)
+            yaml_file=self.yaml_file, output_directory=self.output_directory)
 
-        with open(self.cache_file, 'r') as f:
-            subsequent_cache_contents = f.readlines()
+        cache = landscape_extractor.load_cache()
+        subsequent_cache_contents = cache.snapshot()
+        cache.close()
 
-        # Assert the cache contents are the same, ensuring no duplicates were added
+        # Assert the cache contents are the same, ensuring no file was downloaded again
+        self.assertTrue(initial_cache_contents)
         self.assertEqual(initial_cache_contents, subsequent_cache_contents)
 
     def tearDown(self):
-        # Clean up: remove the output_directory and its contents
-        if os.path.exists(self.output_directory):
-            shutil.rmtree(self.output_directory)
-        if os.path.exists("sources/Test_Provisioning.zip"):
-            os.remove("sources/Test_Provisioning.zip")
-        if os.path.exists(self.cache_file):
-            os.remove(self.cache_file)
+        # Clean up: remove the temporary directory and its contents
+        for p in self.patches:
+            p.stop()
+        self.temp_dir.cleanup()
         
+class TestArchiveCategory(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def downloaded(self, name):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'w') as f:
+            f.write(name)
+        future = Future()
+        future.set_result(path)
+        return future
+
+    def test_appends_only_new_files_of_category(self):
+        skipped = Future()
+        skipped.set_result(None)
+        with patch.object(landscape_extractor, 'ARCHIVE_DIRECTORY', self.temp_dir):
+            landscape_extractor.archive_category('Runtime', [self.downloaded('Runtime_a.md'), skipped])
+            # A file of another category lying in the same directory is not added
+            self.downloaded('Provisioning_b.md')
+            archive_path = landscape_extractor.archive_category(
+                'Runtime', [self.downloaded('Runtime_a.md'), self.downloaded('Runtime_c.md')])
+
+        with zipfile.ZipFile(archive_path) as zip_file:
+            self.assertEqual(zip_file.namelist(), ['Runtime_a.md', 'Runtime_c.md'])
+            self.assertEqual(zip_file.read('Runtime_c.md'), b'Runtime_c.md')
+
+    def test_replaces_files_downloaded_with_new_content(self):
+        with patch.object(landscape_extractor, 'ARCHIVE_DIRECTORY', self.temp_dir):
+            landscape_extractor.archive_category('Runtime', [self.downloaded('Runtime_a.md'), self.downloaded('Runtime_b.md')])
+            updated = self.downloaded('Runtime_a.md')
+            with open(updated.result(), 'w') as f:
+                f.write('new content')
+            archive_path = landscape_extractor.archive_category('Runtime', [updated, self.downloaded('Runtime_b.md')])
+
+        with zipfile.ZipFile(archive_path) as zip_file:
+            self.assertEqual(sorted(zip_file.namelist()), ['Runtime_a.md', 'Runtime_b.md'])
+            self.assertEqual(zip_file.read('Runtime_a.md'), b'new content')
+            self.assertEqual(zip_file.read('Runtime_b.md'), b'Runtime_b.md')
+
 
 if __name__ == '__main__':
     unittest.main()
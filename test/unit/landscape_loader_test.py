@@ -0,0 +1,53 @@
+import unittest
+from unittest.mock import patch
+import os
+import shutil
+import sys
+import tempfile
+
+# Add the root of the project to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.scripts.data_preparation import landscape_loader
+
+TEST_YAML = os.path.join(os.path.dirname(__file__), '../resources/test_landscape_augmented.yml')
+
+
+class TestLandscapeLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.yaml_file = os.path.join(self.temp_dir.name, 'landscape.yml')
+        shutil.copy(TEST_YAML, self.yaml_file)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_load_landscape_keeps_project_urls(self):
+        data = landscape_loader.load_landscape(self.yaml_file)
+
+        items = [item for category in data['landscape'] for subcategory in category['subcategories']
+                 for item in subcategory['items']]
+        self.assertTrue(items)
+        self.assertTrue(any(item['repo']['download_urls'] for item in items))
+        self.assertEqual(set(items[0]), {'name', 'repo', 'website'})
+        self.assertTrue(os.path.exists(self.yaml_file + landscape_loader.INDEX_SUFFIX))
+
+    def test_load_landscape_reuses_sidecar_until_file_changes(self):
+        expected = landscape_loader.load_landscape(self.yaml_file)
+
+        with patch.object(landscape_loader, 'build_index') as mock_build:
+            # Same content with a new mtime is recognised by its hash
+            os.utime(self.yaml_file, ns=(0, 0))
+            self.assertEqual(landscape_loader.load_landscape(self.yaml_file), expected)
+            mock_build.assert_not_called()
+
+        with open(self.yaml_file, 'w') as f:
+            f.write('landscape:\n  - name: "Runtime"\n    subcategories:\n      - name: "Sub"\n'
+                    '        items:\n          - name: "Project"\n')
+        data = landscape_loader.load_landscape(self.yaml_file)
+        self.assertEqual(data['landscape'][0]['subcategories'][0]['items'],
+                         [{'name': 'Project', 'repo': {'download_urls': []}, 'website': {'docs': []}}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+
+# Add the root of the project to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.scripts.data_preparation import language_detection
+
+ENGLISH = "Kubernetes schedules containers onto the nodes of a cluster and restarts them when they fail. "
+GERMAN = "Kubernetes verteilt Container auf die Knoten eines Clusters und startet sie neu, wenn sie ausfallen. "
+
+
+class TestLanguageDetection(unittest.TestCase):
+
+    def test_is_english(self):
+        self.assertTrue(language_detection.is_english(ENGLISH.encode('utf-8')))
+        self.assertFalse(language_detection.is_english(GERMAN.encode('utf-8')))
+        self.assertFalse(language_detection.is_english(b'%PDF-1.7\n\xff\xfe\x00binary'))
+
+    def test_sample_text_is_bounded_and_survives_cut_characters(self):
+        content = ("Überblick über die Architektur. " * 2000).encode('utf-8')
+
+        sample = language_detection.sample_text(content)
+
+        self.assertLessEqual(len(sample), language_detection.SAMPLE_WINDOWS * language_detection.WINDOW_SIZE + 2)
+        self.assertIn("Architektur", sample)
+
+    def test_needs_text_extraction(self):
+        self.assertTrue(language_detection.needs_text_extraction("https://example.com/docs/Guide.PDF"))
+        self.assertFalse(language_detection.needs_text_extraction("https://example.com/docs/README.md"))
+
+    def test_detector_caches_verdicts_by_content(self):
+        detector = language_detection.LanguageDetector(max_workers=1)
+        try:
+            with patch.object(detector, '_get_executor') as mock_executor:
+                mock_executor.return_value.submit.return_value.result.return_value = True
+                self.assertTrue(detector.is_english(ENGLISH.encode('utf-8')))
+                self.assertTrue(detector.is_english(ENGLISH.encode('utf-8')))
+                self.assertEqual(mock_executor.return_value.submit.call_count, 1)
+            # The real pool classifies other content
+            self.assertFalse(detector.is_english((GERMAN * 200).encode('utf-8')))
+        finally:
+            detector.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+import asyncio
 from unittest.mock import patch, MagicMock, mock_open
 import requests
 import json
@@ -9,6 +10,9 @@ from datetime import datetime, timedelta
 import yaml
 import tempfile
 import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
 
 # Add the root of the project to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
@@ -16,7 +20,7 @@ from src.scripts.data_preparation import stackoverflow_extractor
 
 API_KEY = 'test_api_key'
 REQUEST_DELAY = 0
-PROGRESS_FILE = 'test_progress.json'
+PROGRESS_FILE = 'test_progress.sqlite'
 CSV_FILE = 'test_qas.csv'
 PROCESSED_IDS_FILE = 'test_processed_question_ids.json'
 TAGS_FILE = 'test_tags.json'
@@ -27,7 +31,7 @@ class TestStackOverflowQAScript(unittest.TestCase):
 
     def setUp(self):
         self.temp_dir = tempfile.TemporaryDirectory()
-        self.progress_file = os.path.join(self.temp_dir.name, 'test_progress.json')
+        self.progress_file = os.path.join(self.temp_dir.name, 'test_progress.sqlite')
         self.csv_file = os.path.join(self.temp_dir.name, 'test_qas.csv')
         self.processed_ids_file = os.path.join(self.temp_dir.name, 'test_processed_question_ids.json')
         self.tags_file = os.path.join(self.temp_dir.name, 'test_tags.json')
@@ -38,7 +42,15 @@ class TestStackOverflowQAScript(unittest.TestCase):
         PROCESSED_IDS_FILE = self.processed_ids_file
         TAGS_FILE = self.tags_file
 
+        self.budget_file = os.path.join(self.temp_dir.name, 'request_budget.json')
+        self.budget_patch = patch.object(stackoverflow_extractor, 'request_budget',
+                                         stackoverflow_extractor.RequestBudget(self.budget_file))
+        self.budget_patch.start()
+
     def tearDown(self):
+        self.budget_patch.stop()
+        stackoverflow_extractor.close_csv_writers()
+        stackoverflow_extractor.shutdown_html_stage()
         self.temp_dir.cleanup()
 
     @patch('requests.get')
@@ -54,8 +66,9 @@ class TestStackOverflowQAScript(unittest.TestCase):
         response = stackoverflow_extractor.fetch_with_backoff(api_url, params)
         self.assertEqual(response, {"items": []})
 
+    @patch('time.sleep')
     @patch('requests.get')
-    def test_fetch_with_backoff_rate_limit(self, mock_get):
+    def test_fetch_with_backoff_rate_limit(self, mock_get, mock_sleep):
         mock_response = MagicMock()
         mock_response.status_code = 429
         mock_response.headers = {'retry-after': '1'}
@@ -64,8 +77,185 @@ class TestStackOverflowQAScript(unittest.TestCase):
         api_url = "http://example.com"
         params = {}
 
-        with self.assertRaises(SystemExit):
+        with self.assertRaises(requests.HTTPError):
             stackoverflow_extractor.fetch_with_backoff(api_url, params)
+        self.assertEqual(mock_get.call_count, stackoverflow_extractor.MAX_RETRIES + 1)
+        retry_delays = [c[0][0] for c in mock_sleep.call_args_list if c[0][0] >= 1]
+        self.assertEqual(retry_delays, [stackoverflow_extractor.retry_delay(i, '1') for i in range(stackoverflow_extractor.MAX_RETRIES)])
+
+    @patch('time.sleep')
+    @patch('requests.get')
+    def test_fetch_with_backoff_retries_until_success(self, mock_get, mock_sleep):
+        rate_limited = MagicMock(status_code=429, headers={})
+        success = MagicMock(status_code=200)
+        success.json.return_value = {"items": [], "backoff": 3}
+        mock_get.side_effect = [rate_limited, success]
+
+        bucket = stackoverflow_extractor.TokenBucket(rate=1000)
+        with patch.object(stackoverflow_extractor, 'token_bucket', bucket):
+            response = stackoverflow_extractor.fetch_with_backoff("http://example.com", {})
+            self.assertEqual(response["items"], [])
+            # The backoff field holds back the next request
+            self.assertGreater(bucket.reserve(), 2)
+
+    def test_token_bucket_paces_requests(self):
+        bucket = stackoverflow_extractor.TokenBucket(rate=2, capacity=2)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertGreater(bucket.reserve(), 0)
+
+    def test_request_budget_follows_quota_and_survives_restart(self):
+        budget = stackoverflow_extractor.RequestBudget(self.budget_file, daily_limit=10)
+        budget.acquire()
+        budget.observe({"quota_remaining": 3, "quota_max": 10000})
+        self.assertEqual(budget.remaining(), 3)
+
+        restarted = stackoverflow_extractor.RequestBudget(self.budget_file, daily_limit=10)
+        self.assertEqual(restarted.remaining(), 3)
+        for _ in range(3):
+            restarted.acquire()
+        with self.assertRaises(stackoverflow_extractor.QuotaExceededError):
+            restarted.acquire()
+
+    def test_request_budget_saves_periodically_and_on_flush(self):
+        budget = stackoverflow_extractor.RequestBudget(self.budget_file, daily_limit=1000)
+        budget.acquire()
+        budget.observe({"quota_remaining": 100})
+        for quota_remaining in range(99, 94, -1):
+            budget.acquire()
+            budget.observe({"quota_remaining": quota_remaining})
+        with open(self.budget_file, 'r') as f:
+            self.assertEqual(json.load(f)["quota_remaining"], 100)
+
+        budget.flush()
+        with open(self.budget_file, 'r') as f:
+            self.assertEqual(json.load(f)["quota_remaining"], 95)
+
+    def test_request_budget_resets_on_new_day(self):
+        with open(self.budget_file, 'w') as f:
+            json.dump({"day": "2000-01-01", "used": 10, "quota_remaining": 0}, f)
+        budget = stackoverflow_extractor.RequestBudget(self.budget_file, daily_limit=10)
+        self.assertEqual(budget.remaining(), 10)
+
+    def test_schedule_tags_resumes_started_tags_within_budget(self):
+        progress = {"done": "finished", "started": 4, "empty": "null"}
+        scheduled = stackoverflow_extractor.schedule_tags(["new1", "done", "new2", "started", "empty"], progress, 5)
+        self.assertEqual(scheduled, [("started", 4, None), ("new1", 1, None)])
+
+    def test_schedule_tags_syncs_finished_tags_from_watermark(self):
+        progress = {"done": "finished", "started": 4}
+        scheduled = stackoverflow_extractor.schedule_tags(["new", "done", "started"], progress, 100, {"done": 1700000000})
+        self.assertEqual(scheduled, [("started", 4, None), ("done", 1, 1700000000), ("new", 1, None)])
+        self.assertEqual(stackoverflow_extractor.search_params("done", 1, 100, 1700000000)['min'], 1700000001)
+
+    def test_checkpoint_store_imports_legacy_json_and_survives_restart(self):
+        legacy_progress = os.path.join(self.temp_dir.name, 'progress.json')
+        with open(legacy_progress, 'w') as f:
+            json.dump({"done": "finished", "started": 4}, f)
+        store = stackoverflow_extractor.CheckpointStore(PROGRESS_FILE, legacy_progress)
+        store.checkpoint("started", 5, 1700000100)
+        store.checkpoint("started", None, 1700000000)
+        store.save_watermark("new", 1700000200)
+
+        restarted = stackoverflow_extractor.CheckpointStore(PROGRESS_FILE, legacy_progress)
+        self.assertEqual(restarted.progress(), {"done": "finished", "started": 5})
+        self.assertEqual(restarted.watermarks(), {"started": 1700000100, "new": 1700000200})
+
+    @patch('src.scripts.data_preparation.stackoverflow_extractor.fetch_answers_batch')
+    @patch('src.scripts.data_preparation.stackoverflow_extractor.fetch_with_backoff')
+    def test_incremental_sync_refetches_processed_questions(self, mock_fetch, mock_answers):
+        mock_fetch.return_value = {"items": [{"question_id": 1, "body": "<p>Q</p>", "answer_count": 1,
+                                              "last_activity_date": 1700000500}], "has_more": False}
+        mock_answers.return_value = {1: [{"body": "<p>New answer</p>", "score": 2}]}
+        processed = stackoverflow_extractor.ProcessedQuestionIds(
+            os.path.join(self.temp_dir.name, 'ids.bin'), PROCESSED_IDS_FILE)
+        processed.add_many([1])
+        with patch.object(stackoverflow_extractor, 'processed_ids_store', processed), \
+                patch.object(stackoverflow_extractor, 'CSV_FILE', CSV_FILE), \
+                patch.object(stackoverflow_extractor, 'PROGRESS_FILE', PROGRESS_FILE), \
+                patch.object(stackoverflow_extractor, 'html_stage', stackoverflow_extractor.HtmlCleaningStage(workers=0)):
+            stackoverflow_extractor.qa_extractor("test", 1, since=1700000000)
+            self.assertEqual(mock_fetch.call_args[0][1]['min'], 1700000001)
+            self.assertEqual(stackoverflow_extractor.load_watermarks(), {"test": 1700000500})
+            self.assertEqual(stackoverflow_extractor.load_progress(), {"test": "finished"})
+        stackoverflow_extractor.close_csv_writers()
+        self.assertEqual(list(pd.read_csv(CSV_FILE)['answer']), ["New answer"])
+
+    @patch('src.scripts.data_preparation.stackoverflow_extractor.fetch_answers_batch', return_value={})
+    @patch('src.scripts.data_preparation.stackoverflow_extractor.fetch_with_backoff')
+    def test_qa_extractor_marks_tag_done_after_empty_page(self, mock_fetch, mock_answers):
+        mock_fetch.side_effect = [
+            {"items": [{"question_id": 1, "body": "<p>Q</p>", "answer_count": 0}], "has_more": True},
+            {"items": [], "has_more": False},
+        ]
+        processed = stackoverflow_extractor.ProcessedQuestionIds(
+            os.path.join(self.temp_dir.name, 'ids.bin'), PROCESSED_IDS_FILE)
+        with patch.object(stackoverflow_extractor, 'processed_ids_store', processed), \
+                patch.object(stackoverflow_extractor, 'CSV_FILE', CSV_FILE), \
+                patch.object(stackoverflow_extractor, 'PROGRESS_FILE', PROGRESS_FILE), \
+                patch.object(stackoverflow_extractor, 'html_stage', stackoverflow_extractor.HtmlCleaningStage(workers=0)):
+            stackoverflow_extractor.qa_extractor("t", 1)
+            self.assertEqual(stackoverflow_extractor.load_progress(), {"t": "null"})
+
+    @patch('src.scripts.data_preparation.stackoverflow_extractor.fetch_answers_batch', return_value={})
+    @patch('src.scripts.data_preparation.stackoverflow_extractor.fetch_with_backoff')
+    def test_watermark_is_saved_when_the_sync_ends(self, mock_fetch, mock_answers):
+        first_page = {"items": [{"question_id": 1, "body": "<p>Q</p>", "answer_count": 1,
+                                 "last_activity_date": 1700000900}], "has_more": True}
+        last_page = {"items": [{"question_id": 2, "body": "<p>Q</p>", "answer_count": 1,
+                                "last_activity_date": 1700000600}], "has_more": False}
+        mock_fetch.side_effect = [first_page, stackoverflow_extractor.QuotaExceededError("Budget used up"),
+                                  first_page, last_page]
+        with patch.object(stackoverflow_extractor, 'processed_ids_store', set()), \
+                patch.object(stackoverflow_extractor, 'save_processed_question_ids'), \
+                patch.object(stackoverflow_extractor, 'CSV_FILE', CSV_FILE), \
+                patch.object(stackoverflow_extractor, 'PROGRESS_FILE', PROGRESS_FILE), \
+                patch.object(stackoverflow_extractor, 'html_stage', stackoverflow_extractor.HtmlCleaningStage(workers=0)):
+            # Interrupted after the first (newest) page: the older pages were never fetched
+            stackoverflow_extractor.qa_extractor("test", 1, since=1700000000)
+            self.assertEqual(stackoverflow_extractor.load_watermarks(), {})
+
+            stackoverflow_extractor.qa_extractor("test", 1, since=1700000000)
+            self.assertEqual(stackoverflow_extractor.load_watermarks(), {"test": 1700000900})
+
+    def test_compact_csv_keeps_latest_rows_per_question(self):
+        rows = [
+            {"question": "Q1", "answer": "old", "tag": "t", "question_id": 1, "score": 1, "last_activity_date": 100},
+            {"question": "Q2", "answer": "kept", "tag": "t", "question_id": 2, "score": 1, "last_activity_date": 100},
+            {"question": "Q1", "answer": "new a", "tag": "t", "question_id": 1, "score": 3, "last_activity_date": 200},
+            {"question": "Q1", "answer": "new b", "tag": "t", "question_id": 1, "score": 2, "last_activity_date": 200},
+        ]
+        stackoverflow_extractor.save_to_csv(rows, CSV_FILE)
+        stackoverflow_extractor.close_csv_writers()
+
+        stackoverflow_extractor.compact_csv(CSV_FILE)
+
+        self.assertEqual(list(pd.read_csv(CSV_FILE)['answer']), ["kept", "new a", "new b"])
+
+    def test_compact_csv_keeps_rows_of_other_tags(self):
+        rows = [
+            {"question": "Q1", "answer": "other tag", "tag": "a", "question_id": 1, "score": 1, "last_activity_date": 100},
+            {"question": "Q1", "answer": "old", "tag": "b", "question_id": 1, "score": 1, "last_activity_date": 100},
+            {"question": "Q1", "answer": "new", "tag": "b", "question_id": 1, "score": 1, "last_activity_date": 200},
+        ]
+        stackoverflow_extractor.save_to_csv(rows, CSV_FILE)
+        stackoverflow_extractor.close_csv_writers()
+
+        stackoverflow_extractor.compact_csv(CSV_FILE)
+
+        self.assertEqual(list(pd.read_csv(CSV_FILE)['answer']), ["other tag", "new"])
+
+    def test_compact_csv_drops_answers_fetched_twice(self):
+        row = {"question": "Q1", "answer": "A", "tag": "t", "question_id": 1, "answer_id": 10, "score": 1,
+               "last_activity_date": 100}
+        stackoverflow_extractor.save_to_csv([row, dict(row, score=2), dict(row, answer_id=11)], CSV_FILE)
+        stackoverflow_extractor.close_csv_writers()
+
+        stackoverflow_extractor.compact_csv(CSV_FILE)
+
+        compacted = pd.read_csv(CSV_FILE)
+        self.assertEqual(list(compacted['answer_id']), [10, 11])
+        self.assertEqual(list(compacted['score']), [2, 1])
 
     @patch('requests.get')
     def test_qa_extractor(self, mock_get):
@@ -87,7 +277,8 @@ class TestStackOverflowQAScript(unittest.TestCase):
 
         mock_get.side_effect = [mock_response_questions, mock_response_answers]
 
-        with patch('src.scripts.data_preparation.stackoverflow_extractor.fetch_answers', return_value=[{"body": "<p>Answer</p>", "score": 1}]):
+        with patch('src.scripts.data_preparation.stackoverflow_extractor.fetch_answers_batch', return_value={1: [{"body": "<p>Answer</p>", "score": 1}]}), \
+                patch.object(stackoverflow_extractor, 'PROGRESS_FILE', PROGRESS_FILE):
             with patch('src.scripts.data_preparation.stackoverflow_extractor.load_processed_question_ids', return_value=set()):
                 with patch('src.scripts.data_preparation.stackoverflow_extractor.save_processed_question_ids'):
                     with patch('src.scripts.data_preparation.stackoverflow_extractor.save_to_csv'):
@@ -96,11 +287,53 @@ class TestStackOverflowQAScript(unittest.TestCase):
                         new_request_count = stackoverflow_extractor.qa_extractor(tag, start_page)
                         self.assertGreaterEqual(new_request_count, 1)
 
+    @patch('src.scripts.data_preparation.stackoverflow_extractor.fetch_with_backoff')
+    def test_fetch_answers_batch_groups_by_question(self, mock_fetch):
+        mock_fetch.side_effect = [
+            {"items": [
+                {"question_id": 2, "body": "<p>A</p>", "score": 9},
+                {"question_id": 1, "body": "<p>B</p>", "score": 5},
+            ], "has_more": True},
+            {"items": [
+                {"question_id": 2, "body": "<p>C</p>", "score": 1},
+            ], "has_more": False},
+        ]
+
+        answers = stackoverflow_extractor.fetch_answers_batch([1, 2])
+
+        self.assertEqual(mock_fetch.call_count, 2)
+        self.assertTrue(mock_fetch.call_args_list[0][0][0].endswith("/questions/1;2/answers"))
+        self.assertEqual(mock_fetch.call_args_list[1][0][1]['page'], 2)
+        self.assertEqual([a['body'] for a in answers[2]], ["<p>A</p>", "<p>C</p>"])
+        self.assertEqual([a['body'] for a in answers[1]], ["<p>B</p>"])
+
     def test_remove_html_tags(self):
         html = "<p>This is a <b>test</b>.</p>"
         text = stackoverflow_extractor.remove_html_tags(html)
         self.assertEqual(text, "This is a test.")
 
+    def test_remove_html_tags_keeps_code_blocks_fenced(self):
+        html = "<p>Run:</p><pre><code>kubectl get pods\n</code></pre><p>Done &amp; dusted</p>"
+        text = stackoverflow_extractor.remove_html_tags(html)
+        self.assertEqual(text, "Run:\n```\nkubectl get pods\n```\nDone & dusted")
+
+    def test_html_cleaning_stage_cleans_rows_in_worker_processes(self):
+        stage = stackoverflow_extractor.HtmlCleaningStage(workers=2, max_pending=1)
+        try:
+            futures = [stage.submit([{"question": f"<p>Q{i}</p>", "answer": "<b>A</b>", "tag": "test"}]) for i in range(3)]
+            rows = [future.result()[0] for future in futures]
+        finally:
+            stage.shutdown()
+        self.assertEqual(rows, [{"question": f"Q{i}", "answer": "A", "tag": "test"} for i in range(3)])
+
+    def test_html_cleaning_stage_cleans_in_process_without_process_pool(self):
+        rows = [{"question": "<p>Q</p>", "answer": "<p>A</p>"}]
+        with patch.object(stackoverflow_extractor, 'ProcessPoolExecutor', side_effect=NotImplementedError("no sem_open")):
+            stage = stackoverflow_extractor.HtmlCleaningStage(workers=2)
+        self.assertEqual(stage.submit(rows).result()[0]['answer'], "A")
+        self.assertEqual(asyncio.run(stage.clean_async(rows))[0]['question'], "Q")
+        stage.shutdown()
+
     def test_save_to_csv(self):
         data = [{"question": "Q1", "answer": "A1", "tag": "test"}]
         stackoverflow_extractor.save_to_csv(data, CSV_FILE)
@@ -111,6 +344,91 @@ class TestStackOverflowQAScript(unittest.TestCase):
         self.assertEqual(df.iloc[0]['answer'], "A1")
         self.assertEqual(df.iloc[0]['tag'], "test")
 
+    def test_save_to_csv_appends_without_rewriting_header(self):
+        stackoverflow_extractor.save_to_csv([{"question": "Q1", "answer": "A1", "tag": "test"}], CSV_FILE)
+        stackoverflow_extractor.save_to_csv([{"question": "Q2", "answer": "A2", "tag": "test"}], CSV_FILE)
+        stackoverflow_extractor.close_csv_writers()
+        stackoverflow_extractor.save_to_csv([{"question": "Q3", "answer": "A3", "tag": "test"}], CSV_FILE)
+
+        with open(CSV_FILE, 'r') as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines, [",".join(stackoverflow_extractor.CSV_COLUMNS),
+                                 "Q1,A1,test,,,,,,", "Q2,A2,test,,,,,,", "Q3,A3,test,,,,,,"])
+
+    def test_csv_append_writer_rotates_shards(self):
+        writer = stackoverflow_extractor.CSVAppendWriter(CSV_FILE, shard_max_rows=2)
+        for i in range(5):
+            writer.write_rows([{"question": f"Q{i}", "answer": f"A{i}", "tag": "test"}])
+        writer.close()
+
+        base, ext = os.path.splitext(CSV_FILE)
+        shard_sizes = [len(pd.read_csv(f"{base}_{index:05d}{ext}")) for index in range(1, 4)]
+        self.assertEqual(shard_sizes, [2, 2, 1])
+        self.assertFalse(os.path.exists(CSV_FILE))
+
+    def test_parquet_dataset_writer_partitions_by_tag_with_typed_columns(self):
+        parquet_dir = os.path.join(self.temp_dir.name, 'qas_parquet')
+        writer = stackoverflow_extractor.ParquetDatasetWriter(parquet_dir, row_group_size=2)
+        writer.write_rows([
+            {"question": f"Q{i}", "answer": f"A{i}", "tag": "helm/charts" if i % 2 else "argo",
+             "question_id": i, "answer_id": 100 + i, "answer_rank": 1, "score": i,
+             "creation_date": 1700000000 + i, "last_activity_date": 1700000100 + i}
+            for i in range(5)
+        ])
+        writer.close()
+
+        self.assertEqual(sorted(os.listdir(parquet_dir)), ["tag=argo", "tag=helm%2Fcharts"])
+        df = pd.read_parquet(parquet_dir, columns=['question_id', 'score', 'last_activity_date', 'tag'])
+        self.assertEqual(sorted(df['question_id']), [0, 1, 2, 3, 4])
+        self.assertEqual(str(df['score'].dtype), 'int32')
+        self.assertEqual(df['last_activity_date'].min(), pd.Timestamp(1700000100, unit='s', tz='UTC'))
+        self.assertEqual(set(df['tag'].astype(str)), {"argo", "helm/charts"})
+
+    def test_parquet_dataset_writer_runs_callbacks_once_rows_are_on_disk(self):
+        parquet_dir = os.path.join(self.temp_dir.name, 'qas_parquet')
+        writer = stackoverflow_extractor.ParquetDatasetWriter(parquet_dir, row_group_size=2)
+        saved = []
+
+        def on_saved(page):
+            # Only called once the page's rows are in a published file
+            saved.append((page, len(pd.read_parquet(parquet_dir))))
+
+        rows = [{"question": f"Q{i}", "answer": "A", "tag": "argo", "question_id": i, "answer_id": i,
+                 "answer_rank": 1, "score": 1, "creation_date": 1700000000, "last_activity_date": 1700000000}
+                for i in range(3)]
+        writer.write_rows(rows[:1], "argo", lambda: on_saved(1))
+        self.assertEqual(saved, [])
+        writer.write_rows(rows[1:], "argo", lambda: on_saved(2))
+        self.assertEqual(saved, [(1, 3), (2, 3)])
+        writer.write_rows([], "argo", lambda: on_saved(3))
+        self.assertEqual(saved[-1], (3, 3))
+        writer.close()
+
+    def test_processed_question_ids_persist_only_new_ids(self):
+        ids_file = os.path.join(self.temp_dir.name, 'processed_question_ids.bin')
+        store = stackoverflow_extractor.ProcessedQuestionIds(ids_file, PROCESSED_IDS_FILE)
+        self.assertEqual(store.add_many([1, 2, 3]), 3)
+        self.assertEqual(store.add_many([3, 4]), 1)
+        self.assertEqual(os.path.getsize(ids_file), 4 * 8)
+
+        # Simulate a crash in the middle of writing a record
+        with open(ids_file, 'ab') as f:
+            f.write(b'\x01\x02')
+        reloaded = stackoverflow_extractor.ProcessedQuestionIds(ids_file, PROCESSED_IDS_FILE)
+        self.assertEqual(len(reloaded), 4)
+        self.assertIn(4, reloaded)
+        self.assertNotIn(5, reloaded)
+        self.assertEqual(os.path.getsize(ids_file), 4 * 8)
+
+    def test_processed_question_ids_import_legacy_json(self):
+        with open(PROCESSED_IDS_FILE, 'w') as f:
+            json.dump([10, 20], f)
+        ids_file = os.path.join(self.temp_dir.name, 'processed_question_ids.bin')
+        store = stackoverflow_extractor.ProcessedQuestionIds(ids_file, PROCESSED_IDS_FILE)
+        self.assertIn(10, store)
+        self.assertIn(20, store)
+        self.assertEqual(os.path.getsize(ids_file), 2 * 8)
+
     @patch('builtins.open', new_callable=mock_open, read_data='{"tags": ["test"], "last_update": "2023-01-01"}')
     def test_load_tags_from_json(self, mock_file):
         with patch('os.path.exists', return_value=True):
@@ -118,10 +436,10 @@ class TestStackOverflowQAScript(unittest.TestCase):
                 tags = stackoverflow_extractor.load_tags()
                 self.assertEqual(tags, ['test'])
 
-    @patch('yaml.safe_load')
-    @patch('builtins.open', new_callable=mock_open, read_data='landscape:\n  - name: "App Definition and Development"\n    subcategories:\n      - items:\n          - name: "Project (description)"')
-    def test_load_tags_from_yaml(self, mock_file, mock_yaml_load):
-        mock_yaml_load.return_value = {
+    @patch('src.scripts.data_preparation.stackoverflow_extractor.load_landscape')
+    @patch('builtins.open', new_callable=mock_open)
+    def test_load_tags_from_yaml(self, mock_file, mock_load_landscape):
+        mock_load_landscape.return_value = {
             'landscape': [
                 {
                     'name': 'App Definition and Development',
@@ -140,5 +458,95 @@ class TestStackOverflowQAScript(unittest.TestCase):
             tags = stackoverflow_extractor.load_tags()
             self.assertEqual(tags, ['Project'])
 
+class MockStackExchangeHandler(BaseHTTPRequestHandler):
+    """Serves two pages of questions for the tag 'test' and rate limits the first request."""
+    questions = {
+        1: [{"question_id": 1, "body": "<p>Q1</p>", "answer_count": 2},
+            {"question_id": 2, "body": "<p>Q2</p>", "answer_count": 0}],
+        2: [{"question_id": 3, "body": "<p>Q3</p>", "answer_count": 1}],
+    }
+    answers = {
+        1: [{"question_id": 1, "body": "<p>A1</p>", "score": 3}, {"question_id": 1, "body": "<p>A2</p>", "score": -1}],
+        3: [{"question_id": 3, "body": "<p>A3</p>", "score": 0}],
+    }
+    requests_seen = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        self.requests_seen.append(url.path)
+        if len(self.requests_seen) == 1:
+            self.send_response(429)
+            self.end_headers()
+            return
+        if url.path == '/2.3/search/advanced':
+            page = int(query['page'][0])
+            body = {"items": self.questions.get(page, []), "has_more": page < 2, "quota_remaining": 100}
+        elif url.path.startswith('/2.3/questions/'):
+            ids = [int(i) for i in url.path.split('/')[3].split(';')]
+            body = {"items": [a for i in ids for a in self.answers.get(i, [])], "has_more": False}
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestStackOverflowAsyncCrawl(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), MockStackExchangeHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        MockStackExchangeHandler.requests_seen = []
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}/2.3"
+        self.csv_file = os.path.join(self.temp_dir.name, 'qas.csv')
+        self.progress_file = os.path.join(self.temp_dir.name, 'progress.sqlite')
+        ids_store = stackoverflow_extractor.ProcessedQuestionIds(
+            os.path.join(self.temp_dir.name, 'ids.bin'), os.path.join(self.temp_dir.name, 'ids.json'))
+        self.patches = [
+            patch.object(stackoverflow_extractor, 'API_BASE_URL', base_url),
+            patch.object(stackoverflow_extractor, 'CSV_FILE', self.csv_file),
+            patch.object(stackoverflow_extractor, 'PROGRESS_FILE', self.progress_file),
+            patch.object(stackoverflow_extractor, 'RETRY_BASE_DELAY', 0),
+            patch.object(stackoverflow_extractor, 'processed_ids_store', ids_store),
+            patch.object(stackoverflow_extractor, 'token_bucket', stackoverflow_extractor.TokenBucket(rate=1000)),
+            patch.object(stackoverflow_extractor, 'request_budget',
+                         stackoverflow_extractor.RequestBudget(os.path.join(self.temp_dir.name, 'budget.json'))),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        stackoverflow_extractor.close_csv_writers()
+        self.temp_dir.cleanup()
+
+    def test_async_crawl_against_mock_server(self):
+        stackoverflow_extractor.extract_all_projects(['test'], mode='async')
+
+        df = pd.read_csv(self.csv_file)
+        self.assertEqual(sorted(df['question']), ['Q1', 'Q3'])
+        self.assertEqual(sorted(df['answer']), ['A1', 'A3'])
+        self.assertEqual(stackoverflow_extractor.load_progress(), {'test': 'finished'})
+        self.assertIn(3, stackoverflow_extractor.processed_ids_store)
+        self.assertNotIn(2, stackoverflow_extractor.processed_ids_store)
+        # One rate-limited retry, two search pages and one batched answers request per page
+        self.assertEqual(MockStackExchangeHandler.requests_seen,
+                         ['/2.3/search/advanced', '/2.3/search/advanced', '/2.3/questions/1/answers',
+                          '/2.3/search/advanced', '/2.3/questions/3/answers'])
+
+
 if __name__ == '__main__':
     unittest.main()
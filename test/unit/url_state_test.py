@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import Mock, patch
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+# Add the root of the project to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.scripts.data_preparation import url_state
+from src.scripts.data_preparation.url_state import UrlStateStore
+
+URL = "https://raw.githubusercontent.com/org/repo/main/README.md"
+
+
+class TestUrlStateStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.temp_dir, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_url_is_claimed_once_across_threads(self):
+        store = UrlStateStore(self.filename)
+        claims = []
+        barrier = threading.Barrier(8)
+
+        def claim():
+            barrier.wait()
+            claims.append(store.claim(URL))
+
+        threads = [threading.Thread(target=claim) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(claims.count({}), 1)
+        self.assertEqual(claims.count(None), 7)
+        store.close()
+
+    def test_state_survives_reopening_and_failures_stay_claimable(self):
+        store = UrlStateStore(self.filename)
+        store.claim(URL)
+        store.complete(URL, Mock(status_code=200, content=b'# Readme', headers={'ETag': '"v1"'}))
+        store.claim(URL + '?broken')
+        store.fail(URL + '?broken')
+        store.close()
+
+        reopened = UrlStateStore(self.filename)
+        self.assertIsNone(reopened.claim(URL))
+        self.assertEqual(reopened.claim(URL + '?broken'), {})
+        self.assertEqual(reopened.snapshot()[URL]['etag'], '"v1"')
+        reopened.close()
+
+    def test_commits_are_batched(self):
+        store = UrlStateStore(self.filename)
+        with patch.object(url_state, 'BATCH_SIZE', 3), patch.object(url_state, 'FLUSH_INTERVAL', 3600):
+            for i in range(5):
+                store.claim(f"{URL}?{i}")
+                store.complete(f"{URL}?{i}")
+            self.assertEqual(len(UrlStateStore(self.filename).snapshot()), 3)
+        store.close()
+        self.assertEqual(len(UrlStateStore(self.filename).snapshot()), 5)
+
+    def test_stale_entries_are_fetched_conditionally(self):
+        store = UrlStateStore(self.filename, max_age=60)
+        store.claim(URL)
+        store.complete(URL, Mock(status_code=200, content=b'# Readme',
+                                 headers={'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jul 2024 00:00:00 GMT'}))
+        self.assertIsNone(store.claim(URL))
+
+        with patch.object(url_state.time, 'time', return_value=store.snapshot()[URL]['fetched_at'] + 120):
+            self.assertEqual(store.claim(URL), {'If-None-Match': '"v1"',
+                                                'If-Modified-Since': 'Mon, 01 Jul 2024 00:00:00 GMT'})
+            store.complete(URL, Mock(status_code=304, content=b'', headers={}))
+        self.assertEqual(store.snapshot()[URL]['etag'], '"v1"')
+        self.assertIsNotNone(store.snapshot()[URL]['sha256'])
+        store.close()
+
+    def test_legacy_text_cache_is_imported(self):
+        legacy_file = os.path.join(self.temp_dir, 'cache.txt')
+        with open(legacy_file, 'w') as f:
+            f.write(URL + '\n')
+
+        store = UrlStateStore(self.filename, legacy_cache_file=legacy_file)
+
+        self.assertIsNone(store.claim(URL))
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,68 +1,161 @@
 import unittest
+from unittest.mock import patch
+import asyncio
 import os
 import shutil
 import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 # Add the root of the project to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from src.scripts.data_preparation import webpages_extractor
+from src.scripts.data_preparation.content_store import ContentStore
+from src.scripts.data_preparation.url_state import UrlStateStore
+
+TEST_YAML = os.path.join(os.path.dirname(__file__), '../resources/test_landscape_augmented.yml')
 
 class Testdownload_files_from_yaml(unittest.TestCase):
 
+    def setUp(self):
+        # The landscape is loaded from a copy, so its index sidecar is not written next to the test resource
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.yaml_file = os.path.join(self.temp_dir.name, 'landscape.yml')
+        shutil.copy(TEST_YAML, self.yaml_file)
+        self.output_directory = os.path.join(self.temp_dir.name, 'raw_files_test')
+        os.makedirs(self.output_directory, exist_ok=True)
+        # The download state, content store and archive are written to the temporary directory as well
+        self.patches = [
+            patch.object(webpages_extractor, 'CACHE_FILE', os.path.join(self.temp_dir.name, 'cache.sqlite')),
+            patch.object(webpages_extractor, 'CONTENT_STORE', ContentStore(os.path.join(self.temp_dir.name, 'store'))),
+            patch.object(webpages_extractor, 'ARCHIVE_DIRECTORY', self.temp_dir.name),
+        ]
+        for p in self.patches:
+            p.start()
+
     def test_with_valid_input(self):
-        output_directory = "sources/raw_files_test"
-        os.makedirs(output_directory, exist_ok=True)
+        output_directory = self.output_directory
 
         # Write downloaded content to file
         webpages_extractor.download_files_from_yaml(
-            yaml_file=os.path.join(os.path.dirname(__file__), '../resources/test_landscape_augmented.yml'), output_directory=output_directory)
+            yaml_file=self.yaml_file, output_directory=output_directory)
 
         # Assert the file exists
-        file_path_1 = "sources/raw_files_test/Test_Provisioning_Automation & Configuration_Airship_get_started_inventory.html.md"
+        file_path_1 = os.path.join(output_directory, "Test_Provisioning_Automation & Configuration_Airship_get_started_inventory.html.md")
         error_message_1 = f"File '{file_path_1}' was not downloaded."
         self.assertTrue(os.path.exists(file_path_1), error_message_1)
         
-        file_path_2 = "sources/raw_files_test/Test_Provisioning_Automation & Configuration_Airship_release_and_maintenance.html.md"
+        file_path_2 = os.path.join(output_directory, "Test_Provisioning_Automation & Configuration_Airship_release_and_maintenance.html.md")
         error_message_2 = f"File '{file_path_2}' was not downloaded."
         self.assertTrue(os.path.exists(file_path_2), error_message_2)
 
         # Test cache functionality: download again and check if skipped
         webpages_extractor.download_files_from_yaml(
-            yaml_file=os.path.join(os.path.dirname(__file__), '../resources/test_landscape_augmented.yml'), output_directory=output_directory)
+            yaml_file=self.yaml_file, output_directory=output_directory)
 
         # Assert nothing new was downloaded (since it should be cached)
-        new_file_path = "sources/raw_files_test/New_Test_File.html.md"
+        new_file_path = os.path.join(output_directory, "New_Test_File.html.md")
         self.assertFalse(os.path.exists(new_file_path), f"Unexpected download of '{new_file_path}'")
 
     def tearDown(self):
-        # Clean up: remove the output_directory and its contents
-        output_directory = "sources/raw_files_test/"
-        if os.path.exists(output_directory):
-            shutil.rmtree(output_directory)
-        if os.path.exists("sources/webpages_documentations.zip"):
-            os.remove("sources/webpages_documentations.zip")
-        if os.path.exists(webpages_extractor.CACHE_FILE):
-            os.remove(webpages_extractor.CACHE_FILE)
-        # if os.path.exists("test/resources/test_landscape_augmented.yml"):
-        #     os.remove("test/resources/test_landscape_augmented.yml")
+        # Clean up: remove the temporary directory and its contents
+        for p in self.patches:
+            p.stop()
+        self.temp_dir.cleanup()
 
     def test_google_doc_to_pdf_conversion(self):
-        output_directory = "sources/raw_files_test"
-        os.makedirs(output_directory, exist_ok=True)
+        output_directory = self.output_directory
 
         # Mock URL to a Google Doc
         google_doc_url = "https://docs.google.com/document/d/example_document_id/edit"
 
-        # Download the Google Doc (PDF conversion)
-        webpages_extractor.save_doc_to_pdf(google_doc_url, output_directory, {
+        # Download the Google Doc (PDF conversion), named by its document id
+        cache = UrlStateStore(os.path.join(output_directory, 'cache.sqlite'))
+        asyncio.run(webpages_extractor.crawl([(google_doc_url, {
             "Category": "Test_Category",
             "Subcategory": "Test_Subcategory",
             "Project_name": "Test_Project",
-            "filename": "test_google_doc"
-        })
+            "filename": ""
+        })], output_directory, cache))
+        cache.close()
 
         # Assert the PDF file exists in the output directory
-        pdf_file_path = os.path.join(output_directory, "Test_Category_Test_Subcategory_Test_Project_test_google_doc.pdf")
+        pdf_file_path = os.path.join(output_directory, "Test_Category_Test_Subcategory_Test_Project_example_document_id.pdf")
         self.assertTrue(os.path.exists(pdf_file_path), f"PDF file '{pdf_file_path}' was not downloaded.")
 
+class DocsHandler(BaseHTTPRequestHandler):
+    pages = {
+        '/docs/intro.html': b'<html><body><p>Install the operator.</p><pre>kubectl apply -f operator.yaml</pre></body></html>',
+        '/docs/flaky.html': b'<html><body><p>Configure the operator.</p></body></html>',
+    }
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append(self.path)
+        body = self.pages.get(self.path)
+        # The first request of the flaky page fails
+        if body is None or (self.path == '/docs/flaky.html' and self.requests_seen.count(self.path) == 1):
+            self.send_response(404 if body is None else 503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestCrawl(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.server = ThreadingHTTPServer(('localhost', 0), DocsHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://localhost:{self.server.server_address[1]}/docs/"
+        DocsHandler.requests_seen = []
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_crawl_retries_and_saves_pages_of_all_projects(self):
+        tags = {"Category": "Runtime", "Subcategory": "Container Runtime", "Project_name": "", "filename": ""}
+        jobs = [(self.base_url + "intro.html", dict(tags, Project_name="containerd")),
+                (self.base_url + "flaky.html", dict(tags, Project_name="cri-o")),
+                (self.base_url + "missing.html", dict(tags, Project_name="cri-o")),
+                (self.base_url + "intro.html", dict(tags, Project_name="cri-o"))]
+        cache = UrlStateStore(os.path.join(self.temp_dir, 'cache.sqlite'))
+
+        with patch.object(webpages_extractor, 'CONTENT_STORE', ContentStore(os.path.join(self.temp_dir, 'store'))), \
+                patch.object(webpages_extractor.asyncio, 'sleep', return_value=None):
+            asyncio.run(webpages_extractor.crawl(jobs, self.temp_dir, cache))
+
+        with open(os.path.join(self.temp_dir, "Runtime_Container Runtime_containerd_intro.html.md")) as f:
+            self.assertEqual(f.read(), "Install the operator.\n```\nkubectl apply -f operator.yaml```\n")
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, "Runtime_Container Runtime_cri-o_flaky.html.md")))
+        # The URL listed twice is fetched once, the missing page is not retried
+        self.assertEqual(sorted(DocsHandler.requests_seen),
+                         ['/docs/flaky.html', '/docs/flaky.html', '/docs/intro.html', '/docs/missing.html'])
+        self.assertEqual(cache.snapshot()[self.base_url + "missing.html"]['status'], 'failed')
+        cache.close()
+
+    def test_crawl_parses_in_a_thread_without_process_pool(self):
+        tags = {"Category": "Runtime", "Subcategory": "Container Runtime", "Project_name": "containerd", "filename": ""}
+        cache = UrlStateStore(os.path.join(self.temp_dir, 'cache.sqlite'))
+
+        with patch.object(webpages_extractor, 'CONTENT_STORE', ContentStore(os.path.join(self.temp_dir, 'store'))), \
+                patch.object(webpages_extractor, 'ProcessPoolExecutor', side_effect=NotImplementedError("no sem_open")):
+            asyncio.run(webpages_extractor.crawl([(self.base_url + "intro.html", tags)], self.temp_dir, cache))
+
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, "Runtime_Container Runtime_containerd_intro.html.md")))
+        self.assertEqual(cache.snapshot()[self.base_url + "intro.html"]['status'], 'done')
+        cache.close()
+
+
 if __name__ == '__main__':
     unittest.main()